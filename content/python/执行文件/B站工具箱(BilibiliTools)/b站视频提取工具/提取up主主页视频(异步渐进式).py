@@ -1,24 +1,83 @@
 import os
 import re
-import requests
 import json
 import time
-import random
+import asyncio
+import aiohttp
 from urllib.parse import urlparse, parse_qs
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# B站API地址（测试时可指向本地的模拟HTTP服务）
+API_BASE = "https://api.bilibili.com"
+# API请求的平均速率（每秒请求数）与允许的突发请求数，所有阶段共享同一个限速器
+REQUESTS_PER_SECOND = 1.0
+REQUEST_BURST = 3
+# 遇到频率限制(-412)时暂停所有API请求的秒数（重试时按次数递增）
+RATE_LIMIT_BACKOFF = 10
+# 单个API请求的重试次数
+API_RETRIES = 3
+# 获取视频列表时，先请求第1页得到视频总数，再并发请求其余各页
+PAGE_PREFETCH = True
+# 同时解析视频详情与播放链接的协程数
+RESOLVE_WORKERS = 2
+# 连接池大小（API请求与视频下载共用）
+CONNECTION_LIMIT = 10
+# 下载时每次读取的块大小
+CHUNK_SIZE = 256 * 1024
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+class TokenBucket:
+    """令牌桶限速器：平均每秒 rate 个请求，最多允许 capacity 个请求连续发出，所有协程共享"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        # 持有锁等待，先到的请求先获得令牌
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def pause(self, seconds):
+        """暂停所有请求，并清空令牌，避免恢复后立即突发"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.updated = self.paused_until
 
 class BilibiliUpDownloader:
-    def __init__(self, save_path="./bilibili_videos"):
+    def __init__(self, save_path="./bilibili_videos", api_base=API_BASE,
+                 rate=REQUESTS_PER_SECOND, burst=REQUEST_BURST):
         """
         初始化下载器
         :param save_path: 视频保存路径
+        :param api_base: B站API地址
+        :param rate: 每秒API请求数
+        :param burst: 允许连续发出的API请求数
         """
         self.save_path = save_path
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        self.api_base = api_base.rstrip('/')
+        self.rate = rate
+        self.burst = burst
+        self.headers = {
+            'User-Agent': USER_AGENT,
             'Referer': 'https://www.bilibili.com/'
-        })
+        }
+        # 会话（连接池）与限速器必须在事件循环中创建，见 open_session
+        self.session = None
+        self.limiter = None
         
         # 创建保存目录
         if not os.path.exists(save_path):
@@ -28,6 +87,25 @@ class BilibiliUpDownloader:
         self.status_file = os.path.join(save_path, "up_download_status.json")
         self.download_status = self.load_download_status()
 
+    async def open_session(self, limit=CONNECTION_LIMIT):
+        """创建共享的连接池会话与限速器"""
+        connector = aiohttp.TCPConnector(limit=limit)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        self.limiter = TokenBucket(self.rate, self.burst)
+
+    async def close_session(self):
+        """关闭会话与其中的所有连接"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.open_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close_session()
+
     def load_download_status(self):
         """加载下载状态"""
         if os.path.exists(self.status_file):
@@ -75,8 +153,63 @@ class BilibiliUpDownloader:
         
         return None
 
-    def get_up_videos(self, mid, page_size=30, max_pages=50):
-        """获取UP主所有视频（分页获取）"""
+    async def api_get(self, path, params=None):
+        """
+        经限速器发起API请求，返回解析后的JSON
+        遇到频率限制(-412)时暂停所有API请求再重试，网络错误时稍等后重试，重试用尽后抛出异常
+        """
+        url = self.api_base + path
+        for attempt in range(API_RETRIES + 1):
+            await self.limiter.acquire()
+            try:
+                async with self.session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status == 412:
+                        data = {'code': -412, 'message': '请求过于频繁'}
+                    else:
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                if attempt == API_RETRIES:
+                    raise
+                print(f"网络请求异常 ({path}): {e}，稍后重试")
+                await asyncio.sleep(attempt + 1)
+                continue
+            
+            # 频率限制影响所有请求，暂停整个限速器而不只是当前请求
+            if (data.get('code') == -412 or "频繁" in str(data.get('message', ''))) and attempt < API_RETRIES:
+                backoff = RATE_LIMIT_BACKOFF * (attempt + 1)
+                print(f"遇到频率限制，暂停所有请求 {backoff} 秒后重试...")
+                self.limiter.pause(backoff)
+                continue
+            return data
+
+    def parse_video_item(self, item):
+        """提取视频列表中单个视频的基本信息"""
+        return {
+            'title': item.get('title', ''),
+            'bvid': item.get('bvid', ''),
+            'aid': item.get('aid', ''),
+            'created': item.get('created', 0),
+            'length': item.get('length', ''),
+            'play': item.get('play', 0),
+            'comment': item.get('comment', 0)
+        }
+
+    async def fetch_video_page(self, mid, page_num, page_size):
+        """请求UP主视频列表的一页"""
+        params = {
+            'mid': mid,
+            'ps': page_size,
+            'pn': page_num,
+            'order': 'pubdate'  # 按发布时间排序
+        }
+        return await self.api_get("/x/space/arc/search", params)
+
+    async def get_up_videos(self, mid, page_size=30, max_pages=50, prefetch=PAGE_PREFETCH):
+        """获取UP主所有视频（分页获取，请求间隔由限速器控制；prefetch为True时并发请求各页）"""
+        if prefetch:
+            return await self.prefetch_up_videos(mid, page_size, max_pages)
+        
         all_videos = []
         page_num = 1
         total_videos = 0
@@ -85,35 +218,13 @@ class BilibiliUpDownloader:
         
         while page_num <= max_pages:
             try:
-                # 使用随机延迟避免请求过快
-                delay = random.uniform(2, 5)  # 2-5秒随机延迟
-                time.sleep(delay)
-                
                 # 使用B站API获取UP主视频列表
-                api_url = f"https://api.bilibili.com/x/space/arc/search"
-                params = {
-                    'mid': mid,
-                    'ps': page_size,
-                    'pn': page_num,
-                    'order': 'pubdate'  # 按发布时间排序
-                }
-                
                 print(f"正在请求第 {page_num} 页...")
-                response = self.session.get(api_url, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
+                data = await self.fetch_video_page(mid, page_num, page_size)
                 
                 if data['code'] != 0:
-                    error_msg = data.get('message', '未知错误')
-                    print(f"获取第 {page_num} 页视频列表失败: {error_msg}")
-                    
-                    # 如果是频率限制，等待更长时间后重试
-                    if "频繁" in error_msg or data['code'] == -412:
-                        print("遇到频率限制，等待10秒后重试...")
-                        time.sleep(10)
-                        continue  # 不增加页码，重试当前页
-                    else:
-                        break  # 其他错误直接退出
+                    print(f"获取第 {page_num} 页视频列表失败: {data.get('message', '未知错误')}")
+                    break
                 
                 vlist = data['data']['list']['vlist']
                 if not vlist:
@@ -130,17 +241,7 @@ class BilibiliUpDownloader:
                 print(f"成功获取第 {page_num} 页，共 {current_count} 个视频")
                 
                 # 处理当前页的视频
-                for item in vlist:
-                    video_info = {
-                        'title': item.get('title', ''),
-                        'bvid': item.get('bvid', ''),
-                        'aid': item.get('aid', ''),
-                        'created': item.get('created', 0),
-                        'length': item.get('length', ''),
-                        'play': item.get('play', 0),
-                        'comment': item.get('comment', 0)
-                    }
-                    all_videos.append(video_info)
+                all_videos.extend(self.parse_video_item(item) for item in vlist)
                 
                 # 检查是否已获取所有视频
                 if len(all_videos) >= total_videos:
@@ -155,29 +256,70 @@ class BilibiliUpDownloader:
                     
                 page_num += 1
                 
-            except requests.exceptions.RequestException as e:
-                print(f"网络请求异常 (第 {page_num} 页): {e}")
-                # 等待后重试当前页
-                time.sleep(5)
             except Exception as e:
+                # 网络错误已在 api_get 中重试过，这里跳过当前页
                 print(f"获取第 {page_num} 页视频失败: {e}")
-                # 等待后继续下一页
-                time.sleep(3)
                 page_num += 1
         
         return all_videos
 
-    def get_video_detail(self, bvid):
+    async def prefetch_up_videos(self, mid, page_size=30, max_pages=50):
+        """
+        并发获取UP主所有视频：第1页返回视频总数后，其余各页同时发出请求
+        实际请求速率仍由共享的限速器控制，遇到频率限制(-412)时所有请求一起暂停（见 api_get）
+        获取列表的耗时只取决于限速，不再是页数乘以固定延迟
+        """
+        print("正在获取UP主视频列表...")
+        
+        try:
+            data = await self.fetch_video_page(mid, 1, page_size)
+            if data['code'] != 0:
+                print(f"获取第 1 页视频列表失败: {data.get('message', '未知错误')}")
+                return []
+            total_videos = data['data']['page']['count']
+            pages = {1: data['data']['list']['vlist'] or []}
+        except Exception as e:
+            print(f"获取第 1 页视频失败: {e}")
+            return []
+        
+        total_pages = min((total_videos + page_size - 1) // page_size, max_pages)
+        print(f"UP主共有 {total_videos} 个视频")
+        print(f"预计需要获取 {total_pages} 页，第 2 页起并发请求")
+        
+        async def fetch_page(page_num):
+            try:
+                data = await self.fetch_video_page(mid, page_num, page_size)
+                if data['code'] != 0:
+                    print(f"获取第 {page_num} 页视频列表失败: {data.get('message', '未知错误')}")
+                    return
+                pages[page_num] = data['data']['list']['vlist'] or []
+            except Exception as e:
+                print(f"获取第 {page_num} 页视频失败: {e}")
+                return
+            print(f"成功获取第 {page_num} 页，共 {len(pages[page_num])} 个视频")
+        
+        await asyncio.gather(*(fetch_page(page_num) for page_num in range(2, total_pages + 1)))
+        
+        missing_pages = [page_num for page_num in range(1, total_pages + 1) if page_num not in pages]
+        if missing_pages:
+            print(f"以下页获取失败，其中的视频本次不会下载: {missing_pages}")
+        
+        # 按页码合并并按bvid去重（获取期间UP主发布新视频时，相邻两页会出现重复），再按发布时间从新到旧排序
+        videos = {}
+        for page_num in sorted(pages):
+            for item in pages[page_num]:
+                video = self.parse_video_item(item)
+                videos.setdefault(video['bvid'], video)
+        all_videos = sorted(videos.values(), key=lambda video: video['created'], reverse=True)
+        
+        print(f"已获取 {len(all_videos)} 个视频")
+        return all_videos
+
+    async def get_video_detail(self, bvid):
         """获取单个视频的详细信息，包括cid"""
         try:
-            # 添加随机延迟
-            time.sleep(random.uniform(1, 2))
-            
             # 使用B站API获取视频详细信息
-            api_url = f"https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
-            response = self.session.get(api_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = await self.api_get("/x/web-interface/view", {'bvid': bvid})
             
             if data['code'] == 0:
                 video_data = data['data']
@@ -208,17 +350,12 @@ class BilibiliUpDownloader:
             filename = filename[:100]
         return filename
 
-    def get_video_play_url(self, bvid, cid):
-        """获取视频播放URL"""
+    async def get_video_play_url(self, bvid, cid):
+        """获取视频播放URL，返回 (视频URL, 下载请求头)，失败时返回None"""
         try:
-            # 添加随机延迟
-            time.sleep(random.uniform(1, 2))
-            
             # 获取视频下载链接
-            play_url = f"https://api.bilibili.com/x/player/playurl?bvid={bvid}&cid={cid}&qn=80&type=&otype=json"
-            response = self.session.get(play_url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            params = {'bvid': bvid, 'cid': cid, 'qn': 80, 'type': '', 'otype': 'json'}
+            data = await self.api_get("/x/player/playurl", params)
             
             if data['code'] != 0:
                 print(f"获取播放链接失败: {data.get('message', '未知错误')}")
@@ -229,7 +366,7 @@ class BilibiliUpDownloader:
             
             # 添加必要的headers
             headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'User-Agent': USER_AGENT,
                 'Referer': f'https://www.bilibili.com/video/{bvid}',
                 'Range': 'bytes=0-'
             }
@@ -238,7 +375,7 @@ class BilibiliUpDownloader:
             
         except Exception as e:
             print(f"获取视频播放URL失败: {e}")
-            return None, None
+            return None
 
     def check_video_exists(self, title):
         """检查视频是否已存在"""
@@ -256,71 +393,139 @@ class BilibiliUpDownloader:
         
         return False, filename
 
-    def download_single_video(self, video_info, index, total):
-        """下载单个视频"""
+    async def resolve_video(self, video_info):
+        """解析阶段：依次获取视频详情(cid)与播放链接，返回 (视频URL, 下载请求头)，失败时返回None"""
+        title = video_info['title']
+        bvid = video_info['bvid']
+        
+        # 获取视频详细信息（包含cid）
+        video_detail = await self.get_video_detail(bvid)
+        if not video_detail:
+            print(f"  获取视频详情失败: {title}")
+            return None
+        
+        # 获取视频播放URL
+        result = await self.get_video_play_url(bvid, video_detail['cid'])
+        if not result:
+            print(f"  获取视频播放URL失败: {title}")
+            return None
+        return result
+
+    async def download_file(self, video_url, headers, filepath):
+        """流式下载到临时文件，完成后再改名，中断时不会留下被当作已下载的不完整视频"""
+        temp_path = filepath + '.part'
+        filename = os.path.basename(filepath)
+        # 大文件下载不限制总时长，只限制连接与读取的等待时间
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
         try:
-            title = video_info['title']
-            bvid = video_info['bvid']
-            
-            print(f"[{index}/{total}] 开始处理: {title}")
-            
-            # 检查视频是否已存在
-            exists, filename = self.check_video_exists(title)
-            if exists:
-                print(f"  视频已存在，跳过: {filename}")
-                self.update_download_status(bvid, 'skipped', filename)
-                return True
-            
-            # 获取视频详细信息（包含cid）
-            video_detail = self.get_video_detail(bvid)
-            if not video_detail:
-                print(f"  获取视频详情失败: {title}")
-                self.update_download_status(bvid, 'failed')
-                return False
-            
-            cid = video_detail['cid']
-            
-            # 获取视频播放URL
-            result = self.get_video_play_url(bvid, cid)
-            if not result:
-                print(f"  获取视频播放URL失败: {title}")
-                self.update_download_status(bvid, 'failed')
-                return False
+            async with self.session.get(video_url, headers=headers, timeout=timeout) as response:
+                response.raise_for_status()
                 
-            video_url, headers = result
-            
-            # 设置文件路径
-            filepath = os.path.join(self.save_path, filename)
-            
-            print(f"  开始下载: {filename}")
-            
-            # 下载视频
-            response = self.session.get(video_url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded_size = 0
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
+                total_size = int(response.headers.get('content-length', 0))
+                downloaded_size = 0
+                
+                with open(temp_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
                         f.write(chunk)
                         downloaded_size += len(chunk)
                         if total_size > 0:
                             progress = (downloaded_size / total_size) * 100
-                            print(f"  下载进度: {progress:.1f}%", end='\r')
-            
-            print(f"  下载完成: {filename}")
-            self.update_download_status(bvid, 'downloaded', filename)
-            return True
-            
+                            print(f"  下载进度: {filename} {progress:.1f}%", end='\r')
+            os.replace(temp_path, filepath)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def fetch_video(self, video_info, filename, video_url, headers):
+        """下载阶段：下载已解析出播放链接的视频并记录状态，返回是否成功"""
+        bvid = video_info['bvid']
+        print(f"  开始下载: {filename}")
+        try:
+            await self.download_file(video_url, headers, os.path.join(self.save_path, filename))
         except Exception as e:
-            print(f"  下载失败 {title}: {e}")
+            print(f"  下载失败 {video_info['title']}: {e}")
             self.update_download_status(bvid, 'failed')
             return False
+        
+        print(f"  下载完成: {filename}")
+        self.update_download_status(bvid, 'downloaded', filename)
+        return True
 
-    def download_up_videos(self, url, max_workers=3):
-        """下载UP主所有视频"""
+    async def _resolve_stage(self, resolve_queue, download_queue, total, results):
+        """解析阶段的工作协程：解析成功的视频交给下载阶段"""
+        while True:
+            item = await resolve_queue.get()
+            if item is None:
+                return
+            index, video, filename = item
+            print(f"[{index}/{total}] 开始处理: {video['title']}")
+            result = await self.resolve_video(video)
+            if not result:
+                self.update_download_status(video['bvid'], 'failed')
+                results.append(False)
+                continue
+            # 下载队列已满时在此等待，解析不会远远领先于下载
+            await download_queue.put((video, filename, result))
+
+    async def _download_stage(self, download_queue, results):
+        """下载阶段的工作协程"""
+        while True:
+            item = await download_queue.get()
+            if item is None:
+                return
+            video, filename, (video_url, headers) = item
+            results.append(await self.fetch_video(video, filename, video_url, headers))
+
+    async def run_pipeline(self, videos, max_workers):
+        """
+        流水线下载：解析阶段（详情 -> 播放链接）与下载阶段同时进行
+        API请求由限速器统一控制速率，下载同时进行 max_workers 个
+        两个阶段之间的队列容量为 max_workers，播放链接不会因排队太久而过期
+        返回 (成功数, 失败数)
+        """
+        total = len(videos)
+        resolve_queue = asyncio.Queue()
+        download_queue = asyncio.Queue(maxsize=max_workers)
+        # 标题相同的视频清理后得到同一个文件名，后出现的在文件名中加上BV号，避免两个下载同时写入同一个文件
+        used_filenames = set()
+        for index, video in enumerate(videos, 1):
+            _, filename = self.check_video_exists(video['title'])
+            if filename in used_filenames:
+                filename = f"{filename[:-len('.mp4')]} ({video['bvid']}).mp4"
+            used_filenames.add(filename)
+            resolve_queue.put_nowait((index, video, filename))
+        for _ in range(RESOLVE_WORKERS):
+            resolve_queue.put_nowait(None)
+        
+        results = []
+        resolvers = [
+            asyncio.create_task(self._resolve_stage(resolve_queue, download_queue, total, results))
+            for _ in range(RESOLVE_WORKERS)
+        ]
+        downloaders = [
+            asyncio.create_task(self._download_stage(download_queue, results))
+            for _ in range(max_workers)
+        ]
+        
+        # 解析全部完成后通知下载协程退出
+        await asyncio.gather(*resolvers)
+        for _ in range(max_workers):
+            await download_queue.put(None)
+        await asyncio.gather(*downloaders)
+        return results.count(True), results.count(False)
+
+    async def download_up_videos(self, url, max_workers=3):
+        """下载UP主所有视频（未打开会话时自动创建，结束后关闭）"""
+        if self.session is not None:
+            return await self._download_up_videos(url, max_workers)
+        
+        await self.open_session(limit=max(CONNECTION_LIMIT, max_workers + RESOLVE_WORKERS))
+        try:
+            return await self._download_up_videos(url, max_workers)
+        finally:
+            await self.close_session()
+
+    async def _download_up_videos(self, url, max_workers):
         print("开始获取B站UP主信息...")
         
         # 提取mid
@@ -333,7 +538,7 @@ class BilibiliUpDownloader:
         print(f"视频将保存到: {os.path.abspath(self.save_path)}")
         
         # 获取UP主所有视频
-        videos_basic = self.get_up_videos(mid)
+        videos_basic = await self.get_up_videos(mid)
         
         if not videos_basic:
             print("未获取到任何视频信息")
@@ -342,13 +547,13 @@ class BilibiliUpDownloader:
         total_videos = len(videos_basic)
         print(f"成功获取到 {total_videos} 个视频的基本信息")
         
-        # 分析下载状态
-        downloaded_count = 0
-        skipped_count = 0
+        # 分析下载状态，过滤出未下载的视频
+        videos_to_download = []
         for video in videos_basic:
             exists, _ = self.check_video_exists(video['title'])
-            if exists:
-                skipped_count += 1
+            if not exists:
+                videos_to_download.append(video)
+        skipped_count = total_videos - len(videos_to_download)
         
         print(f"下载状态分析:")
         print(f"- 总视频数: {total_videos}")
@@ -376,39 +581,8 @@ class BilibiliUpDownloader:
             print("下载已取消")
             return
         
-        # 使用线程池下载视频
-        print(f"\n开始下载视频 (最大并发数: {max_workers})...")
-        success_count = 0
-        failed_count = 0
-        
-        # 过滤出未下载的视频
-        videos_to_download = []
-        for video in videos_basic:
-            exists, _ = self.check_video_exists(video['title'])
-            if not exists:
-                videos_to_download.append(video)
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有下载任务
-            future_to_video = {
-                executor.submit(self.download_single_video, video, i+1, len(videos_to_download)): video 
-                for i, video in enumerate(videos_to_download)
-            }
-            
-            # 等待任务完成
-            for future in as_completed(future_to_video):
-                video = future_to_video[future]
-                try:
-                    result = future.result()
-                    if result:
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                    # 添加延迟，避免请求过快
-                    time.sleep(random.uniform(2, 4))
-                except Exception as e:
-                    print(f"下载视频时发生错误: {e}")
-                    failed_count += 1
+        print(f"\n开始下载视频 (最大并发数: {max_workers}, API限速: {self.rate:g} 次/秒)...")
+        success_count, failed_count = await self.run_pipeline(videos_to_download, max_workers)
         
         print(f"\n下载完成!")
         print(f"- 成功: {success_count}")
@@ -446,8 +620,8 @@ def main():
             except:
                 max_workers = 3
             
-            # 开始下载
-            downloader.download_up_videos(url, max_workers)
+            # 开始下载（每次下载在新的事件循环中运行）
+            asyncio.run(downloader.download_up_videos(url, max_workers))
             
         except KeyboardInterrupt:
             print("\n程序被用户中断")
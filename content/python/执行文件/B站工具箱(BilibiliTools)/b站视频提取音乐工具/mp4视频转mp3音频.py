@@ -2,6 +2,9 @@ import os
 import subprocess
 import sys
 import json
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # 设置FFmpeg和FFprobe的绝对路径（请根据你的实际安装路径修改）
 # 下载路径 https://ffmpeg.org/download.html#get-packages
@@ -11,118 +14,197 @@ FFPROBE_PATH = r"C:\Program File\ffmpeg\bin\ffprobe.exe"  # 替换为你的ffpro
 # 直接设置目录路径变量
 directory_path = r"C:\Users\chru\Desktop\1"
 
-def extract_audio_from_mp4(input_path, output_path=None):
+# 同时进行的转换数（None为CPU核心数）
+MAX_WORKERS = None
+# 音频已经是MP3/AAC时直接复制音频流，不重新编码（速度只受磁盘限制）：MP3输出为.mp3，AAC输出为.m4a
+STREAM_COPY = False
+# 是否处理子目录中的MP4文件
+RECURSIVE = False
+# 媒体目录（工具/输出视频相关参数(ffmpeg).py 生成），设置后直接使用其中记录的音频参数，不再调用ffprobe
+CATALOG_PATH = None
+
+# 可以直接复制的音频编码及对应的输出扩展名
+COPY_EXTENSIONS = {'mp3': '.mp3', 'aac': '.m4a'}
+
+def probe_audio(input_path):
+    """
+    使用ffprobe获取第一条音频流的参数
+    
+    Returns:
+        (编码, 采样率, 通道数, 码率)，没有音频流或探测失败时返回None；音频流没有码率时使用容器码率
+    """
+    cmd_probe = [
+        FFPROBE_PATH,
+        '-v', 'quiet',
+        '-print_format', 'json',
+        '-show_entries', 'stream=codec_name,sample_rate,channels,bit_rate:format=bit_rate',
+        '-select_streams', 'a:0',
+        input_path
+    ]
+    
+    # 设置编码为UTF-8以避免解码错误
+    result = subprocess.run(cmd_probe, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+    if result.returncode != 0 or not result.stdout:
+        return None
+    
+    data = json.loads(result.stdout)
+    streams = data.get('streams') or []
+    if not streams:
+        return None
+    
+    stream = streams[0]
+    bitrate = stream.get('bit_rate') or data.get('format', {}).get('bit_rate')
+    return stream.get('codec_name'), stream.get('sample_rate'), stream.get('channels'), bitrate
+
+def is_up_to_date(output_path, input_path):
+    """输出文件存在且不早于输入文件（转换时先写临时文件再替换，已存在的输出文件都是完整的）"""
+    try:
+        return os.path.getsize(output_path) > 0 and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+    except OSError:
+        return False
+
+def extract_audio_from_mp4(input_path, output_path=None, stream_copy=False, audio_info=None):
     """
     从MP4文件中提取音频并保存为MP3文件
     
     Args:
         input_path (str): 输入的MP4文件路径
-        output_path (str, optional): 输出的MP3文件路径。如果未提供，则使用与输入文件相同的路径和名称，但扩展名为.mp3
+        output_path (str, optional): 输出的文件路径。如果未提供，则使用与输入文件相同的路径和名称，
+                                     扩展名为.mp3（直接复制AAC音频时为.m4a）
+        stream_copy (bool): 音频已经是MP3/AAC时直接复制音频流，不重新编码
+        audio_info (tuple, optional): 已知的音频参数 (编码, 采样率, 通道数, 码率)，提供时不再调用ffprobe
+    
+    Returns:
+        (状态, 输出文件路径, 说明)，状态为 copied/encoded/skipped/failed
     """
     # 检查输入文件是否存在
     if not os.path.isfile(input_path):
-        print(f"错误：文件 '{input_path}' 不存在")
-        return False
+        return 'failed', output_path, f"文件 '{input_path}' 不存在"
     
-    # 如果未提供输出路径，则生成一个
-    if output_path is None:
-        output_path = os.path.splitext(input_path)[0] + ".mp3"
+    base_path = os.path.splitext(input_path)[0]
     
-    # 检查输出文件是否已存在
-    if os.path.exists(output_path):
-        print(f"跳过: MP3文件已存在 '{output_path}'")
-        return True
+    # 检查输出文件是否已是最新（不调用ffprobe，重复运行时很快跳过）
+    candidates = [output_path] if output_path else [base_path + '.mp3']
+    if stream_copy and not output_path:
+        candidates.append(base_path + '.m4a')
+    for candidate in candidates:
+        if is_up_to_date(candidate, input_path):
+            return 'skipped', candidate, "输出文件已是最新"
     
     # 获取原始视频的音频信息
-    sample_rate = None
-    channels = None
-    bitrate = None
+    if audio_info is None:
+        try:
+            audio_info = probe_audio(input_path)
+        except Exception as e:
+            return 'failed', output_path, f"获取音频信息时出错: {e}"
+    if audio_info is None:
+        return 'failed', output_path, "未找到音频流"
+    codec, sample_rate, channels, bitrate = audio_info
     
-    try:
-        # 使用ffprobe获取音频信息（JSON格式）
-        cmd_probe = [
-            FFPROBE_PATH,
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_streams',
-            '-select_streams', 'a',
-            input_path
-        ]
-        
-        # 设置编码为UTF-8以避免解码错误
-        result = subprocess.run(cmd_probe, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-        
-        if result.returncode == 0 and result.stdout:
-            data = json.loads(result.stdout)
-            
-            if 'streams' in data and len(data['streams']) > 0:
-                stream = data['streams'][0]
-                sample_rate = stream.get('sample_rate')
-                channels = stream.get('channels')
-                
-                # 获取比特率
-                bitrate = stream.get('bit_rate')
-                if not bitrate:
-                    # 如果没有流级别的比特率，尝试获取格式级别的比特率
-                    cmd_format = [
-                        FFPROBE_PATH,
-                        '-v', 'quiet',
-                        '-print_format', 'json',
-                        '-show_format',
-                        input_path
-                    ]
-                    
-                    format_result = subprocess.run(cmd_format, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-                    if format_result.returncode == 0 and format_result.stdout:
-                        format_data = json.loads(format_result.stdout)
-                        bitrate = format_data.get('format', {}).get('bit_rate')
-        
-        print(f"检测到原始音频参数: 采样率={sample_rate}Hz, 通道数={channels}, 码率={bitrate}bps")
-        
-    except Exception as e:
-        print(f"获取音频信息时出错: {e}")
+    copy = stream_copy and codec in COPY_EXTENSIONS
+    if output_path is None:
+        output_path = base_path + (COPY_EXTENSIONS[codec] if copy else '.mp3')
+    
+    # 先写入临时文件（保留扩展名，ffmpeg据此选择输出格式），完成后再替换为目标文件
+    root, ext = os.path.splitext(output_path)
+    temp_path = root + '.part' + ext
     
     # 构建ffmpeg命令
-    cmd = [FFMPEG_PATH, '-i', input_path, '-vn', '-acodec', 'libmp3lame']
-    
-    # 添加音频参数（如果可用）
-    if sample_rate and sample_rate.isdigit() and int(sample_rate) > 0:
-        cmd.extend(['-ar', sample_rate])
-    if channels and str(channels).isdigit() and int(channels) > 0:
-        cmd.extend(['-ac', str(channels)])
-    if bitrate and bitrate.isdigit() and int(bitrate) > 0:
-        cmd.extend(['-b:a', bitrate])
+    if copy:
+        cmd = [FFMPEG_PATH, '-v', 'error', '-i', input_path, '-vn', '-c:a', 'copy']
+        if ext.lower() == '.m4a':
+            cmd.extend(['-movflags', '+faststart'])
     else:
-        cmd.extend(['-q:a', '0'])  # 最高质量
+        cmd = [FFMPEG_PATH, '-v', 'error', '-i', input_path, '-vn', '-acodec', 'libmp3lame']
+        
+        # 添加音频参数（如果可用）
+        if sample_rate and str(sample_rate).isdigit() and int(sample_rate) > 0:
+            cmd.extend(['-ar', str(sample_rate)])
+        if channels and str(channels).isdigit() and int(channels) > 0:
+            cmd.extend(['-ac', str(channels)])
+        if bitrate and str(bitrate).isdigit() and int(bitrate) > 0:
+            cmd.extend(['-b:a', str(bitrate)])
+        else:
+            cmd.extend(['-q:a', '0'])  # 最高质量
     
     cmd.append('-y')
-    cmd.append(output_path)
+    cmd.append(temp_path)
     
     # 执行转换
     try:
-        print(f"正在提取音频到: {output_path}")
-        
         # 设置编码为UTF-8以避免解码错误
         result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
         
         if result.returncode == 0:
-            print("转换完成!")
-            return True
-        else:
-            print(f"转换失败，返回码: {result.returncode}")
-            if result.stderr:
-                print(f"错误输出: {result.stderr}")
-            return False
+            os.replace(temp_path, output_path)
+            return ('copied' if copy else 'encoded'), output_path, f"编码={codec}, 采样率={sample_rate}Hz, 通道数={channels}, 码率={bitrate}bps"
+        return 'failed', output_path, f"返回码: {result.returncode} {result.stderr.strip()}"
     except Exception as e:
-        print(f"发生未知错误: {e}")
-        return False
+        return 'failed', output_path, f"发生未知错误: {e}"
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _extract_worker(task):
+    """进程池中执行的转换任务"""
+    input_path, stream_copy, audio_info = task
+    try:
+        return input_path, extract_audio_from_mp4(input_path, None, stream_copy, audio_info)
+    except Exception as e:
+        return input_path, ('failed', None, str(e))
 
-def process_directory(directory_path):
+def find_mp4_files(directory_path, recursive=False):
+    """查找目录中的所有MP4文件（完整路径）"""
+    if not recursive:
+        return sorted(
+            os.path.join(directory_path, f) for f in os.listdir(directory_path) if f.lower().endswith('.mp4')
+        )
+    
+    mp4_files = []
+    for dirpath, dirnames, filenames in os.walk(directory_path):
+        mp4_files.extend(os.path.join(dirpath, f) for f in filenames if f.lower().endswith('.mp4'))
+    return sorted(mp4_files)
+
+def load_catalog_audio(catalog_path, mp4_files):
+    """
+    从媒体目录读取音频参数，只使用与文件当前大小、修改时间一致的记录，返回 {文件路径: 音频参数}
+    媒体目录不存在或无法读取时返回空字典，所有文件改用ffprobe探测
     """
-    处理指定目录中的所有MP4文件
+    audio_infos = {}
+    # sqlite3.connect 会为不存在的路径创建空数据库，先确认文件存在
+    if not os.path.isfile(catalog_path):
+        print(f"媒体目录 '{catalog_path}' 不存在，将使用ffprobe探测")
+        return audio_infos
+    
+    conn = sqlite3.connect(catalog_path)
+    try:
+        for mp4_file in mp4_files:
+            stat = os.stat(mp4_file)
+            row = conn.execute(
+                "SELECT audio_codec, audio_sample_rate, audio_channels, coalesce(audio_bit_rate, bit_rate) "
+                "FROM media WHERE path = ? AND size = ? AND mtime_ns = ? AND error IS NULL AND audio_codec IS NOT NULL",
+                (os.path.abspath(mp4_file), stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+            if row:
+                audio_infos[mp4_file] = tuple(str(value) if value is not None else None for value in row)
+    except sqlite3.OperationalError as e:
+        print(f"无法读取媒体目录 '{catalog_path}'，将使用ffprobe探测: {e}")
+        return {}
+    finally:
+        conn.close()
+    return audio_infos
+
+def process_directory(directory_path, workers=MAX_WORKERS, stream_copy=STREAM_COPY,
+                      recursive=RECURSIVE, catalog_path=CATALOG_PATH):
+    """
+    并发处理指定目录中的所有MP4文件
     
     Args:
         directory_path (str): 要处理的目录路径
+        workers (int, optional): 同时进行的转换数，默认为CPU核心数
+        stream_copy (bool): 音频已经是MP3/AAC时直接复制音频流
+        recursive (bool): 是否处理子目录
+        catalog_path (str, optional): 媒体目录路径，使用其中的音频参数代替ffprobe
     """
     # 检查目录是否存在
     if not os.path.isdir(directory_path):
@@ -131,8 +213,7 @@ def process_directory(directory_path):
     
     # 查找所有MP4文件
     try:
-        files = os.listdir(directory_path)
-        mp4_files = [f for f in files if f.lower().endswith('.mp4')]
+        mp4_files = find_mp4_files(directory_path, recursive)
     except Exception as e:
         print(f"无法读取目录中的文件列表: {e}")
         return
@@ -143,14 +224,35 @@ def process_directory(directory_path):
     
     print(f"找到 {len(mp4_files)} 个MP4文件")
     
-    # 处理每个MP4文件
-    for mp4_file in mp4_files:
-        try:
-            input_path = os.path.join(directory_path, mp4_file)
-            print(f"\n处理文件: {mp4_file}")
-            extract_audio_from_mp4(input_path)
-        except Exception as e:
-            print(f"处理文件 {mp4_file} 时出错: {e}")
+    audio_infos = {}
+    if catalog_path:
+        audio_infos = load_catalog_audio(catalog_path, mp4_files)
+        print(f"媒体目录中已有 {len(audio_infos)} 个文件的音频参数")
+    
+    # 每个转换都是独立的ffmpeg进程，在进程池中并发执行
+    counts = {'copied': 0, 'encoded': 0, 'skipped': 0, 'failed': 0}
+    start_time = time.perf_counter()
+    tasks = [(mp4_file, stream_copy, audio_infos.get(mp4_file)) for mp4_file in mp4_files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_extract_worker, task) for task in tasks]
+        for index, future in enumerate(as_completed(futures), 1):
+            input_path, (status, output_path, message) = future.result()
+            counts[status] += 1
+            name = os.path.basename(input_path)
+            if status == 'failed':
+                print(f"[{index}/{len(tasks)}] 失败: {name} - {message}")
+            elif status == 'skipped':
+                print(f"[{index}/{len(tasks)}] 跳过: {name}（{message}）")
+            else:
+                action = '复制音频流' if status == 'copied' else '重新编码'
+                print(f"[{index}/{len(tasks)}] {action}: {name} -> {os.path.basename(output_path)}（{message}）")
+    
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"\n处理完成（用时 {elapsed:.1f} 秒）: 复制音频流 {counts['copied']} 个，重新编码 {counts['encoded']} 个，"
+        f"已是最新跳过 {counts['skipped']} 个，失败 {counts['failed']} 个"
+    )
+    return counts
 
 if __name__ == "__main__":
     
@@ -5,20 +5,25 @@ import json
 from urllib.parse import urlparse, parse_qs
 import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 设置FFmpeg和FFprobe的绝对路径（请根据你的实际安装路径修改）
 # 下载路径 https://ffmpeg.org/download.html#get-packages
 FFMPEG_PATH = r"C:\Program File\ffmpeg\bin\ffmpeg.exe"  # 替换为你的ffmpeg.exe绝对路径
 FFPROBE_PATH = r"C:\Program File\ffmpeg\bin\ffprobe.exe"  # 替换为你的ffprobe.exe绝对路径
 SAVE_PATH = r"C:\Users\chru\Desktop\1"  # 可以修改为任意路径
+# 可以直接复制的音频编码及对应的输出扩展名（B站视频的音频一般是AAC）
+COPY_EXTENSIONS = {'mp3': '.mp3', 'aac': '.m4a'}
 
 class BilibiliVideoDownloader:
-    def __init__(self, save_path="./downloads"):
+    def __init__(self, save_path="./downloads", stream_copy=False):
         """
         初始化下载器
         :param save_path: 视频保存路径
+        :param stream_copy: 音频已经是MP3/AAC时直接复制音频流（AAC保存为.m4a），不重新编码为MP3
         """
         self.save_path = save_path
+        self.stream_copy = stream_copy
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -112,12 +117,54 @@ class BilibiliVideoDownloader:
             filename = filename[:100]
         return filename
 
-    def convert_mp4_to_mp3(self, mp4_path):
+    def probe_audio_codec(self, mp4_path):
+        """
+        获取第一条音频流的编码名称
+        :param mp4_path: MP4文件路径
+        :return: 编码名称（如aac），获取失败返回None
+        """
+        cmd = [
+            FFPROBE_PATH,
+            '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=codec_name',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            mp4_path
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+        except OSError:
+            return None
+        codec = result.stdout.strip().splitlines()
+        return codec[0] if result.returncode == 0 and codec else None
+
+    def find_audio_output(self, mp4_path):
+        """
+        查找已是最新的音频文件（存在且不早于MP4文件），重复转换时直接跳过
+        :param mp4_path: MP4文件路径
+        :return: 已有的音频文件路径，没有时返回None
+        """
+        base_path = os.path.splitext(mp4_path)[0]
+        extensions = ['.mp3', '.m4a'] if self.stream_copy else ['.mp3']
+        for ext in extensions:
+            audio_path = base_path + ext
+            if (
+                os.path.exists(audio_path) and os.path.getsize(audio_path) > 0
+                and os.path.getmtime(audio_path) >= os.path.getmtime(mp4_path)
+            ):
+                return audio_path
+        return None
+
+    def convert_mp4_to_mp3(self, mp4_path, stream_copy=None):
         """
         将MP4文件转换为MP3文件
         :param mp4_path: MP4文件路径
-        :return: MP3文件路径，如果转换失败返回None
+        :param stream_copy: 是否直接复制MP3/AAC音频流（None时使用初始化时的设置）
+        :return: 音频文件路径（直接复制AAC时为.m4a），如果转换失败返回None
         """
+        if stream_copy is None:
+            stream_copy = self.stream_copy
+        
         if not os.path.exists(self.ffmpeg_path):
             print("ffmpeg未找到，无法进行MP3转换")
             return None
@@ -126,27 +173,53 @@ class BilibiliVideoDownloader:
             print(f"MP4文件不存在: {mp4_path}")
             return None
         
+        # 已经转换过且MP4文件没有更新时直接使用
+        existing_path = self.find_audio_output(mp4_path)
+        if existing_path:
+            print(f"音频文件已是最新，跳过转换: {existing_path}")
+            return existing_path
+        
         # 生成MP3文件路径（同目录，同名，扩展名为.mp3）
         mp3_path = os.path.splitext(mp4_path)[0] + '.mp3'
         
+        # 音频已是MP3/AAC时可以直接复制音频流，几乎只受磁盘速度限制
+        codec = self.probe_audio_codec(mp4_path) if stream_copy else None
+        copy = codec in COPY_EXTENSIONS
+        if copy:
+            mp3_path = os.path.splitext(mp4_path)[0] + COPY_EXTENSIONS[codec]
+        
+        # 先写入临时文件，完成后再替换，中断时不会留下不完整的音频文件
+        root, ext = os.path.splitext(mp3_path)
+        temp_path = root + '.part' + ext
+        
         try:
-            print("开始转换MP4为MP3...")
+            print("开始转换MP4为MP3..." if not copy else f"开始复制{codec}音频流...")
             
             # 构建ffmpeg命令
             # -i 输入文件
             # -vn 不处理视频流
-            # -acodec libmp3lame 使用MP3编码器
+            # -acodec libmp3lame 使用MP3编码器（-c:a copy 直接复制音频流）
             # -q:a 0 最高音频质量（0-9，0为最高）
             # -y 覆盖输出文件
-            cmd = [
-                self.ffmpeg_path,
-                '-i', mp4_path,
-                '-vn',  # 不包含视频
-                '-acodec', 'libmp3lame',  # 使用MP3编码
-                '-q:a', '0',  # 最高音频质量
-                '-y',  # 覆盖已存在文件
-                mp3_path
-            ]
+            if copy:
+                cmd = [
+                    self.ffmpeg_path,
+                    '-i', mp4_path,
+                    '-vn',  # 不包含视频
+                    '-c:a', 'copy',  # 直接复制音频流
+                    '-y',  # 覆盖已存在文件
+                    temp_path
+                ]
+            else:
+                cmd = [
+                    self.ffmpeg_path,
+                    '-i', mp4_path,
+                    '-vn',  # 不包含视频
+                    '-acodec', 'libmp3lame',  # 使用MP3编码
+                    '-q:a', '0',  # 最高音频质量
+                    '-y',  # 覆盖已存在文件
+                    temp_path
+                ]
             
             # 修复编码问题：使用subprocess.Popen并指定正确的编码
             # 在Windows上使用'utf-8'编码，并忽略错误
@@ -162,6 +235,7 @@ class BilibiliVideoDownloader:
             stdout, stderr = process.communicate(timeout=300)
             
             if process.returncode == 0:
+                os.replace(temp_path, mp3_path)
                 print(f"MP3转换完成: {mp3_path}")
                 return mp3_path
             else:
@@ -172,6 +246,9 @@ class BilibiliVideoDownloader:
                 return None
                 
         except subprocess.TimeoutExpired:
+            # 结束ffmpeg进程，否则它会继续写入临时文件（Windows上临时文件被占用时也无法删除）
+            process.kill()
+            process.communicate()
             print("MP3转换超时")
             return None
         except UnicodeDecodeError as e:
@@ -180,6 +257,7 @@ class BilibiliVideoDownloader:
             try:
                 result = subprocess.run(cmd, timeout=300, check=True)
                 if result.returncode == 0:
+                    os.replace(temp_path, mp3_path)
                     print(f"MP3转换完成: {mp3_path}")
                     return mp3_path
                 else:
@@ -194,6 +272,34 @@ class BilibiliVideoDownloader:
         except Exception as e:
             print(f"MP3转换过程中发生错误: {e}")
             return None
+        finally:
+            try:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            except OSError as e:
+                print(f"无法删除临时文件 {temp_path}: {e}")
+
+    def convert_all(self, mp4_paths, workers=None):
+        """
+        并发转换多个MP4文件（每个转换是独立的ffmpeg进程，线程只负责等待）
+        :param mp4_paths: MP4文件路径列表
+        :param workers: 同时进行的转换数，默认为CPU核心数
+        :return: {MP4文件路径: 音频文件路径或None}
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            futures = {executor.submit(self.convert_mp4_to_mp3, path): path for path in mp4_paths}
+            for future in as_completed(futures):
+                # 单个文件的意外错误只记为失败，不中断整批转换
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"转换 {futures[future]} 时发生错误: {e}")
+                    results[futures[future]] = None
+        
+        failed = sum(1 for audio_path in results.values() if audio_path is None)
+        print(f"批量转换完成: 成功 {len(results) - failed} 个，失败 {failed} 个")
+        return results
 
     def download_video(self, video_url, filename):
         """
@@ -274,14 +380,25 @@ class BilibiliVideoDownloader:
 
 def main():
     parser = argparse.ArgumentParser(description='B站视频下载工具')
-    parser.add_argument('input', help='B站视频BV号或URL（可以带有查询参数）')
+    parser.add_argument('input', help='B站视频BV号或URL（可以带有查询参数），或包含已下载MP4文件的目录（批量转换）')
     parser.add_argument('-o', '--output', default='./downloads', help='视频保存路径，默认为./downloads')
     parser.add_argument('--no-convert', action='store_true', help='不自动转换为MP3')
+    parser.add_argument('--copy-audio', action='store_true', help='音频已是MP3/AAC时直接复制音频流，不重新编码')
+    parser.add_argument('--workers', type=int, default=None, help='批量转换时同时进行的转换数')
     
     args = parser.parse_args()
     
     try:
-        downloader = BilibiliVideoDownloader(args.output)
+        if os.path.isdir(args.input):
+            # 批量转换目录中已下载的MP4文件
+            downloader = BilibiliVideoDownloader(args.input, stream_copy=args.copy_audio)
+            mp4_paths = [
+                os.path.join(args.input, name) for name in sorted(os.listdir(args.input))
+                if name.lower().endswith('.mp4')
+            ]
+            downloader.convert_all(mp4_paths, args.workers)
+            return
+        downloader = BilibiliVideoDownloader(args.output, stream_copy=args.copy_audio)
         downloader.download(args.input, convert_to_mp3=not args.no_convert)
     except Exception as e:
         print(f"下载失败: {e}")
@@ -1,53 +1,270 @@
 import os
 import re
+import sys
+import time
+import sqlite3
+import threading
 import requests
-import json
-
-def NetEaseCacheToMp3(path):
-    # 初始化一个字典，用于将歌曲ID映射到文件名
-    id2file = {}
-    # 获取指定路径下的所有文件列表
-    files = os.listdir(path)
-    # 遍历路径中的每个文件
-    for file in files:
-        # 检查文件是否以'.uc'结尾
-        if file.endswith('.uc'):
-            # 使用正则表达式匹配文件名中的数字部分
-            match_inst = re.match('\d*', file)
-            # 如果匹配成功，获取歌曲ID
-            if match_inst:
-                song_id = match_inst.group()
-                # 构建歌曲详情的URL
-                url = f'http://music.163.com/api/song/detail/?id={song_id}&ids=%5B{song_id}%5D'
-                # 发送HTTP GET请求获取歌曲详情
-                response = requests.get(url)
-                # 解析响应内容为JSON格式
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 歌曲详情接口，ids参数可一次查询多首歌曲（测试时可指向本地的模拟HTTP服务）
+SONG_DETAIL_API = 'http://music.163.com/api/song/detail/'
+# 每次请求查询的歌曲数量
+BATCH_SIZE = 50
+# 同时进行的请求数
+MAX_WORKERS = 4
+# 每秒最多发起的请求数
+REQUESTS_PER_SECOND = 5.0
+# UC缓存文件的异或密钥，以及对应的字节转换表（bytes.translate以C的速度逐字节替换）
+XOR_KEY = 0xa3
+XOR_TABLE = bytes(b ^ XOR_KEY for b in range(256))
+# 流式转换时每次读取的块大小
+CHUNK_SIZE = 1024 * 1024
+# Windows文件名中不允许出现的字符
+INVALID_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|]')
+# 歌曲信息缓存（同一歌曲ID的名称与歌手不会变化，已查询过的ID不再请求网络）
+METADATA_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'netease_song_cache.db')
+# 缓存有效期：查询成功的歌曲，以及接口未返回的歌曲ID（负缓存，过期后重新查询）
+CACHE_TTL = 180 * 24 * 3600
+NEGATIVE_CACHE_TTL = 24 * 3600
+
+class RateLimiter:
+    """线程安全的限速器：保证相邻两次请求的间隔不小于 1/rate 秒"""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+    
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+class SongDetailClient:
+    """批量、并发、限速的歌曲详情查询客户端"""
+    
+    def __init__(self, api_url=SONG_DETAIL_API, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS,
+                 rate=REQUESTS_PER_SECOND, timeout=10, retries=2):
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate)
+        self.timeout = timeout
+        self.retries = retries
+        # requests.Session 不保证线程安全，每个线程使用各自的会话（复用连接）
+        self._local = threading.local()
+    
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+    
+    def fetch_batch(self, song_ids):
+        """查询一批歌曲，返回 {歌曲ID: (歌曲名称, 歌手名称)}，查询不到的ID不在结果中，请求失败时返回None"""
+        params = {'ids': '[' + ','.join(song_ids) + ']'}
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            try:
+                response = self._session().get(self.api_url, params=params, timeout=self.timeout)
+                response.raise_for_status()
                 jsons = response.json()
-                # 获取歌曲名称
-                song_name = jsons['songs'][0]['name']
-                # 获取歌手名称
-                singer_name = jsons['songs'][0]['artists'][0]['name']
-                # 构建完整的文件路径
-                full_file_path = os.path.join(path, file)
-                # 以二进制读取模式打开UC文件
-                with open(full_file_path, 'rb') as f:
-                    # 读取UC文件内容
-                    uc_content = f.read()
-                    # 将UC文件内容转换为字节数组
-                    mp3_content = bytearray(uc_content)
-                    # 对字节数组中的每个字节进行异或操作，以转换格式
-                    for i in range(len(uc_content)):
-                        mp3_content[i] ^= 0xa3
-                # 构建转换后的MP3文件名
-                mp3_file_name = f'{path}/{singer_name} - {song_name}.mp3'
-                # 以二进制写入模式打开新的MP3文件
-                with open(mp3_file_name, 'wb') as mp3_file:
-                    # 将转换后的内容写入MP3文件
-                    mp3_file.write(mp3_content)
-                    # 打印成功转换的MP3文件名
-                    print(f'success {mp3_file_name}')
-
-# 指定歌曲缓存路径
-path = r'C:/Users/chru/Downloads/Cache/'
-# 调用函数开始处理歌曲文件
-NetEaseCacheToMp3(path)
+                # 限流等错误也会以HTTP 200返回（如 {"code": -460}），按请求失败处理，避免整批歌曲被记为负缓存
+                if jsons.get('code') != 200:
+                    raise ValueError(f"接口返回错误码 {jsons.get('code')}")
+                break
+            except (requests.RequestException, ValueError) as e:
+                if attempt == self.retries:
+                    print(f'查询歌曲信息失败 {song_ids[0]} 等 {len(song_ids)} 首: {e}')
+                    return None
+                # 失败后稍等再重试
+                time.sleep(0.5 * (attempt + 1))
+        
+        details = {}
+        for song in jsons.get('songs') or []:
+            # 歌手取第一位，与单首查询时的命名一致
+            artists = song.get('artists') or [{}]
+            details[str(song.get('id'))] = (song.get('name', ''), artists[0].get('name', ''))
+        return details
+    
+    def fetch_all(self, song_ids):
+        """按批次并发查询，每完成一批就产出 (该批歌曲ID列表, 查询结果或None)"""
+        batches = [song_ids[i:i + self.batch_size] for i in range(0, len(song_ids), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+class SongMetadataCache:
+    """歌曲信息的本地缓存（SQLite），带有效期，并记录接口查询不到的歌曲ID"""
+    
+    def __init__(self, cache_path=METADATA_CACHE_PATH, ttl=CACHE_TTL, negative_ttl=NEGATIVE_CACHE_TTL):
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS songs ('
+            'song_id TEXT PRIMARY KEY, song_name TEXT, singer_name TEXT, '
+            'found INTEGER, fetched_at REAL)'
+        )
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+    
+    def lookup(self, song_ids, offline=False):
+        """查询缓存，返回 ({歌曲ID: (歌曲名称, 歌手名称)}, 需要请求网络的歌曲ID列表)
+        
+        离线模式下忽略有效期，所有缓存过的名称都可以使用
+        """
+        now = time.time()
+        details = {}
+        missing = []
+        for i in range(0, len(song_ids), 500):
+            batch = song_ids[i:i + 500]
+            rows = self.conn.execute(
+                f'SELECT song_id, song_name, singer_name, found, fetched_at FROM songs '
+                f'WHERE song_id IN ({",".join("?" * len(batch))})',
+                batch
+            ).fetchall()
+            cached = {row[0]: row[1:] for row in rows}
+            for song_id in batch:
+                row = cached.get(song_id)
+                if row is None:
+                    missing.append(song_id)
+                    continue
+                song_name, singer_name, found, fetched_at = row
+                age = now - fetched_at
+                if found and (offline or age < self.ttl):
+                    details[song_id] = (song_name, singer_name)
+                elif not found and (offline or age < self.negative_ttl):
+                    # 负缓存：有效期内不再查询，使用歌曲ID命名
+                    continue
+                else:
+                    missing.append(song_id)
+        return details, missing
+    
+    def store(self, song_ids, details):
+        """保存一批查询结果，接口未返回的歌曲ID记为负缓存"""
+        now = time.time()
+        rows = []
+        for song_id in song_ids:
+            if song_id in details:
+                song_name, singer_name = details[song_id]
+                rows.append((song_id, song_name, singer_name, 1, now))
+            else:
+                rows.append((song_id, None, None, 0, now))
+        self.conn.executemany('INSERT OR REPLACE INTO songs VALUES (?, ?, ?, ?, ?)', rows)
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
+
+def collect_uc_files(path):
+    """收集路径下的UC缓存文件，返回 {歌曲ID: [文件路径, ...]}"""
+    id2files = {}
+    for file in sorted(os.listdir(path)):
+        # 检查文件是否以'.uc'结尾
+        if not file.endswith('.uc'):
+            continue
+        # 使用正则表达式匹配文件名开头的数字部分作为歌曲ID
+        match_inst = re.match(r'\d+', file)
+        if match_inst:
+            id2files.setdefault(match_inst.group(), []).append(os.path.join(path, file))
+    return id2files
+
+def convert_uc_file(uc_file_path, mp3_file_path):
+    """流式转换单个UC文件：分块读取、查表异或后直接写出，内存占用与文件大小无关"""
+    # 先写入临时文件，完成后再替换为目标文件，中断时不会留下不完整的MP3
+    temp_path = mp3_file_path + '.part'
+    try:
+        with open(uc_file_path, 'rb') as f, open(temp_path, 'wb') as mp3_file:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                mp3_file.write(chunk.translate(XOR_TABLE))
+        os.replace(temp_path, mp3_file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def build_mp3_name(song_id, detail):
+    """根据歌曲信息构建MP3文件名，查询不到时使用歌曲ID"""
+    if not detail:
+        return f'{song_id}.mp3'
+    song_name, singer_name = detail
+    name = f'{singer_name} - {song_name}'
+    return INVALID_FILENAME_CHARS.sub('_', name).strip() + '.mp3'
+
+def resolve_song_details(song_ids, client, cache=None, offline=False):
+    """依次产出 (歌曲ID列表, 歌曲信息)：先产出缓存命中的部分，再按批次产出网络查询的结果"""
+    if cache is not None:
+        details, missing = cache.lookup(song_ids, offline)
+        print(f'歌曲信息缓存: 命中 {len(song_ids) - len(missing)} 首，需要查询 {len(missing)} 首')
+        missing_ids = set(missing)
+        cached_ids = [song_id for song_id in song_ids if song_id not in missing_ids]
+        if cached_ids:
+            yield cached_ids, details
+    else:
+        missing = song_ids
+    
+    if not missing:
+        return
+    
+    if offline:
+        # 离线模式不请求网络，未缓存的歌曲使用歌曲ID命名
+        print(f'离线模式: {len(missing)} 首歌曲没有缓存信息，将使用歌曲ID命名')
+        yield missing, {}
+        return
+    
+    for batch, details in client.fetch_all(missing):
+        if details is None:
+            # 请求失败（网络问题等）不写入缓存，下次运行重新查询
+            yield batch, {}
+            continue
+        if cache is not None:
+            cache.store(batch, details)
+        yield batch, details
+
+def NetEaseCacheToMp3(path, client=None, cache=None, offline=False):
+    # 获取指定路径下的所有UC文件，按歌曲ID分组
+    id2files = collect_uc_files(path)
+    if not id2files:
+        print(f'未找到UC缓存文件: {path}')
+        return 0
+    
+    client = client or SongDetailClient()
+    converted = 0
+    # 缓存命中的歌曲直接转换；其余按批次并发查询，每返回一批就立即转换这批文件（网络请求与磁盘写入重叠进行）
+    for song_ids, details in resolve_song_details(list(id2files), client, cache, offline):
+        for song_id in song_ids:
+            mp3_name = build_mp3_name(song_id, details.get(song_id))
+            for index, uc_file_path in enumerate(id2files[song_id]):
+                # 同一首歌的多个缓存文件（不同音质）依次加上序号，避免互相覆盖
+                if index:
+                    mp3_file_name = os.path.join(path, f'{mp3_name[:-4]} ({index}).mp3')
+                else:
+                    mp3_file_name = os.path.join(path, mp3_name)
+                try:
+                    convert_uc_file(uc_file_path, mp3_file_name)
+                except OSError as e:
+                    print(f'failed {uc_file_path}: {e}')
+                    continue
+                # 打印成功转换的MP3文件名
+                print(f'success {mp3_file_name}')
+                converted += 1
+    
+    return converted
+
+if __name__ == '__main__':
+    # 指定歌曲缓存路径（也可以通过命令行参数传入）；--offline 只使用已缓存的歌曲信息，不请求网络
+    args = [arg for arg in sys.argv[1:] if arg != '--offline']
+    offline = '--offline' in sys.argv[1:]
+    path = args[0] if args else r'C:/Users/chru/Downloads/Cache/'
+    # 调用函数开始处理歌曲文件
+    cache = SongMetadataCache()
+    try:
+        NetEaseCacheToMp3(path, cache=cache, offline=offline)
+    finally:
+        cache.close()
@@ -1,9 +1,20 @@
 import subprocess
 import os
+import atexit
+import glob
+import json
+import time
 import logging
 import math
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Callable
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,21 +36,49 @@ def parse_frame_rate(frame_rate_str: str) -> float:
             logger.warning(f"无法解析帧率: {frame_rate_str}")
             return 30.0  # 默认值
 
-def get_video_info(video_path: str, ffprobe_path: str) -> Dict[str, str]:
-    """获取视频信息"""
+# ffprobe结果缓存文件（与本脚本同目录）
+PROBE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ffprobe_cache.json")
+
+def probe_media(video_path: str, ffprobe_path: str) -> Dict[str, str]:
+    """调用ffprobe一次获取视频流、音频流与容器信息
+    
+    视频流字段与原先一致（width/height/avg_frame_rate/duration/bit_rate/frame_rate_float），
+    音频流字段以 audio_ 开头，容器字段以 format_ 开头，所有值均为字符串
+    """
     try:
         cmd = [
             ffprobe_path,
             "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height,avg_frame_rate,duration,bit_rate",
-            "-of", "default=noprint_wrappers=1",
+            "-show_entries",
+            "stream=codec_type,codec_name,width,height,avg_frame_rate,duration,bit_rate,channels,sample_rate"
+            ":format=duration,bit_rate",
+            "-of", "json",
             video_path,
         ]
         result = subprocess.run(
             cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
         )
-        info = dict(line.split("=") for line in result.stdout.splitlines())
+        data = json.loads(result.stdout)
+        streams = data.get('streams', [])
+        video = next((stream for stream in streams if stream.get('codec_type') == 'video'), {})
+        audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+        container = data.get('format', {})
+        
+        info = {}
+        for field in ('width', 'height', 'avg_frame_rate', 'duration', 'bit_rate', 'codec_name'):
+            if field in video:
+                info[field] = str(video[field])
+        if audio is not None:
+            for field in ('codec_name', 'channels', 'sample_rate', 'bit_rate', 'duration'):
+                if field in audio:
+                    info[f'audio_{field}'] = str(audio[field])
+        for field in ('duration', 'bit_rate'):
+            if field in container:
+                info[f'format_{field}'] = str(container[field])
+        
+        # 部分容器的视频流没有时长，使用容器时长
+        if info.get('duration', 'N/A') == 'N/A' and 'format_duration' in info:
+            info['duration'] = info['format_duration']
         
         # 计算帧率（处理分数形式的帧率）
         if 'avg_frame_rate' in info:
@@ -53,6 +92,141 @@ def get_video_info(video_path: str, ffprobe_path: str) -> Dict[str, str]:
         logger.error(f"处理视频信息时发生错误: {str(e)}")
         raise
 
+class ProbeCache:
+    """ffprobe结果缓存：以 路径+大小+修改时间 为键并保存到磁盘
+    
+    同一文件在各个阶段（任务生成、CRF计算、每次编码尝试）以及重复运行时只调用一次ffprobe
+    新结果只在内存中标记，批处理结束或程序退出时调用 save 一次性写入磁盘
+    """
+    
+    def __init__(self, path: str = PROBE_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, str]] = {}
+        # 正在调用ffprobe的键：并发任务探测同一文件时，后来者等待第一次探测完成后直接使用其结果
+        self.inflight: Dict[str, threading.Event] = {}
+        self.hits = 0
+        self.misses = 0
+        self.catalog: Optional[sqlite3.Connection] = None
+        self.dirty = False
+        
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法读取ffprobe缓存，将重新生成: {e}")
+        
+        # 删除已不存在的文件（临时输出、分段文件、已删除的视频）的记录，避免缓存无限增长
+        stale = [key for key in self.entries if not os.path.exists(key.rsplit('|', 2)[0])]
+        for key in stale:
+            del self.entries[key]
+        self.dirty = bool(stale)
+    
+    def attach_catalog(self, catalog_path: str) -> None:
+        """使用媒体目录（输出视频相关参数(ffmpeg).py 生成）中的探测结果，文件未变化时不再调用ffprobe"""
+        self.catalog = sqlite3.connect(catalog_path, check_same_thread=False)
+    
+    def _from_catalog(self, video_path: str) -> Optional[Dict[str, str]]:
+        """从媒体目录读取与文件当前大小、修改时间一致的记录，转换为probe_media的字段格式"""
+        stat = os.stat(video_path)
+        row = self.catalog.execute(
+            "SELECT video_codec, width, height, avg_frame_rate, video_duration, video_bit_rate, "
+            "audio_codec, audio_channels, audio_sample_rate, audio_bit_rate, audio_duration, "
+            "duration, bit_rate FROM media "
+            "WHERE path = ? AND size = ? AND mtime_ns = ? AND error IS NULL AND video_codec IS NOT NULL",
+            (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        fields = [
+            'codec_name', 'width', 'height', 'avg_frame_rate', 'duration', 'bit_rate',
+            'audio_codec_name', 'audio_channels', 'audio_sample_rate', 'audio_bit_rate', 'audio_duration',
+            'format_duration', 'format_bit_rate',
+        ]
+        info = {field: str(value) for field, value in zip(fields, row) if value is not None}
+        if 'duration' not in info and 'format_duration' in info:
+            info['duration'] = info['format_duration']
+        if 'avg_frame_rate' in info:
+            info['frame_rate_float'] = str(parse_frame_rate(info['avg_frame_rate']))
+        return info
+    
+    @staticmethod
+    def make_key(video_path: str) -> str:
+        stat = os.stat(video_path)
+        return f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    
+    def get(self, video_path: str, ffprobe_path: str) -> Dict[str, str]:
+        key = self.make_key(video_path)
+        while True:
+            with self.lock:
+                info = self.entries.get(key)
+                if info is not None:
+                    self.hits += 1
+                    return dict(info)
+                pending = self.inflight.get(key)
+                if pending is None:
+                    info = self._from_catalog(video_path) if self.catalog is not None else None
+                    if info is not None:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+                        pending = threading.Event()
+                        self.inflight[key] = pending
+                    break
+            # 其他任务正在探测同一文件，等待其完成后重新查缓存（探测失败时由本任务重新探测）
+            pending.wait()
+        
+        try:
+            if info is None:
+                info = probe_media(video_path, ffprobe_path)
+            
+            with self.lock:
+                # 文件变化后旧的记录不再有效
+                prefix = key.rsplit('|', 2)[0] + '|'
+                for old_key in [old_key for old_key in self.entries if old_key.startswith(prefix)]:
+                    del self.entries[old_key]
+                self.entries[key] = info
+                self.dirty = True
+        finally:
+            if pending is not None:
+                with self.lock:
+                    del self.inflight[key]
+                pending.set()
+        return dict(info)
+    
+    def save(self) -> None:
+        """有新记录时写入磁盘（先写临时文件再替换，避免中断时损坏缓存）"""
+        with self.lock:
+            if not self.dirty:
+                return
+            temp_path = self.path + ".tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+                self.dirty = False
+            except OSError as e:
+                logger.warning(f"无法保存ffprobe缓存: {e}")
+
+# 全局ffprobe缓存（首次使用时加载）
+_probe_cache: Optional[ProbeCache] = None
+_probe_cache_lock = threading.Lock()
+
+def get_probe_cache() -> ProbeCache:
+    global _probe_cache
+    with _probe_cache_lock:
+        if _probe_cache is None:
+            _probe_cache = ProbeCache()
+            # 中断或异常退出时也保存已有的探测结果
+            atexit.register(_probe_cache.save)
+        return _probe_cache
+
+def get_video_info(video_path: str, ffprobe_path: str) -> Dict[str, str]:
+    """获取视频信息（优先使用ffprobe缓存）"""
+    return get_probe_cache().get(video_path, ffprobe_path)
+
 def calculate_scaled_dimensions(
     original_width: int, 
     original_height: int, 
@@ -93,6 +267,152 @@ def calculate_scaled_dimensions(
     
     return scaled_width, scaled_height
 
+def resolve_output_params(
+    video_info: Dict[str, str],
+    target_width: int,
+    target_height: int,
+    target_frame_rate: int,
+    keep_aspect_ratio: bool = True
+) -> Tuple[int, int, float]:
+    """根据原始视频信息确定实际输出的分辨率与帧率"""
+    original_width = int(video_info['width'])
+    original_height = int(video_info['height'])
+    original_frame_rate = float(video_info.get('frame_rate_float', 30.0))
+    
+    # 确定实际使用的帧率（取原始帧率和目标帧率中较小的）
+    actual_frame_rate = min(original_frame_rate, target_frame_rate)
+    
+    # 计算实际使用的分辨率
+    actual_width, actual_height = calculate_scaled_dimensions(
+        original_width, original_height, target_width, target_height, keep_aspect_ratio
+    )
+    return actual_width, actual_height, actual_frame_rate
+
+def build_encode_command(
+    ffmpeg_path: str,
+    input_path: str,
+    output_path: str,
+    width: int,
+    height: int,
+    frame_rate: float,
+    crf: int,
+    bit: str,
+    ac: int,
+    threads: Optional[int] = None,
+    start: Optional[float] = None,
+    length: Optional[float] = None
+) -> List[str]:
+    """构建ffmpeg编码命令（完整编码与采样编码使用相同的参数）
+    
+    start/length: 只编码从start秒开始的length秒（采样时使用）
+    """
+    # -progress 输出结构化的进度信息（key=value），-nostats 关闭原有的进度行
+    cmd = [ffmpeg_path, "-progress", "pipe:1", "-nostats"]
+    if start is not None:
+        cmd += ["-ss", f"{start:.3f}"]
+    if length is not None:
+        cmd += ["-t", f"{length:.3f}"]
+    cmd += [
+        "-i", input_path,
+        "-vf", f"scale={width}:{height}",
+        "-r", str(frame_rate),
+        "-c:v", "libx264",
+        "-crf", str(crf),
+        "-preset", ENCODE_PRESET,
+        "-c:a", "aac",
+        "-b:a", bit,
+        "-ac", str(ac),
+    ]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd += [
+        "-y",  # 自动覆盖输出文件
+        output_path,
+    ]
+    return cmd
+
+# x264编码预设（所有编码使用同一预设，并记录在性能日志中）
+ENCODE_PRESET = "fast"
+# -progress 输出中的进度字段，其余行是ffmpeg的普通日志
+PROGRESS_KEYS = {
+    'frame', 'fps', 'stream_0_0_q', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms',
+    'out_time', 'dup_frames', 'drop_frames', 'speed',
+}
+
+@dataclass
+class ProgressEvent:
+    """ffmpeg -progress 输出的一组进度信息"""
+    frame: int = 0
+    fps: float = 0.0
+    out_time: float = 0.0  # 已编码的媒体时长（秒）
+    speed: float = 0.0  # 编码速度（相对于实时播放的倍数）
+    size: int = 0  # 已输出的字节数
+    done: bool = False  # 编码结束（progress=end）
+
+def _progress_number(value: Optional[str]) -> float:
+    """解析进度字段的数值，N/A等无效值返回0"""
+    try:
+        return float((value or '0').rstrip('x'))
+    except ValueError:
+        return 0.0
+
+class ProgressParser:
+    """解析 -progress pipe:1 的 key=value 输出，每遇到一行 progress= 产出一个事件"""
+    
+    def __init__(self, keep_messages: int = 20):
+        self.fields: Dict[str, str] = {}
+        self.messages = deque(maxlen=keep_messages)  # 最近的普通日志，失败时用于显示原因
+    
+    def feed(self, line: str) -> Optional[ProgressEvent]:
+        key, sep, value = line.strip().partition('=')
+        if key == 'progress' and sep:
+            fields, self.fields = self.fields, {}
+            return ProgressEvent(
+                frame=int(_progress_number(fields.get('frame'))),
+                fps=_progress_number(fields.get('fps')),
+                out_time=_progress_number(fields.get('out_time_us')) / 1e6,
+                speed=_progress_number(fields.get('speed')),
+                size=int(_progress_number(fields.get('total_size'))),
+                done=value.strip() == 'end'
+            )
+        if sep and key in PROGRESS_KEYS:
+            self.fields[key] = value.strip()
+        elif line.strip():
+            self.messages.append(line.strip())
+        return None
+
+def format_progress(event: ProgressEvent) -> str:
+    return (
+        f"frame={event.frame} fps={event.fps:.1f} time={event.out_time:.1f}s "
+        f"speed={event.speed:.2f}x size={event.size / 1024 / 1024:.1f}MB"
+    )
+
+def run_ffmpeg(cmd: List[str], progress_callback: Optional[Callable[[ProgressEvent], None]] = None) -> int:
+    """执行带 -progress pipe:1 的ffmpeg命令，把进度解析为事件传给回调（不提供回调时直接记录），返回退出码"""
+    process = subprocess.Popen(
+        cmd, 
+        stdout=subprocess.PIPE, 
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        bufsize=1
+    )
+    
+    # 实时处理进度信息
+    parser = ProgressParser()
+    for line in process.stdout:
+        event = parser.feed(line)
+        if event is None:
+            continue
+        if progress_callback:
+            progress_callback(event)
+        else:
+            logger.info(format_progress(event))
+    
+    returncode = process.wait()
+    if returncode != 0 and parser.messages:
+        logger.error("ffmpeg输出: " + " | ".join(parser.messages))
+    return returncode
+
 def calculate_optimal_crf(input_path, ffprobe_path, min_crf=23, max_crf=28):
     """根据原始视频的比特率计算最优CRF值"""
     try:
@@ -117,6 +437,164 @@ def calculate_optimal_crf(input_path, ffprobe_path, min_crf=23, max_crf=28):
     except:
         return 23  # 出错时使用默认值
 
+# 分段并行编码：时长不短于此值（秒）的视频才拆分
+SEGMENT_MIN_DURATION = 10 * 60
+# 输出与原视频之间允许的时长误差与音画偏差（秒）
+DURATION_TOLERANCE = 0.5
+
+def split_at_keyframes(
+    ffmpeg_path: str,
+    input_path: str,
+    segment_dir: str,
+    segment_count: int,
+    duration: float
+) -> List[str]:
+    """按关键帧把视频流无损切分为约segment_count段（流复制，切点落在目标时间之后的第一个关键帧）"""
+    segment_length = duration / segment_count
+    segment_times = ",".join(f"{segment_length * i:.3f}" for i in range(1, segment_count))
+    cmd = [
+        ffmpeg_path,
+        "-v", "error",
+        "-i", input_path,
+        "-map", "0:v:0",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_times", segment_times,
+        "-reset_timestamps", "1",
+        "-y",
+        os.path.join(segment_dir, "source_%03d.mp4"),
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"切分视频失败: {result.stdout.strip()}")
+    return sorted(
+        os.path.join(segment_dir, name) for name in os.listdir(segment_dir) if name.startswith("source_")
+    )
+
+def check_segmented_output(
+    input_info: Dict[str, str],
+    output_info: Dict[str, str],
+    tolerance: float = DURATION_TOLERANCE
+) -> Optional[str]:
+    """检查分段编码结果的时长与音画同步，正常时返回None，否则返回问题描述"""
+    def seconds(info: Dict[str, str], field: str) -> Optional[float]:
+        try:
+            return float(info[field])
+        except (KeyError, ValueError):
+            return None
+    
+    input_duration = seconds(input_info, 'format_duration') or seconds(input_info, 'duration')
+    output_duration = seconds(output_info, 'format_duration') or seconds(output_info, 'duration')
+    if input_duration is None or output_duration is None:
+        return "无法获取时长"
+    if abs(output_duration - input_duration) > tolerance:
+        return f"时长不一致: 原始 {input_duration:.2f}s，输出 {output_duration:.2f}s"
+    
+    # 音画偏差与原视频相比不应变大（原视频本身的音视频流时长可能就不完全相同）
+    input_video, input_audio = seconds(input_info, 'duration'), seconds(input_info, 'audio_duration')
+    output_video, output_audio = seconds(output_info, 'duration'), seconds(output_info, 'audio_duration')
+    if None not in (input_video, input_audio, output_video, output_audio):
+        drift = abs((output_video - output_audio) - (input_video - input_audio))
+        if drift > tolerance:
+            return f"音画不同步: 偏差 {drift:.2f}s"
+    return None
+
+def encode_segmented(
+    input_path: str,
+    output_path: str,
+    ffmpeg_path: str,
+    width: int,
+    height: int,
+    frame_rate: float,
+    crf: int,
+    bit: str,
+    ac: int,
+    segment_count: int,
+    threads: Optional[int] = None,
+    progress_callback: Optional[Callable[[ProgressEvent], None]] = None
+) -> bool:
+    """分段并行编码：按关键帧切分视频流，以相同参数并发编码各段，再用concat分离器无损拼接
+    
+    音频不切分，拼接时从原视频一次性编码，避免每段AAC的起始填充累积成音画偏差
+    """
+    ffprobe_path = ffmpeg_path.replace("ffmpeg.exe", "ffprobe.exe")
+    input_info = get_video_info(input_path, ffprobe_path)
+    duration = float(input_info['duration'])
+    
+    # 临时目录放在输出目录下，切分与拼接都在同一磁盘上进行（以输出文件名开头，中断后可找到并清理）
+    segment_prefix = "." + os.path.splitext(os.path.basename(output_path))[0] + ".segments_"
+    with tempfile.TemporaryDirectory(prefix=segment_prefix, dir=os.path.dirname(output_path) or ".") as segment_dir:
+        sources = split_at_keyframes(ffmpeg_path, input_path, segment_dir, segment_count, duration)
+        logger.info(f"分段并行编码: {os.path.basename(input_path)} 切分为 {len(sources)} 段")
+        
+        # 汇总各段的进度（位置、帧数、大小、fps与速度均为各段之和）转发给进度回调
+        events = [ProgressEvent() for _ in sources]
+        events_lock = threading.Lock()
+        
+        def encode(index: int) -> str:
+            encoded_path = os.path.join(segment_dir, f"encoded_{index:03d}.mp4")
+            
+            def on_event(event: ProgressEvent) -> None:
+                if not progress_callback:
+                    return
+                with events_lock:
+                    events[index] = event
+                    running = [e for e in events if not e.done]
+                    total = ProgressEvent(
+                        frame=sum(e.frame for e in events),
+                        fps=sum(e.fps for e in running),
+                        out_time=sum(e.out_time for e in events),
+                        speed=sum(e.speed for e in running),
+                        size=sum(e.size for e in events),
+                        done=not running
+                    )
+                progress_callback(total)
+            
+            cmd = build_encode_command(
+                ffmpeg_path, sources[index], encoded_path, width, height, frame_rate,
+                crf, bit, ac, threads
+            )
+            if run_ffmpeg(cmd, on_event) != 0:
+                raise RuntimeError(f"第 {index + 1} 段编码失败")
+            return encoded_path
+        
+        with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="segment") as executor:
+            encoded_paths = list(executor.map(encode, range(len(sources))))
+        
+        # concat分离器的文件列表（路径中的单引号需要转义）
+        list_path = os.path.join(segment_dir, "concat.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in encoded_paths:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        
+        cmd = [
+            ffmpeg_path,
+            "-v", "error",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_path,
+            "-i", input_path,
+            "-map", "0:v:0",
+            "-map", "1:a:0?",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-b:a", bit,
+            "-ac", str(ac),
+            "-y",
+            output_path,
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"拼接分段失败: {result.stdout.strip()}")
+    
+    problem = check_segmented_output(input_info, probe_media(output_path, ffprobe_path))
+    if problem:
+        logger.error(f"分段编码结果校验失败: {problem}")
+        os.remove(output_path)
+        return False
+    return True
+
 def optimize_video(
     input_path: str,
     output_path: str,
@@ -127,22 +605,23 @@ def optimize_video(
     crf: int = 23,
     bit: str = "64k",
     ac: int = 1,
-    keep_aspect_ratio: bool = True
+    keep_aspect_ratio: bool = True,
+    threads: Optional[int] = None,
+    progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+    segments: int = 1
 ) -> bool:
-    """优化视频"""
+    """优化视频
+    
+    threads: 编码线程数（并发运行多个ffmpeg时限制每个进程占用的核心数）
+    progress_callback: 进度回调，传入解析后的进度事件（不提供时直接记录进度）
+    segments: 大于1时，长视频拆分为多段并行编码
+    """
     try:
         # 确保输出目录存在
         output_dir = os.path.dirname(output_path)
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        # 如果输出文件已存在，询问是否覆盖
-        if os.path.exists(output_path):
-            response = input(f"文件 {output_path} 已存在，是否覆盖？(y/n): ")
-            if response.lower() != 'y':
-                logger.info(f"跳过已存在的文件: {output_path}")
-                return False
-        
         # 获取视频信息以确定实际使用的参数
         ffprobe_path = ffmpeg_path.replace("ffmpeg.exe", "ffprobe.exe")
         video_info = get_video_info(input_path, ffprobe_path)
@@ -151,12 +630,9 @@ def optimize_video(
         original_height = int(video_info['height'])
         original_frame_rate = float(video_info.get('frame_rate_float', 30.0))
         
-        # 确定实际使用的帧率（取原始帧率和目标帧率中较小的）
-        actual_frame_rate = min(original_frame_rate, target_frame_rate)
-        
-        # 计算实际使用的分辨率
-        actual_width, actual_height = calculate_scaled_dimensions(
-            original_width, original_height, target_width, target_height, keep_aspect_ratio
+        # 确定实际使用的分辨率与帧率
+        actual_width, actual_height, actual_frame_rate = resolve_output_params(
+            video_info, target_width, target_height, target_frame_rate, keep_aspect_ratio
         )
         
         logger.info(f"原始: {original_width}x{original_height} @ {original_frame_rate:.2f}fps")
@@ -164,39 +640,35 @@ def optimize_video(
         logger.info(f"实际: {actual_width}x{actual_height} @ {actual_frame_rate:.2f}fps")
         logger.info(f"使用CRF: {crf}")
         
-        # 构建ffmpeg命令
-        cmd = [
-            ffmpeg_path,
-            "-i", input_path,
-            "-vf", f"scale={actual_width}:{actual_height}",
-            "-r", str(actual_frame_rate),
-            "-c:v", "libx264",
-            "-crf", str(crf),
-            "-preset", "fast",
-            "-c:a", "aac",
-            "-b:a", bit,
-            "-ac", str(ac),
-            "-y",  # 自动覆盖输出文件
-            output_path,
-        ]
-        
-        # 执行命令并显示进度
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
+        try:
+            duration = float(video_info.get('duration', 0))
+        except ValueError:
+            duration = 0.0
         
-        # 实时输出处理信息
-        for line in process.stdout:
-            if "time=" in line:
-                logger.info(line.strip())
+        returncode = None
+        if segments > 1 and duration >= SEGMENT_MIN_DURATION:
+            try:
+                if encode_segmented(
+                    input_path, output_path, ffmpeg_path, actual_width, actual_height, actual_frame_rate,
+                    crf, bit, ac, segments, threads, progress_callback
+                ):
+                    returncode = 0
+            except Exception as e:
+                logger.error(f"分段并行编码失败: {str(e)}")
+            if returncode is None:
+                logger.warning("改为整体编码")
         
-        process.wait()
+        if returncode is None:
+            # 构建ffmpeg命令
+            cmd = build_encode_command(
+                ffmpeg_path, input_path, output_path, actual_width, actual_height, actual_frame_rate,
+                crf, bit, ac, threads
+            )
+            
+            # 执行命令并显示进度
+            returncode = run_ffmpeg(cmd, progress_callback)
         
-        if process.returncode == 0:
+        if returncode == 0:
             # 获取输出文件大小
             output_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
             input_size = os.path.getsize(input_path) / (1024 * 1024)  # MB
@@ -218,6 +690,145 @@ def optimize_video(
         logger.error(f"处理视频时发生错误: {str(e)}")
         return False
 
+def predict_crf(
+    input_path: str,
+    ffmpeg_path: str,
+    target_width: int,
+    target_height: int,
+    target_frame_rate: int,
+    target_size: float,
+    min_crf: int,
+    bit: str = "64k",
+    ac: int = 1,
+    keep_aspect_ratio: bool = True,
+    threads: Optional[int] = None,
+    sample_count: int = 3,
+    sample_seconds: float = 5.0,
+    crf_step: int = 4,
+    max_crf: int = 40
+) -> Optional[int]:
+    """采样预测CRF：只编码几段短样本，拟合 大小-CRF 曲线，选出能达到目标大小的最小CRF
+    
+    x264的输出大小随CRF近似指数下降，因此对 ln(大小) 与 CRF 做线性拟合。
+    视频太短或无法拟合时返回None（退回逐次完整编码尝试）。
+    """
+    ffprobe_path = ffmpeg_path.replace("ffmpeg.exe", "ffprobe.exe")
+    video_info = get_video_info(input_path, ffprobe_path)
+    try:
+        duration = float(video_info.get('duration', 0))
+    except ValueError:
+        return None
+    
+    # 视频较短时采样与完整编码的耗时相差不大，直接完整编码
+    if duration < sample_count * sample_seconds * 3:
+        return None
+    
+    width, height, frame_rate = resolve_output_params(
+        video_info, target_width, target_height, target_frame_rate, keep_aspect_ratio
+    )
+    
+    # 样本均匀分布在视频中间部分，避开片头片尾
+    starts = [duration * (i + 1) / (sample_count + 1) - sample_seconds / 2 for i in range(sample_count)]
+    candidates = [min(min_crf + i * crf_step, 51) for i in range(3)]
+    points = []
+    
+    with tempfile.TemporaryDirectory(prefix="crf_sample_") as temp_dir:
+        for crf in candidates:
+            sample_bytes = 0
+            for index, start in enumerate(starts):
+                sample_path = os.path.join(temp_dir, f"sample_{crf}_{index}.mp4")
+                cmd = build_encode_command(
+                    ffmpeg_path, input_path, sample_path, width, height, frame_rate,
+                    crf, bit, ac, threads, start=start, length=sample_seconds
+                )
+                result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                if result.returncode != 0 or not os.path.exists(sample_path):
+                    logger.warning(f"采样编码失败 CRF={crf}，改为完整编码尝试")
+                    return None
+                sample_bytes += os.path.getsize(sample_path)
+            
+            # 按采样时长换算为完整视频的预计大小
+            predicted_size = sample_bytes / (sample_count * sample_seconds) * duration
+            points.append((crf, math.log(max(predicted_size, 1))))
+            logger.info(f"采样 CRF={crf}: 预计大小 {predicted_size / 1024 / 1024:.1f}MB")
+    
+    # 最小二乘拟合 ln(大小) = a + b * CRF
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+    intercept = mean_y - slope * mean_x
+    if slope >= 0:
+        return None  # 大小没有随CRF下降，样本不可信
+    
+    # 达到目标大小所需的CRF（取整后向上取，保证不超过目标）
+    needed_crf = math.ceil((math.log(target_size) - intercept) / slope)
+    predicted_crf = max(min_crf, min(max_crf, needed_crf))
+    logger.info(
+        f"预测CRF: {predicted_crf}（目标大小 {target_size / 1024 / 1024:.1f}MB，"
+        f"预计大小 {math.exp(intercept + slope * predicted_crf) / 1024 / 1024:.1f}MB）"
+    )
+    return predicted_crf
+
+def partial_outputs(output_path: str) -> List[str]:
+    """上次中断时可能留下的中间文件：各次尝试的 _temp_{crf}.mp4 与分段编码的临时目录"""
+    directory = os.path.dirname(output_path) or "."
+    stem = glob.escape(os.path.splitext(os.path.basename(output_path))[0])
+    return sorted(
+        glob.glob(os.path.join(glob.escape(directory), f"{stem}_temp_*.mp4"))
+        + glob.glob(os.path.join(glob.escape(directory), f".{stem}_temp_*.segments_*"))
+    )
+
+def is_complete_output(
+    input_path: str,
+    output_path: str,
+    ffprobe_path: str,
+    tolerance: float = DURATION_TOLERANCE
+) -> bool:
+    """通过时长检查输出文件是否完整（编码中断的MP4通常无法读取，或时长明显短于原视频）"""
+    try:
+        input_info = get_video_info(input_path, ffprobe_path)
+        output_info = get_video_info(output_path, ffprobe_path)
+        input_duration = float(input_info.get('format_duration') or input_info['duration'])
+        output_duration = float(output_info.get('format_duration') or output_info['duration'])
+    except Exception:
+        return False
+    return abs(output_duration - input_duration) <= tolerance
+
+def recover_partial_outputs(
+    input_path: str,
+    output_path: str,
+    ffprobe_path: str,
+    target_size: float
+) -> Optional[int]:
+    """处理上次中断留下的中间文件：已完整编码且大小达标的结果直接采用，其余全部删除
+    
+    返回采用的CRF值，没有可用结果时返回None
+    """
+    reused_crf = None
+    for path in partial_outputs(output_path):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"删除中断留下的分段目录: {path}")
+            continue
+        
+        crf_text = path[:-len(".mp4")].rsplit("_temp_", 1)[-1]
+        if (
+            reused_crf is None and crf_text.isdigit()
+            and os.path.getsize(path) < target_size
+            and is_complete_output(input_path, path, ffprobe_path)
+        ):
+            os.replace(path, output_path)
+            reused_crf = int(crf_text)
+            logger.info(f"复用中断前已完成的编码结果: CRF={reused_crf}")
+        else:
+            os.remove(path)
+            logger.info(f"删除中断留下的不完整文件: {path}")
+    return reused_crf
+
 def optimize_video_with_size_check(
     input_path: str,
     output_path: str,
@@ -229,20 +840,54 @@ def optimize_video_with_size_check(
     bit: str = "64k",
     ac: int = 1,
     keep_aspect_ratio: bool = True,
-    max_retries: int = 3
+    max_retries: int = 3,
+    threads: Optional[int] = None,
+    progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+    predictive: bool = True,
+    target_ratio: float = 1.0,
+    segments: int = 1
 ) -> bool:
-    """优化视频，并确保输出文件不大于输入文件"""
+    """优化视频，并确保输出文件小于 输入文件大小 × target_ratio
+    
+    predictive: 先采样预测CRF，通常一次完整编码即可达到目标大小；
+                预测失败或结果仍过大时，按原方式逐次提高CRF重新编码
+    segments: 长视频拆分为几段并行编码（1为不拆分）
+    """
     original_size = os.path.getsize(input_path)
+    target_size = original_size * target_ratio
     best_crf = initial_crf
     best_output_path = None
     
     # 获取ffprobe路径
     ffprobe_path = ffmpeg_path.replace("ffmpeg.exe", "ffprobe.exe")
     
+    # 上次中断前已完成的尝试直接采用，不完整的中间文件删除
+    reused_crf = recover_partial_outputs(input_path, output_path, ffprobe_path, target_size)
+    if reused_crf is not None:
+        compressed_size = os.path.getsize(output_path)
+        logger.info(
+            f"最终使用 CRF={reused_crf} | "
+            f"压缩率: {(1 - compressed_size / original_size) * 100:.1f}% | "
+            f"大小: {original_size/1024/1024:.1f}MB -> {compressed_size/1024/1024:.1f}MB"
+        )
+        return True
+    
     # 计算初始CRF值
     initial_crf = calculate_optimal_crf(input_path, ffprobe_path, min_crf=23, max_crf=28)
     logger.info(f"计算得到初始CRF值: {initial_crf}")
     
+    if predictive:
+        try:
+            predicted_crf = predict_crf(
+                input_path, ffmpeg_path, target_width, target_height, target_frame_rate,
+                target_size, initial_crf, bit, ac, keep_aspect_ratio, threads
+            )
+        except Exception as e:
+            logger.warning(f"采样预测CRF失败: {str(e)}")
+            predicted_crf = None
+        if predicted_crf is not None:
+            initial_crf = predicted_crf
+    
     for attempt in range(max_retries):
         current_crf = initial_crf + attempt * 2  # 每次尝试增加CRF值
         temp_output_path = output_path.replace(".mp4", f"_temp_{current_crf}.mp4")
@@ -258,14 +903,17 @@ def optimize_video_with_size_check(
             current_crf,
             bit,
             ac,
-            keep_aspect_ratio
+            keep_aspect_ratio,
+            threads,
+            progress_callback,
+            segments
         )
         
         if success:
             # 检查文件大小
             compressed_size = os.path.getsize(temp_output_path)
             
-            if compressed_size < original_size:
+            if compressed_size < target_size:
                 # 找到可接受的压缩结果
                 best_crf = current_crf
                 best_output_path = temp_output_path
@@ -280,10 +928,8 @@ def optimize_video_with_size_check(
     
     # 处理最佳结果
     if best_output_path:
-        # 重命名最佳结果文件
-        if os.path.exists(output_path):
-            os.remove(output_path)
-        os.rename(best_output_path, output_path)
+        # 重命名最佳结果文件（原子替换，不会出现只删除了旧文件的中间状态）
+        os.replace(best_output_path, output_path)
         
         compressed_size = os.path.getsize(output_path)
         compression_ratio = (1 - compressed_size / original_size) * 100
@@ -308,6 +954,336 @@ def list_mp4_files(filepath: str) -> List[str]:
     
     return mp4_files
 
+def list_catalog_videos(catalog_path: str, filepath: str, where: str = "1") -> List[str]:
+    """从媒体目录中选取目录下（不含子目录）的MP4视频（不含扩展名），where为附加的SQL筛选条件
+    
+    例如 where="video_codec = 'h264' AND width > 1280" 只选取需要缩小的H.264视频
+    """
+    folder = os.path.join(os.path.abspath(filepath), "")
+    conn = sqlite3.connect(catalog_path)
+    try:
+        rows = conn.execute(
+            f"SELECT path FROM media WHERE substr(path, 1, ?) = ? AND error IS NULL "
+            f"AND video_codec IS NOT NULL AND lower(path) LIKE '%.mp4' AND ({where})",
+            (len(folder), folder)
+        ).fetchall()
+    finally:
+        conn.close()
+    
+    names = []
+    for (path,) in rows:
+        relative = path[len(folder):]
+        if os.sep not in relative and os.path.exists(path):
+            names.append(os.path.splitext(relative)[0])
+    return names
+
+# ================================================
+# 并发任务调度
+# ================================================
+
+@dataclass
+class EncodeJob:
+    """一个压缩任务：一个输入文件 × 一组输出参数"""
+    input_path: str
+    output_path: str
+    width: int
+    height: int
+    frame_rate: int
+    bit: str
+    ac: int
+    initial_crf: int = 23
+    keep_aspect_ratio: bool = True
+    duration: float = 0.0  # 原始视频时长（秒），用于计算进度
+    target_ratio: float = 1.0  # 目标大小占原始大小的比例
+    predictive: bool = True  # 是否先采样预测CRF
+    
+    @property
+    def job_id(self) -> str:
+        return os.path.basename(self.output_path)
+
+class JobJournal:
+    """任务日志（JSON Lines）：记录每个任务的状态（pending/encoding/done/failed），以最后一条记录为准
+    
+    中断后重新运行时跳过已完成的任务；状态停留在encoding的任务是上次运行中断的任务
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.states: Dict[str, Dict] = {}
+        
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 中断时可能留下不完整的最后一行
+                    self.states[entry['job']] = entry
+    
+    def status(self, job: EncodeJob) -> Optional[str]:
+        entry = self.states.get(job.job_id)
+        return entry['status'] if entry else None
+    
+    def is_done(self, job: EncodeJob, ffprobe_path: str) -> bool:
+        """检查任务是否已完成：输出文件与完成时记录的大小、修改时间一致即可跳过，
+        否则（文件被改动，或没有完成记录但输出已存在）通过时长检查，通过后补记为已完成
+        """
+        if not os.path.exists(job.output_path):
+            return False
+        
+        entry = self.states.get(job.job_id)
+        stat = os.stat(job.output_path)
+        if (
+            entry and entry['status'] == 'done'
+            and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns
+        ):
+            return True
+        
+        if is_complete_output(job.input_path, job.output_path, ffprobe_path):
+            self.record_done(job, verified='duration')
+            return True
+        return False
+    
+    def record_done(self, job: EncodeJob, **extra) -> None:
+        """记录任务完成，同时记下输出文件的大小与修改时间，重新运行时据此快速确认输出未变"""
+        stat = os.stat(job.output_path)
+        self.record(job, 'done', size=stat.st_size, mtime_ns=stat.st_mtime_ns, **extra)
+    
+    def record(self, job: EncodeJob, status: str, **extra) -> None:
+        entry = {'job': job.job_id, 'status': status, 'time': time.strftime('%Y-%m-%d %H:%M:%S'), **extra}
+        with self.lock:
+            self.states[job.job_id] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+class TelemetryLog:
+    """编码性能日志（JSON Lines）：记录每个任务与整批任务的实际吞吐量，用于调整预设与并发数"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+    
+    def write(self, kind: str, **fields) -> None:
+        entry = {'type': kind, 'time': time.strftime('%Y-%m-%d %H:%M:%S'), **fields}
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+class ProgressBoard:
+    """多个并发ffmpeg进程共享的进度显示：定期输出一行汇总，而不是每个进程各自刷屏"""
+    
+    def __init__(self, jobs: List[EncodeJob], interval: float = 5.0, telemetry: Optional[TelemetryLog] = None):
+        self.total = len(jobs)
+        self.total_duration = sum(job.duration for job in jobs)
+        self.interval = interval
+        self.telemetry = telemetry
+        self.lock = threading.Lock()
+        self.events: Dict[str, ProgressEvent] = {}  # 运行中任务的最新进度
+        self.finished_duration = 0.0
+        self.done = 0
+        self.failed = 0
+        self.start_time = time.monotonic()
+        self.last_report = 0.0
+    
+    def start(self, job: EncodeJob) -> None:
+        with self.lock:
+            self.events[job.job_id] = ProgressEvent()
+    
+    def update(self, job: EncodeJob, event: ProgressEvent) -> None:
+        with self.lock:
+            self.events[job.job_id] = event
+        self.report()
+    
+    def finish(self, job: EncodeJob, success: bool) -> None:
+        with self.lock:
+            self.events.pop(job.job_id, None)
+            self.finished_duration += job.duration
+            if success:
+                self.done += 1
+            else:
+                self.failed += 1
+        self.report(force=True)
+    
+    def report(self, force: bool = False) -> None:
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_report < self.interval:
+                return
+            self.last_report = now
+            
+            running = [event for event in self.events.values() if not event.done]
+            processed = self.finished_duration + sum(event.out_time for event in self.events.values())
+            fps = sum(event.fps for event in running)
+            speed = sum(event.speed for event in running)
+            elapsed = now - self.start_time
+            message = (
+                f"总进度: 完成 {self.done}/{self.total} 失败 {self.failed} | "
+                f"运行中 {len(self.events)} 个 | {fps:.0f} fps | {speed:.2f}x"
+            )
+            eta = None
+            if self.total_duration > 0:
+                percent = min(100.0, processed / self.total_duration * 100)
+                message += f" | {percent:.1f}%"
+                if percent < 100:
+                    remaining = self.total_duration - processed
+                    # 优先按当前的总编码速度估算，刚开始还没有速度时按已用时间估算
+                    if speed > 0:
+                        eta = remaining / speed
+                    elif processed > 0:
+                        eta = elapsed * remaining / processed
+                    if eta is not None:
+                        message += f" | 预计剩余 {eta / 60:.1f} 分钟"
+            
+            if self.telemetry:
+                self.telemetry.write(
+                    'progress', done=self.done, failed=self.failed, running=len(self.events),
+                    processed=round(processed, 1), fps=round(fps, 1), speed=round(speed, 2),
+                    eta=round(eta, 1) if eta is not None else None
+                )
+        logger.info(message)
+
+def plan_concurrency(max_jobs: Optional[int] = None, threads_per_job: Optional[int] = None) -> Tuple[int, int]:
+    """根据CPU核心数确定并发的ffmpeg进程数与每个进程的编码线程数
+    
+    libx264单个进程的线程扩展有限，多个文件时用多个进程、每个进程较少线程更能跑满所有核心
+    """
+    cpu_count = os.cpu_count() or 1
+    if threads_per_job is None:
+        threads_per_job = max(1, cpu_count // max_jobs) if max_jobs else min(4, cpu_count)
+    if max_jobs is None:
+        max_jobs = max(1, cpu_count // threads_per_job)
+    return max_jobs, threads_per_job
+
+def file_size(path: str) -> Optional[int]:
+    """文件大小，文件不存在或无法访问时返回None"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+def run_jobs(
+    jobs: List[EncodeJob],
+    ffmpeg_path: str,
+    max_jobs: Optional[int] = None,
+    threads_per_job: Optional[int] = None,
+    journal_path: Optional[str] = None,
+    segments_per_job: Optional[int] = None,
+    telemetry_path: Optional[str] = None
+) -> Dict[str, int]:
+    """并发执行所有压缩任务，返回各状态的任务数
+    
+    segments_per_job: 长视频拆分为几段并行编码，None时按空闲的并发数自动计算
+                      （任务数少于可并发的进程数时，多出的核心用于分段编码）
+    telemetry_path: 性能日志路径，记录汇总进度、每个任务与整批任务的吞吐量
+    """
+    max_jobs, threads_per_job = plan_concurrency(max_jobs, threads_per_job)
+    journal = JobJournal(journal_path) if journal_path else None
+    ffprobe_path = ffmpeg_path.replace("ffmpeg.exe", "ffprobe.exe")
+    
+    pending = [job for job in jobs if not (journal and journal.is_done(job, ffprobe_path))]
+    skipped = len(jobs) - len(pending)
+    if journal:
+        interrupted = sum(1 for job in pending if journal.status(job) == 'encoding')
+        if interrupted:
+            logger.info(f"上次运行中断的任务 {interrupted} 个，将清理或复用其中间文件后继续")
+        for job in pending:
+            if journal.status(job) is None:
+                journal.record(job, 'pending')
+    if segments_per_job is None:
+        segments_per_job = max(1, max_jobs // len(pending)) if pending else 1
+    logger.info(
+        f"共 {len(jobs)} 个任务，已完成跳过 {skipped} 个，待处理 {len(pending)} 个 | "
+        f"并发 {max_jobs} 个ffmpeg进程 × 每个 {threads_per_job} 线程"
+        + (f" | 长视频分 {segments_per_job} 段并行编码" if segments_per_job > 1 else "")
+    )
+    
+    telemetry = TelemetryLog(telemetry_path) if telemetry_path else None
+    board = ProgressBoard(pending, telemetry=telemetry)
+    batch_start = time.monotonic()
+    
+    def run(job: EncodeJob) -> bool:
+        logger.info(f"开始处理: {job.job_id}")
+        board.start(job)
+        if journal:
+            journal.record(job, 'encoding')
+        start_time = time.monotonic()
+        success = False
+        # 编码前记下输入大小：运行期间输入被移动或删除时，性能日志不会因此抛出异常而掩盖编码本身的错误
+        input_size = file_size(job.input_path)
+        # 每次完整编码（含大小不达标后的重试）结束时累计的帧数与媒体时长
+        stats = {'encodes': 0, 'frames': 0, 'media_seconds': 0.0}
+        
+        def on_progress(event: ProgressEvent) -> None:
+            board.update(job, event)
+            if event.done:
+                stats['encodes'] += 1
+                stats['frames'] += event.frame
+                stats['media_seconds'] += event.out_time
+        
+        try:
+            success = optimize_video_with_size_check(
+                job.input_path,
+                job.output_path,
+                job.width,
+                job.height,
+                job.frame_rate,
+                ffmpeg_path,
+                job.initial_crf,
+                job.bit,
+                job.ac,
+                job.keep_aspect_ratio,
+                threads=threads_per_job,
+                progress_callback=on_progress,
+                predictive=job.predictive,
+                target_ratio=job.target_ratio,
+                segments=segments_per_job
+            )
+        finally:
+            seconds = time.monotonic() - start_time
+            board.finish(job, success)
+            if journal:
+                if success:
+                    journal.record_done(job, seconds=round(seconds, 1))
+                else:
+                    journal.record(job, 'failed', seconds=round(seconds, 1))
+            if telemetry:
+                telemetry.write(
+                    'job', job=job.job_id, status='done' if success else 'failed',
+                    preset=ENCODE_PRESET, threads=threads_per_job, segments=segments_per_job,
+                    concurrency=max_jobs, seconds=round(seconds, 1), duration=job.duration,
+                    encodes=stats['encodes'], frames=stats['frames'],
+                    fps=round(stats['frames'] / seconds, 1) if seconds > 0 else None,
+                    speed=round(stats['media_seconds'] / seconds, 2) if seconds > 0 else None,
+                    input_size=input_size,
+                    output_size=file_size(job.output_path) if success else None
+                )
+        
+        if success:
+            logger.info(f"完成: {job.job_id}")
+        else:
+            logger.error(f"失败: {job.job_id}")
+        return success
+    
+    with ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="encode") as executor:
+        futures = {executor.submit(run, job): job for job in pending}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"任务 {futures[future].job_id} 发生错误: {str(e)}")
+    
+    if telemetry and pending:
+        seconds = time.monotonic() - batch_start
+        telemetry.write(
+            'batch', jobs=len(pending), done=board.done, failed=board.failed,
+            preset=ENCODE_PRESET, threads=threads_per_job, segments=segments_per_job,
+            concurrency=max_jobs, seconds=round(seconds, 1), duration=round(board.total_duration, 1),
+            speed=round(board.total_duration / seconds, 2) if seconds > 0 else None
+        )
+    
+    return {'total': len(jobs), 'skipped': skipped, 'done': board.done, 'failed': board.failed}
+
 def main():
     # 配置路径和参数
     ffmpeg_path = r"C:\Program File\ffmpeg-master-latest-win64-gpl\bin\ffmpeg.exe"
@@ -325,18 +1301,41 @@ def main():
     bit_rates = ["64k"] # 音频比特率列表
     audio_channels = [1] # 音频通道数列表
     keep_aspect_ratio = True  # 是否保持宽高比
+    predictive = True  # 先编码几段短样本预测CRF，再完整编码（长视频可省去多次完整编码）
+    target_ratio = 1.0  # 目标大小占原始大小的比例（1.0表示只要比原文件小即可）
     file_path = r"D:\MV\2\\"  # 视频文件路径
+    max_jobs = None  # 同时运行的ffmpeg进程数（None为根据CPU核心数自动计算）
+    threads_per_job = None  # 每个ffmpeg进程的编码线程数（None为自动）
+    journal_path = os.path.join(file_path, "compress_journal.jsonl")  # 任务日志，中断后重新运行会跳过已完成的任务并清理中间文件
+    segments_per_job = None  # 长视频（10分钟以上）拆分为几段并行编码（None为自动，1为不拆分）
+    telemetry_path = os.path.join(file_path, "compress_telemetry.jsonl")  # 性能日志，记录实际的编码速度，用于调整预设与并发数
+    catalog_path = None  # 媒体目录（输出视频相关参数(ffmpeg).py 生成），设置后从中选取视频并直接使用其中的视频信息
+    catalog_where = "1"  # 从媒体目录选取视频的附加条件，例如 "width > 1280 AND duration > 60"
     
     # 获取所有MP4文件
-    origin_filenames = list_mp4_files(file_path)
+    if catalog_path:
+        # sqlite3.connect 会为不存在的路径创建空数据库；媒体目录决定处理哪些视频，不可用时直接退出，而不是改为处理全部视频
+        if not os.path.isfile(catalog_path):
+            logger.error(f"媒体目录不存在: {catalog_path}")
+            return
+        try:
+            origin_filenames = list_catalog_videos(catalog_path, file_path, catalog_where)
+        except sqlite3.Error as e:
+            logger.error(f"无法读取媒体目录 {catalog_path}: {e}")
+            return
+        get_probe_cache().attach_catalog(catalog_path)
+    else:
+        origin_filenames = list_mp4_files(file_path)
     logger.info(f"找到 {len(origin_filenames)} 个MP4文件: {origin_filenames}")
     
     if not origin_filenames:
         logger.warning("未找到MP4文件，程序退出")
         return
     
-    # 处理每个视频文件
-    for origin_filename in origin_filenames:
+    # 先生成全部任务（每个视频文件 × 每组参数组合），再并发执行
+    jobs: List[EncodeJob] = []
+    output_paths = set()
+    for origin_filename in sorted(origin_filenames):
         input_video_path = os.path.join(file_path, origin_filename + ".mp4")
         
         # 检查输入文件是否存在
@@ -353,6 +1352,10 @@ def main():
             original_height = int(video_info['height'])
             original_frame_rate = float(video_info.get('frame_rate_float', 30.0))
             original_size = os.path.getsize(input_video_path) / (1024 * 1024)  # MB
+            try:
+                duration = float(video_info.get('duration', 0))
+            except ValueError:
+                duration = 0.0  # 部分容器的视频流没有时长信息
             
             logger.info(
                 f"原始视频: {origin_filename} | "
@@ -363,7 +1366,7 @@ def main():
             
             origin_name = origin_filename.split("_")[0]
             
-            # 生成所有参数组合并处理
+            # 生成所有参数组合
             for pixel_x in pixel_xs:
                 for pixel_y in pixel_ys:
                     for target_frame_rate in frame_rates:
@@ -377,32 +1380,45 @@ def main():
                                 )
                                 output_video_path = os.path.join(file_path, output_filename)
                                 
-                                # 显示处理信息
-                                logger.info(f"开始处理: {output_filename}")
-                                
-                                # 优化视频（带大小检查）
-                                success = optimize_video_with_size_check(
-                                    input_video_path,
-                                    output_video_path,
-                                    pixel_x,
-                                    pixel_y,
-                                    target_frame_rate,
-                                    ffmpeg_path,
-                                    initial_crf,
-                                    bit,
-                                    ac,
-                                    keep_aspect_ratio
-                                )
+                                # 多个输入对应同一输出时只保留第一个，避免并发写入同一文件
+                                if output_video_path in output_paths:
+                                    continue
+                                output_paths.add(output_video_path)
                                 
-                                if success:
-                                    logger.info(f"完成: {output_filename}")
-                                else:
-                                    logger.error(f"失败: {output_filename}")
+                                jobs.append(EncodeJob(
+                                    input_path=input_video_path,
+                                    output_path=output_video_path,
+                                    width=pixel_x,
+                                    height=pixel_y,
+                                    frame_rate=target_frame_rate,
+                                    bit=bit,
+                                    ac=ac,
+                                    initial_crf=initial_crf,
+                                    keep_aspect_ratio=keep_aspect_ratio,
+                                    duration=duration,
+                                    target_ratio=target_ratio,
+                                    predictive=predictive
+                                ))
                                     
         except Exception as e:
             logger.error(f"处理视频 {origin_filename} 时发生错误: {str(e)}")
             continue
-
+    
+    # 任务生成阶段已探测所有输入文件，先保存一次缓存
+    get_probe_cache().save()
+    
+    # 并发执行所有任务
+    summary = run_jobs(
+        jobs, ffmpeg_path, max_jobs, threads_per_job, journal_path, segments_per_job, telemetry_path
+    )
+    logger.info(
+        f"任务汇总: 共 {summary['total']} 个，跳过 {summary['skipped']} 个，"
+        f"成功 {summary['done']} 个，失败 {summary['failed']} 个"
+    )
+    
+    cache = get_probe_cache()
+    cache.save()
+    logger.info(f"ffprobe缓存: 命中 {cache.hits} 次，调用ffprobe {cache.misses} 次")
     logger.info("所有处理完成")
 
 if __name__ == "__main__":
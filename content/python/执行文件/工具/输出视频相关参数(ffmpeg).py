@@ -1,6 +1,43 @@
 # 输出视频相关参数(需要配置ffmpeg)
-import subprocess
+# 单个文件：直接输出视频流的分辨率与帧率
+# 目录：递归扫描其中的音视频文件，并行调用ffprobe，结果保存到SQLite媒体目录（media_catalog.db）
+#       以 路径+大小+修改时间 判断文件是否变化，再次运行时只探测新增或修改过的文件
+#
+# 用法：
+#   python 输出视频相关参数(ffmpeg).py D:\MV D:\task            扫描目录并更新媒体目录
+#   python 输出视频相关参数(ffmpeg).py --query "video_codec = 'h264' AND duration > 600"
+#
+# 媒体目录表结构（其他脚本可直接用sqlite3查询，选取要处理的文件而无需再次调用ffprobe）：
+#   media(path 绝对路径, size, mtime_ns, scanned_at, error 探测失败的原因,
+#         container, duration, bit_rate,
+#         video_codec, width, height, avg_frame_rate, fps, video_bit_rate, video_duration,
+#         audio_codec, audio_channels, audio_sample_rate, audio_bit_rate, audio_duration)
+import argparse
+import json
 import os
+import sqlite3
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 媒体目录数据库（与本脚本同目录）
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "media_catalog.db")
+# 扫描的音视频文件扩展名
+MEDIA_EXTENSIONS = {
+    ".mp4", ".mov", ".mkv", ".avi", ".flv", ".m4v", ".webm", ".ts", ".wmv",
+    ".mp3", ".m4a", ".aac", ".flac", ".wav", ".ogg",
+}
+# 同时运行的ffprobe进程数（ffprobe主要在等待磁盘读取，可以比CPU核心数多）
+PROBE_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+# 每探测多少个文件提交一次数据库并输出进度
+COMMIT_INTERVAL = 100
+
+CATALOG_COLUMNS = [
+    "path", "size", "mtime_ns", "scanned_at", "error",
+    "container", "duration", "bit_rate",
+    "video_codec", "width", "height", "avg_frame_rate", "fps", "video_bit_rate", "video_duration",
+    "audio_codec", "audio_channels", "audio_sample_rate", "audio_bit_rate", "audio_duration",
+]
 
 
 def get_video_info(video_path, ffprobe_path):
@@ -25,6 +62,183 @@ def get_video_info(video_path, ffprobe_path):
     return dict(line.split("=") for line in result.stdout.splitlines())
 
 
+def _number(value, cast=float):
+    """转换ffprobe输出的数值，N/A或缺失时返回None"""
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _frame_rate(value):
+    """解析分数形式的帧率（如 30000/1001）"""
+    if not value or value == "0/0":
+        return None
+    numerator, _, denominator = value.partition("/")
+    try:
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def probe_media(media_path, ffprobe_path):
+    """调用一次ffprobe，获取容器、第一条视频流与第一条音频流的参数（字段与媒体目录的列一致）"""
+    cmd = [
+        ffprobe_path,
+        "-v", "error",
+        "-show_entries",
+        "stream=codec_type,codec_name,width,height,avg_frame_rate,bit_rate,duration,channels,sample_rate"
+        ":format=format_name,duration,bit_rate",
+        "-of", "json",
+        media_path,
+    ]
+    result = subprocess.run(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8", errors="ignore"
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffprobe返回 {result.returncode}")
+    data = json.loads(result.stdout)
+
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    container = data.get("format", {})
+    return {
+        "container": container.get("format_name"),
+        "duration": _number(container.get("duration")),
+        "bit_rate": _number(container.get("bit_rate"), int),
+        "video_codec": video.get("codec_name"),
+        "width": _number(video.get("width"), int),
+        "height": _number(video.get("height"), int),
+        "avg_frame_rate": video.get("avg_frame_rate"),
+        "fps": _frame_rate(video.get("avg_frame_rate")),
+        "video_bit_rate": _number(video.get("bit_rate"), int),
+        "video_duration": _number(video.get("duration")),
+        "audio_codec": audio.get("codec_name"),
+        "audio_channels": _number(audio.get("channels"), int),
+        "audio_sample_rate": _number(audio.get("sample_rate"), int),
+        "audio_bit_rate": _number(audio.get("bit_rate"), int),
+        "audio_duration": _number(audio.get("duration")),
+    }
+
+
+def walk_media_files(roots, extensions=MEDIA_EXTENSIONS):
+    """递归遍历目录，产出音视频文件的绝对路径（跳过以.开头的隐藏目录，如分段编码的临时目录）"""
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            yield root
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() in extensions:
+                    yield os.path.join(dirpath, filename)
+
+
+class MediaCatalog:
+    """SQLite媒体目录：以路径为主键，记录文件大小与修改时间，文件未变化时不再探测"""
+
+    def __init__(self, catalog_path=CATALOG_PATH):
+        self.conn = sqlite3.connect(catalog_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS media ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, scanned_at REAL, error TEXT, "
+            "container TEXT, duration REAL, bit_rate INTEGER, "
+            "video_codec TEXT, width INTEGER, height INTEGER, avg_frame_rate TEXT, fps REAL, "
+            "video_bit_rate INTEGER, video_duration REAL, "
+            "audio_codec TEXT, audio_channels INTEGER, audio_sample_rate INTEGER, "
+            "audio_bit_rate INTEGER, audio_duration REAL)"
+        )
+
+    def _save(self, rows):
+        placeholders = ",".join("?" * len(CATALOG_COLUMNS))
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO media ({','.join(CATALOG_COLUMNS)}) VALUES ({placeholders})",
+            [[row.get(column) for column in CATALOG_COLUMNS] for row in rows]
+        )
+        self.conn.commit()
+
+    def update(self, roots, ffprobe_path, workers=PROBE_WORKERS, prune=True):
+        """扫描目录并增量更新媒体目录，返回统计信息
+
+        prune: 删除扫描目录下已经不存在的文件的记录
+        """
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.conn.execute("SELECT path, size, mtime_ns FROM media")
+        }
+
+        seen = set()
+        changed = []
+        for path in walk_media_files(roots):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            seen.add(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                changed.append((path, stat.st_size, stat.st_mtime_ns))
+
+        stats = {"files": len(seen), "unchanged": len(seen) - len(changed), "probed": 0, "failed": 0, "removed": 0}
+        print(f"共 {len(seen)} 个音视频文件，未变化 {stats['unchanged']} 个，需要探测 {len(changed)} 个")
+
+        def probe(item):
+            path, size, mtime_ns = item
+            row = {"path": path, "size": size, "mtime_ns": mtime_ns, "scanned_at": time.time()}
+            try:
+                row.update(probe_media(path, ffprobe_path))
+            except Exception as e:
+                # 探测失败也记录下来，文件未变化时不再重复探测
+                row["error"] = str(e)[:500]
+            return row
+
+        rows = []
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(probe, item) for item in changed]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                stats["probed"] += 1
+                if row.get("error"):
+                    stats["failed"] += 1
+                    print(f"探测失败: {row['path']}: {row['error']}")
+                if len(rows) >= COMMIT_INTERVAL:
+                    self._save(rows)
+                    rows = []
+                    print(f"已探测 {stats['probed']}/{len(changed)}")
+        if rows:
+            self._save(rows)
+
+        if prune:
+            # 只清理本次扫描的目录下的记录，其他目录的记录保持不变
+            prefixes = [os.path.join(os.path.abspath(root), "") for root in roots if os.path.isdir(root)]
+            removed = [
+                (path,) for path in known
+                if path not in seen and any(path.startswith(prefix) for prefix in prefixes)
+            ]
+            self.conn.executemany("DELETE FROM media WHERE path = ?", removed)
+            self.conn.commit()
+            stats["removed"] = len(removed)
+
+        elapsed = time.perf_counter() - start_time
+        print(
+            f"媒体目录已更新: 探测 {stats['probed']} 个（失败 {stats['failed']} 个，用时 {elapsed:.1f} 秒），"
+            f"删除 {stats['removed']} 条已不存在的记录"
+        )
+        return stats
+
+    def query(self, where="1", params=()):
+        """按条件查询媒体目录，返回字典列表，例如 query("video_codec = ? AND width >= ?", ("h264", 1920))"""
+        cursor = self.conn.execute(f"SELECT * FROM media WHERE {where} ORDER BY path", params)
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def close(self):
+        self.conn.close()
+
+
 # ffmpeg和ffprobe的路径
 ffmpeg_path = r"C:\Program File\ffmpeg-master-latest-win64-gpl\bin\ffmpeg.exe"
 ffprobe_path = r"C:\Program File\ffmpeg-master-latest-win64-gpl\bin\ffprobe.exe"
@@ -32,7 +246,34 @@ ffprobe_path = r"C:\Program File\ffmpeg-master-latest-win64-gpl\bin\ffprobe.exe"
 # 设置视频参数
 input_video_path = r"D:\task\Moive.mp4"
 
-# 获取视频信息并打印
-print(get_video_info(input_video_path, ffprobe_path))
-# video_info = get_video_info(input_video_path+".mp4", ffprobe_path)
-# print(f"Original resolution: {video_info['width']}x{video_info['height']}, Frame rate: {video_info['avg_frame_rate']}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="输出视频相关参数 / 更新媒体目录")
+    parser.add_argument("paths", nargs="*", help="要扫描的目录或文件（只有一个文件时直接输出其视频参数）")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="媒体目录数据库路径")
+    parser.add_argument("--ffprobe", default=ffprobe_path, help="ffprobe路径")
+    parser.add_argument("--workers", type=int, default=PROBE_WORKERS, help="同时运行的ffprobe进程数")
+    parser.add_argument("--query", help="查询媒体目录的SQL条件，例如 \"video_codec = 'h264'\"")
+    parser.add_argument("--no-prune", action="store_true", help="保留已经不存在的文件的记录")
+    args = parser.parse_args()
+
+    if not args.paths and not args.query:
+        # 获取视频信息并打印
+        print(get_video_info(input_video_path, ffprobe_path))
+    elif len(args.paths) == 1 and os.path.isfile(args.paths[0]) and not args.query:
+        print(get_video_info(args.paths[0], args.ffprobe))
+    else:
+        catalog = MediaCatalog(args.catalog)
+        try:
+            if args.paths:
+                catalog.update(args.paths, args.ffprobe, args.workers, prune=not args.no_prune)
+            if args.query:
+                for row in catalog.query(args.query):
+                    print(
+                        f"{row['path']} | {row['width']}x{row['height']} @ {row['fps'] or 0:.2f}fps | "
+                        f"{row['video_codec']}/{row['audio_codec']} | {row['duration'] or 0:.1f}s | "
+                        f"{(row['bit_rate'] or 0) // 1000}kbps"
+                    )
+        finally:
+            catalog.close()
+    # video_info = get_video_info(input_video_path+".mp4", ffprobe_path)
+    # print(f"Original resolution: {video_info['width']}x{video_info['height']}, Frame rate: {video_info['avg_frame_rate']}")
@@ -1,31 +1,192 @@
 import sys
 import os
+import time
+
+# NumPy为可选依赖：存在时使用向量化定位差异，否则退回纯Python实现
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BLOCK_SIZE = 4 * 1024 * 1024  # 每次从两个文件各读取的块大小
+SUB_BLOCK_SIZE = 4096  # 纯Python实现时先按小块比较，只逐字节检查不同的小块
+MAX_DIFF_OFFSETS = 5  # 记录的差异字节数
+MAX_DIFF_RANGES = 10  # 记录的差异区间数
+
+def _read_full(f, buffer):
+    """读满缓冲区（文件末尾除外），返回读取的字节数"""
+    view = memoryview(buffer)
+    total = 0
+    while total < len(buffer):
+        size = f.readinto(view[total:])
+        if not size:
+            break
+        total += size
+    return total
+
+def _find_diffs(block1, block2, size):
+    """找出两个数据块前size字节中不同的位置（块内偏移，升序）"""
+    if np is not None:
+        a = np.frombuffer(block1, dtype=np.uint8, count=size)
+        b = np.frombuffer(block2, dtype=np.uint8, count=size)
+        return np.flatnonzero(np.bitwise_xor(a, b))
+    
+    offsets = []
+    for start in range(0, size, SUB_BLOCK_SIZE):
+        end = min(start + SUB_BLOCK_SIZE, size)
+        if block1[start:end] == block2[start:end]:
+            continue
+        offsets.extend(i for i in range(start, end) if block1[i] != block2[i])
+    return offsets
+
+def _coalesce(offsets):
+    """将升序的差异位置合并为连续区间，返回(起始位置列表, 结束位置列表)"""
+    if np is not None and isinstance(offsets, np.ndarray):
+        if not len(offsets):
+            return [], []
+        breaks = np.flatnonzero(np.diff(offsets) != 1)
+        starts = offsets[np.concatenate(([0], breaks + 1))]
+        ends = offsets[np.concatenate((breaks, [len(offsets) - 1]))] + 1
+        return starts, ends
+    
+    starts, ends = [], []
+    for i in offsets:
+        if ends and i == ends[-1]:
+            ends[-1] = i + 1
+        else:
+            starts.append(i)
+            ends.append(i + 1)
+    return starts, ends
+
+class DiffResult:
+    """比对结果：差异数、前几个差异字节与合并后的差异区间"""
+    
+    def __init__(self, size1, size2, max_offsets=MAX_DIFF_OFFSETS, max_ranges=MAX_DIFF_RANGES):
+        self.size1 = size1
+        self.size2 = size2
+        self.max_offsets = max_offsets
+        self.max_ranges = max_ranges
+        self.diff_count = 0
+        self.first_diffs = []  # [(位置, 文件1字节, 文件2字节)]，文件已结束的一方为None
+        self.ranges = []  # [[起始位置, 结束位置)]
+        self.range_count = 0
+        self._last_end = -1  # 最后一个差异区间的结束位置（区间可能跨越数据块）
+    
+    def add_runs(self, base, starts, ends):
+        """记录数据块内的连续差异区间，与上一个区间相接时合并"""
+        count = len(starts)
+        if not count:
+            return
+        
+        first = 0
+        if base + int(starts[0]) == self._last_end:
+            # 紧接上一个数据块末尾的差异区间
+            if self.ranges and self.ranges[-1][1] == self._last_end:
+                self.ranges[-1][1] = base + int(ends[0])
+            first = 1
+        
+        self.range_count += count - first
+        room = self.max_ranges - len(self.ranges)
+        for start, end in zip(starts[first:first + room], ends[first:first + room]):
+            self.ranges.append([base + int(start), base + int(end)])
+        self._last_end = base + int(ends[-1])
+    
+    def add_offsets(self, base, offsets, block1, block2):
+        """记录一个数据块内的差异位置"""
+        self.diff_count += len(offsets)
+        for i in offsets[:max(0, self.max_offsets - len(self.first_diffs))]:
+            i = int(i)
+            self.first_diffs.append((base + i, block1[i], block2[i]))
+        
+        starts, ends = _coalesce(offsets)
+        self.add_runs(base, starts, ends)
+    
+    @property
+    def identical(self):
+        return self.diff_count == 0 and self.size1 == self.size2
+
+def diff_files(file1_path, file2_path, block_size=BLOCK_SIZE,
+               max_offsets=MAX_DIFF_OFFSETS, max_ranges=MAX_DIFF_RANGES):
+    """分块流式比对两个文件，内存占用只与块大小有关
+    
+    先整块比较，只有块不同时才定位具体的差异位置。
+    较长文件多出的部分全部计为差异。
+    """
+    result = DiffResult(os.path.getsize(file1_path), os.path.getsize(file2_path), max_offsets, max_ranges)
+    block1 = bytearray(block_size)
+    block2 = bytearray(block_size)
+    
+    with open(file1_path, 'rb', buffering=0) as f1, open(file2_path, 'rb', buffering=0) as f2:
+        pos = 0
+        while True:
+            size1 = _read_full(f1, block1)
+            size2 = _read_full(f2, block2)
+            size = min(size1, size2)
+            
+            if size == block_size:
+                same = block1 == block2
+            else:
+                same = block1[:size] == block2[:size]
+            
+            if not same:
+                offsets = _find_diffs(block1, block2, size)
+                result.add_offsets(pos, offsets, block1, block2)
+            
+            pos += size
+            if size < block_size:
+                break
+    
+    # 较长文件多出的部分
+    min_len = min(result.size1, result.size2)
+    max_len = max(result.size1, result.size2)
+    if max_len > min_len:
+        if len(result.first_diffs) < max_offsets:
+            with open(file1_path if result.size1 > result.size2 else file2_path, 'rb') as f:
+                f.seek(min_len)
+                extra = f.read(max_offsets - len(result.first_diffs))
+            for i, byte in enumerate(extra):
+                if result.size1 > result.size2:
+                    result.first_diffs.append((min_len + i, byte, None))
+                else:
+                    result.first_diffs.append((min_len + i, None, byte))
+        result.diff_count += max_len - min_len
+        result.add_runs(0, [min_len], [max_len])
+    
+    return result
+
+def _format_byte(byte):
+    """格式化单个字节：十六进制与可打印字符"""
+    if byte is None:
+        return "--"
+    return f"{byte:02X} ({chr(byte) if 32 <= byte < 127 else '.'})"
 
 def compare_files(file1_path, file2_path):
     """比对两个文件的字节差异"""
+    start_time = time.perf_counter()
     try:
-        with open(file1_path, 'rb') as f1, open(file2_path, 'rb') as f2:
-            data1 = f1.read()
-            data2 = f2.read()
+        result = diff_files(file1_path, file2_path)
     except FileNotFoundError as e:
         print(f"错误: {e}")
         return False
     except Exception as e:
         print(f"读取文件时出错: {e}")
         return False
+    elapsed = time.perf_counter() - start_time
     
-    len1 = len(data1)
-    len2 = len(data2)
+    len1 = result.size1
+    len2 = result.size2
     
     print("=" * 60)
     print("文件比对工具")
     print("=" * 60)
     print(f"文件1: {os.path.basename(file1_path)} ({len1:,} 字节)")
     print(f"文件2: {os.path.basename(file2_path)} ({len2:,} 字节)")
+    if elapsed > 0:
+        print(f"比对耗时: {elapsed:.2f} 秒 ({(len1 + len2) / 1024 / 1024 / elapsed:,.1f} MB/s)")
     print("-" * 50)
     
     # 检查文件是否完全相同
-    if data1 == data2:
+    if result.identical:
         print("✅ 两个文件完全相同")
         print(f"文件大小: {len1:,} 字节")
         return True
@@ -35,24 +196,8 @@ def compare_files(file1_path, file2_path):
         print(f"⚠️  文件大小不同: 文件1={len1:,} 字节, 文件2={len2:,} 字节")
         print(f"   大小差异: {abs(len1-len2):,} 字节")
     
-    # 计算差异
-    diff_count = 0
+    diff_count = result.diff_count
     max_len = max(len1, len2)
-    first_diff_pos = -1
-    diff_bytes_hex = []
-    
-    for i in range(max_len):
-        byte1 = data1[i] if i < len1 else None
-        byte2 = data2[i] if i < len2 else None
-        
-        if byte1 != byte2:
-            diff_count += 1
-            if first_diff_pos == -1:
-                first_diff_pos = i
-                # 记录前几个差异字节（最多5个）
-                diff_bytes_hex.append((i, byte1, byte2))
-            elif len(diff_bytes_hex) < 5:
-                diff_bytes_hex.append((i, byte1, byte2))
     
     # 输出差异信息
     print(f"差异统计:")
@@ -60,20 +205,24 @@ def compare_files(file1_path, file2_path):
     print(f"  差异字节数: {diff_count:,}")
     print(f"  相同字节数: {max_len - diff_count:,}")
     print(f"  差异率: {diff_count/max_len*100:.2f}%")
+    print(f"  差异区间数: {result.range_count:,}")
     
-    if diff_count > 0 and diff_bytes_hex:
+    if result.first_diffs:
+        first_diff_pos = result.first_diffs[0][0]
         print(f"\n第一个差异在位置: 0x{first_diff_pos:08X} (十进制: {first_diff_pos})")
         print("前几个差异字节:")
-        for i, byte1, byte2 in diff_bytes_hex:
-            if byte1 is None:
-                print(f"  位置 0x{i:08X}: 文件1: -- 文件2: {byte2:02X} ({chr(byte2) if 32 <= byte2 < 127 else '.'})")
-            elif byte2 is None:
-                print(f"  位置 0x{i:08X}: 文件1: {byte1:02X} ({chr(byte1) if 32 <= byte1 < 127 else '.'}) 文件2: --")
-            else:
-                print(f"  位置 0x{i:08X}: 文件1: {byte1:02X} ({chr(byte1) if 32 <= byte1 < 127 else '.'}) 文件2: {byte2:02X} ({chr(byte2) if 32 <= byte2 < 127 else '.'})")
+        for i, byte1, byte2 in result.first_diffs:
+            print(f"  位置 0x{i:08X}: 文件1: {_format_byte(byte1)} 文件2: {_format_byte(byte2)}")
+    
+    if result.ranges:
+        print("\n差异区间:")
+        for start, end in result.ranges:
+            print(f"  0x{start:08X} - 0x{end - 1:08X} ({end - start:,} 字节)")
     
-    if diff_count > 5:
-        print(f"\n注: 共发现 {diff_count:,} 个差异，只显示了前5个差异位置")
+    if diff_count > len(result.first_diffs):
+        print(f"\n注: 共发现 {diff_count:,} 个差异，只显示了前{len(result.first_diffs)}个差异位置")
+    if result.range_count > len(result.ranges):
+        print(f"注: 共 {result.range_count:,} 个差异区间，只显示了前{len(result.ranges)}个")
     
     return False
 
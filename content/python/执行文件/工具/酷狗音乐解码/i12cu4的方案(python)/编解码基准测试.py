@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+酷狗音乐加解密往返验证与性能基准测试
+
+生成MP3/FLAC格式的合成音频数据，使用随机私钥经 KuGouEncoder 加密、
+KuGouDecoder 解密，逐字节验证往返结果，并统计各实现（逐字节/向量化/查表）的吞吐量。
+结果保存为JSON，便于与之前版本的结果对比发现性能回退。
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import random
+import hashlib
+import platform
+import contextlib
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# 优先使用已粘贴密钥的完整版，其次使用架构版（同目录下需有kugou_key.xz）
+DECODER_SCRIPTS = ["酷狗音乐解密工具(完整版).py", "酷狗音乐解密工具(架构板).py"]
+ENCODER_SCRIPTS = ["酷狗音乐加密工具(完整版).py", "酷狗音乐加密工具(架构版).py"]
+
+DEFAULT_SIZES = [64 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+DEFAULT_LOOP_MAX_SIZE = 1024 * 1024  # 逐字节实现很慢，只测试不超过该大小的数据
+DEFAULT_REPEAT = 3
+REGRESSION_RATIO = 0.8  # 低于基准结果该比例时提示性能回退
+
+def load_tool(module_name, script_names):
+    """加载同目录下的加密/解密工具脚本（文件名含中文和括号，无法直接import）"""
+    for script_name in script_names:
+        script_path = SCRIPT_DIR / script_name
+        if not script_path.exists():
+            continue
+        
+        spec = importlib.util.spec_from_file_location(module_name, script_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        
+        if module.has_pub_key_source():
+            return module, script_path
+    
+    raise FileNotFoundError(f"未找到可用的工具脚本（或缺少密钥数据）: {', '.join(script_names)}")
+
+def file_sha256(path):
+    """计算脚本文件的SHA-256，用于区分不同版本的测试结果"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# ================================================
+# 合成音频数据
+# ================================================
+
+def make_mp3_payload(size, rng):
+    """生成MP3格式的数据：ID3v2标签 + MPEG1 Layer III 128kbps帧（帧内容随机）"""
+    title = "基准测试".encode('utf-8')
+    frame = b'TIT2' + (len(title) + 1).to_bytes(4, 'big') + b'\x00\x00' + b'\x03' + title
+    tag = b'ID3\x03\x00\x00' + bytes([0, 0, 0, len(frame)]) + frame
+    
+    data = bytearray(tag)
+    frame_header = b'\xff\xfb\x90\x00'
+    frame_len = 417  # 144 * 128000 / 44100
+    while len(data) < size:
+        data += frame_header + rng.randbytes(frame_len - len(frame_header))
+    
+    return bytes(data[:size])
+
+def make_flac_payload(size, rng):
+    """生成FLAC格式的数据：fLaC + STREAMINFO元数据块 + 随机音频帧"""
+    streaminfo = bytearray(34)
+    streaminfo[10:13] = bytes([0x0A, 0xC4, 0x42])  # 44100Hz，双声道，16位
+    header = b'fLaC' + bytes([0x80]) + len(streaminfo).to_bytes(3, 'big') + bytes(streaminfo)
+    
+    return (header + rng.randbytes(max(0, size - len(header))))[:size]
+
+PAYLOAD_GENERATORS = {
+    "mp3": make_mp3_payload,
+    "flac": make_flac_payload,
+}
+
+# ================================================
+# 往返验证与计时
+# ================================================
+
+def format_size(size):
+    """格式化数据大小"""
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:g}MB"
+    return f"{size / 1024:g}KB"
+
+def time_best(func, repeat):
+    """重复执行取最短耗时（首次执行包含密钥流表的构建）"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def encode(enc_module, payload, own_key, engine):
+    """使用指定实现加密，返回完整的加密文件内容"""
+    output = io.BytesIO()
+    with contextlib.redirect_stdout(io.StringIO()):  # 加密器构造时会打印私钥
+        encoder = enc_module.KuGouEncoder(output, own_key, engine=engine)
+    encoder.encrypt_stream(io.BytesIO(payload))
+    return output.getvalue()
+
+def decode(dec_module, encrypted, engine):
+    """使用指定实现解密"""
+    decoder = dec_module.KuGouDecoder(io.BytesIO(encrypted), engine=engine)
+    return decoder.read_all()
+
+def run_case(dec_module, enc_module, audio_format, size, rng, encode_engines, decode_engines,
+             loop_max_size, repeat):
+    """对一组 格式/大小 执行往返验证，返回每个实现的结果记录"""
+    payload = PAYLOAD_GENERATORS[audio_format](size, rng)
+    own_key = rng.randbytes(16)
+    records = []
+    
+    def record(operation, engine, seconds, ok, error=""):
+        records.append({
+            "format": audio_format,
+            "size": size,
+            "own_key": own_key.hex().upper(),
+            "operation": operation,
+            "engine": engine,
+            "seconds": round(seconds, 6),
+            "mb_per_s": round(size / 1024 / 1024 / seconds, 3) if seconds > 0 else None,
+            "ok": ok,
+            "error": error,
+        })
+    
+    # 加密：所有实现的输出必须逐字节一致
+    reference = None
+    for engine in encode_engines:
+        if engine == "python" and size > loop_max_size:
+            continue
+        
+        encrypted, seconds = time_best(lambda: encode(enc_module, payload, own_key, engine), repeat)
+        if reference is None:
+            reference = encrypted
+        ok = encrypted == reference
+        record("encode", engine, seconds, ok, "" if ok else "加密结果与其他实现不一致")
+    
+    # 解密：必须还原出原始数据，并能识别出音频格式
+    for engine in decode_engines:
+        if engine == "python" and size > loop_max_size:
+            continue
+        
+        decrypted, seconds = time_best(lambda: decode(dec_module, reference, engine), repeat)
+        error = ""
+        if decrypted != payload:
+            error = "解密结果与原始数据不一致"
+        elif dec_module.detect_audio_format(decrypted[:4096]) != audio_format:
+            error = "无法识别解密后的音频格式"
+        record("decode", engine, seconds, not error, error)
+    
+    return records
+
+def compare_with_baseline(results, baseline_path):
+    """与之前保存的JSON结果对比，提示吞吐量明显下降的实现"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    
+    def key(item):
+        return (item["format"], item["size"], item["operation"], item["engine"])
+    
+    previous = {key(item): item for item in baseline.get("results", [])}
+    regressions = 0
+    
+    print("")
+    print(f"与基准结果对比: {baseline_path}")
+    print("-" * 60)
+    for item in results:
+        old = previous.get(key(item))
+        if not old or not old.get("mb_per_s") or not item["mb_per_s"]:
+            continue
+        
+        ratio = item["mb_per_s"] / old["mb_per_s"]
+        mark = ""
+        if ratio < REGRESSION_RATIO:
+            mark = "  ⚠️ 性能回退"
+            regressions += 1
+        print(
+            f"  {item['format']:<5}{format_size(item['size']):>7} {item['operation']:<7}{item['engine']:<7}"
+            f"{old['mb_per_s']:>10.1f} → {item['mb_per_s']:>8.1f} MB/s ({ratio:.2f}x){mark}"
+        )
+    
+    return regressions
+
+def run_benchmark(sizes, formats, loop_max_size, repeat, seed):
+    """执行全部测试用例，返回JSON报告"""
+    dec_module, dec_path = load_tool("kugou_decrypt_tool", DECODER_SCRIPTS)
+    enc_module, enc_path = load_tool("kugou_encrypt_tool", ENCODER_SCRIPTS)
+    
+    # 预先加载公钥，避免计入第一个用例的耗时
+    print("正在加载密钥...")
+    with contextlib.redirect_stdout(io.StringIO()):
+        dec_module.load_pub_key_data()
+        enc_module.load_pub_key_data()
+    
+    encode_engines = ["python", "cached"]
+    decode_engines = ["python", "cached"]
+    if dec_module.np is not None:
+        decode_engines.insert(1, "numpy")
+    
+    rng = random.Random(seed)
+    results = []
+    
+    print(f"数据大小: {', '.join(format_size(size) for size in sizes)}  格式: {', '.join(formats)}")
+    print(f"NumPy: {'可用' if dec_module.np is not None else '不可用（查表实现退回纯Python）'}")
+    print("=" * 60)
+    print(f"  {'格式':<4}{'大小':>6} {'操作':<5}{'实现':<5}{'耗时(秒)':>12}{'吞吐量':>14}  结果")
+    
+    for audio_format in formats:
+        for size in sizes:
+            records = run_case(
+                dec_module, enc_module, audio_format, size, rng,
+                encode_engines, decode_engines, loop_max_size, repeat
+            )
+            for item in records:
+                status = "✓" if item["ok"] else f"✗ {item['error']}"
+                print(
+                    f"  {item['format']:<5}{format_size(item['size']):>7} {item['operation']:<7}{item['engine']:<7}"
+                    f"{item['seconds']:>10.4f}{item['mb_per_s']:>10.1f} MB/s  {status}"
+                )
+            results.extend(records)
+    
+    return {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": dec_module.np.__version__ if dec_module.np is not None else None,
+        "tools": {
+            "decoder": {"script": dec_path.name, "sha256": file_sha256(dec_path)},
+            "encoder": {"script": enc_path.name, "sha256": file_sha256(enc_path)},
+        },
+        "settings": {
+            "sizes": sizes,
+            "formats": formats,
+            "loop_max_size": loop_max_size,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "ok": all(item["ok"] for item in results),
+        "results": results,
+    }
+
+def parse_size(text):
+    """解析大小参数，支持K/M后缀（如 64K、8M）"""
+    text = text.strip().upper()
+    units = {"K": 1024, "M": 1024 * 1024}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("酷狗音乐加解密往返验证与性能基准测试")
+    print("=" * 60)
+    
+    sizes = list(DEFAULT_SIZES)
+    formats = list(PAYLOAD_GENERATORS)
+    loop_max_size = DEFAULT_LOOP_MAX_SIZE
+    repeat = DEFAULT_REPEAT
+    seed = None
+    output_path = None
+    baseline_path = None
+    
+    # 解析参数
+    i = 1
+    try:
+        while i < len(sys.argv):
+            arg = sys.argv[i]
+            if arg in ("-h", "--help"):
+                print("使用方法: python 编解码基准测试.py [参数]")
+                print("")
+                print("可选参数：")
+                print("  --sizes 64K,1M,8M   测试的数据大小")
+                print("  --formats mp3,flac  测试的音频格式")
+                print("  --loop-max SIZE     逐字节实现只测试不超过该大小的数据（默认1M）")
+                print("  --repeat N          每个实现重复次数，取最短耗时（默认3）")
+                print("  --seed N            随机种子（固定后可复现相同的数据与私钥）")
+                print("  --output PATH       结果JSON路径（默认 kgm_benchmark_时间.json）")
+                print("  --baseline PATH     与之前的结果JSON对比，提示性能回退")
+                return 0
+            elif arg == "--sizes" and i + 1 < len(sys.argv):
+                sizes = [parse_size(item) for item in sys.argv[i + 1].split(",") if item]
+            elif arg == "--formats" and i + 1 < len(sys.argv):
+                formats = [item for item in sys.argv[i + 1].lower().split(",") if item]
+                unknown = [item for item in formats if item not in PAYLOAD_GENERATORS]
+                if unknown:
+                    print(f"错误：不支持的格式 {', '.join(unknown)}")
+                    return 2
+            elif arg == "--loop-max" and i + 1 < len(sys.argv):
+                loop_max_size = parse_size(sys.argv[i + 1])
+            elif arg == "--repeat" and i + 1 < len(sys.argv):
+                repeat = max(1, int(sys.argv[i + 1]))
+            elif arg == "--seed" and i + 1 < len(sys.argv):
+                seed = int(sys.argv[i + 1])
+            elif arg == "--output" and i + 1 < len(sys.argv):
+                output_path = sys.argv[i + 1]
+            elif arg == "--baseline" and i + 1 < len(sys.argv):
+                baseline_path = sys.argv[i + 1]
+            else:
+                print(f"警告：忽略未知参数 {arg}")
+                i += 1
+                continue
+            i += 2
+    except ValueError as e:
+        print(f"错误：无效的参数值: {e}")
+        return 2
+    
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    if output_path is None:
+        output_path = f"kgm_benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    
+    try:
+        report = run_benchmark(sizes, formats, loop_max_size, repeat, seed)
+    except FileNotFoundError as e:
+        print(f"错误: {e}")
+        return 2
+    
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    print("=" * 60)
+    failed = [item for item in report["results"] if not item["ok"]]
+    if failed:
+        print(f"✗ 往返验证失败: {len(failed)} 项（随机种子: {seed}）")
+    else:
+        print(f"✓ 往返验证全部通过，共 {len(report['results'])} 项（随机种子: {seed}）")
+    print(f"结果已保存到: {os.path.abspath(output_path)}")
+    
+    regressions = 0
+    if baseline_path:
+        regressions = compare_with_baseline(report["results"], baseline_path)
+        if regressions:
+            print(f"⚠️ 有 {regressions} 项吞吐量低于基准结果的 {REGRESSION_RATIO:.0%}")
+    
+    return 1 if failed or regressions else 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    
+    # 双击运行时保持窗口，命令行/脚本调用时直接退出
+    if sys.stdin.isatty():
+        print("")
+        input("按回车键退出...")
+    sys.exit(exit_code)
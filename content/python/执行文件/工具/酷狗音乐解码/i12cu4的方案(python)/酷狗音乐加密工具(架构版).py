@@ -6,6 +6,10 @@ import sys
 import lzma
 import io
 import os
+import mmap
+import hashlib
+import tempfile
+from collections import OrderedDict
 from pathlib import Path
 
 # ================================================
@@ -16,6 +20,240 @@ KUGOU_KEY_XZ_HEX = ""  # 请将密钥粘贴在此处（与解密工具相同）
 
 # ================================================
 
+# NumPy为可选依赖：存在时使用向量化加密，否则退回纯Python实现
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 进程内共享的公钥数据（所有加密器共用）
+_shared_pub_key_data = None
+# 当前使用的公钥缓存文件（mmap映射成功时设置）
+_pub_key_cache_path = None
+
+# 公钥缓存文件：保存解压后的公钥，后续运行直接只读mmap映射，多个进程共享同一份物理内存
+PUB_KEY_CACHE_NAME = "kugou_key.bin"
+PUB_KEY_CACHE_MAGIC = b"KGMPUB01"
+PUB_KEY_CACHE_HEADER_LEN = 64  # 魔数(8) + 压缩数据SHA-256(32) + 公钥长度(8)，其余填充0
+
+def find_pub_key_xz():
+    """查找kugou_key.xz文件（与"转二进制.py"的查找位置一致）"""
+    search_paths = [
+        Path.cwd() / "kugou_key.xz",
+        Path.cwd() / "assets" / "kugou_key.xz",
+        Path(__file__).parent / "kugou_key.xz",
+        Path(__file__).parent / "assets" / "kugou_key.xz",
+    ]
+    
+    for path in search_paths:
+        if path.exists():
+            return path
+    return None
+
+def has_pub_key_source():
+    """是否提供了公钥数据（粘贴的十六进制字符串或kugou_key.xz文件）"""
+    return bool(KUGOU_KEY_XZ_HEX) or find_pub_key_xz() is not None
+
+def read_pub_key_source():
+    """读取压缩的公钥数据：优先使用粘贴的十六进制字符串，其次使用kugou_key.xz"""
+    if KUGOU_KEY_XZ_HEX:
+        return bytes.fromhex(KUGOU_KEY_XZ_HEX)
+    
+    xz_path = find_pub_key_xz()
+    if xz_path is None:
+        raise ValueError("请先在代码中粘贴密钥数据，或将kugou_key.xz放在本工具同目录下")
+    return xz_path.read_bytes()
+
+def _pub_key_cache_candidates():
+    """公钥缓存文件的候选位置（工具目录不可写时使用系统临时目录）"""
+    return [
+        Path(__file__).parent / PUB_KEY_CACHE_NAME,
+        Path(tempfile.gettempdir()) / PUB_KEY_CACHE_NAME,
+    ]
+
+def _open_pub_key_cache(cache_path, digest):
+    """校验并只读映射公钥缓存文件，缓存不存在或已过期时返回None"""
+    try:
+        with open(cache_path, 'rb') as f:
+            header = f.read(PUB_KEY_CACHE_HEADER_LEN)
+            if len(header) < PUB_KEY_CACHE_HEADER_LEN:
+                return None
+            if header[:8] != PUB_KEY_CACHE_MAGIC or header[8:40] != digest:
+                return None
+            
+            length = int.from_bytes(header[40:48], 'little')
+            if os.fstat(f.fileno()).st_size != PUB_KEY_CACHE_HEADER_LEN + length:
+                return None
+            
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+    
+    return memoryview(mapped)[PUB_KEY_CACHE_HEADER_LEN:]
+
+def _write_pub_key_cache(cache_path, digest, pub_key_data):
+    """写入公钥缓存文件（先写临时文件再原子替换）"""
+    header = PUB_KEY_CACHE_MAGIC + digest + len(pub_key_data).to_bytes(8, 'little')
+    header += bytes(PUB_KEY_CACHE_HEADER_LEN - len(header))
+    
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(pub_key_data)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        if temp_path.exists():
+            os.remove(temp_path)
+        raise
+
+def load_pub_key_data():
+    """获取公钥数据（每个进程只加载一次）
+    
+    优先mmap映射已校验的缓存文件；缓存缺失或与密钥数据不一致时，
+    解压密钥数据并写入缓存，供后续运行和其他进程直接映射。
+    """
+    global _shared_pub_key_data, _pub_key_cache_path
+    if _shared_pub_key_data is None:
+        try:
+            xz_data = read_pub_key_source()
+        except OSError as e:
+            raise ValueError(f"密钥处理失败: {e}")
+        digest = hashlib.sha256(xz_data).digest()
+        
+        # 1. 映射已有缓存
+        for cache_path in _pub_key_cache_candidates():
+            pub_key_data = _open_pub_key_cache(cache_path, digest)
+            if pub_key_data is not None:
+                _shared_pub_key_data = pub_key_data
+                _pub_key_cache_path = cache_path
+                return _shared_pub_key_data
+        
+        # 2. 解压并写入缓存
+        print("正在加载加密密钥...")
+        try:
+            print(f"✓ 密钥数据大小: {len(xz_data):,} 字节")
+            
+            # 在内存中解压
+            xz_file = io.BytesIO(xz_data)
+            with lzma.open(xz_file, 'rb') as f:
+                pub_key_data = f.read()
+            print(f"✓ 密钥解压完成，大小: {len(pub_key_data):,} 字节")
+            
+        except Exception as e:
+            raise ValueError(f"密钥处理失败: {e}")
+        
+        _shared_pub_key_data = pub_key_data
+        for cache_path in _pub_key_cache_candidates():
+            try:
+                _write_pub_key_cache(cache_path, digest, pub_key_data)
+            except OSError:
+                continue
+            print(f"✓ 已写入密钥缓存: {cache_path}")
+            
+            # 改为映射缓存文件，释放解压得到的内存副本
+            mapped = _open_pub_key_cache(cache_path, digest)
+            if mapped is not None:
+                _shared_pub_key_data = mapped
+                _pub_key_cache_path = cache_path
+            break
+    
+    return _shared_pub_key_data
+
+# 位移混淆 x ⊕ ((x & 0x0F) << 4) 的查找表
+NIBBLE_MIX_TABLE = bytes(x ^ ((x & 0x0F) << 4) for x in range(256))
+
+class KeystreamCache:
+    """组合密钥流缓存（按私钥LRU淘汰，内存占用有上限）
+    
+    原始密钥流 R(i) = 私钥[i % 17] ⊕ 修正表[i % 272] ⊕ 公钥[i / 16]。
+    由于 272 = 16 × 17，第 j 个16字节块内的 私钥⊕修正表 只取决于 j % 17，
+    而公钥字节在块内保持不变，因此每个私钥只需预计算 17 × 256 个16字节块，
+    任意位置的密钥流都可以按 (j % 17, 公钥[j]) 查表拼接得到。
+    """
+    
+    BLOCK_LEN = 16    # 每个公钥字节覆盖的字节数
+    BLOCK_CYCLE = 17  # 修正表周期内的块数（272 / 16）
+    
+    def __init__(self, mend_table, max_entries=64):
+        """初始化缓存
+        Args:
+            mend_table: 公钥修正表（272字节）
+            max_entries: 最多缓存的私钥数量（每个私钥约68KB）
+        """
+        self.mend_table = mend_table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+    
+    def get(self, own_key):
+        """获取私钥对应的密钥块表（不存在时计算并缓存）"""
+        key = bytes(own_key)
+        table = self._tables.get(key)
+        if table is not None:
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return table
+        
+        self.misses += 1
+        table = self._build(key)
+        self._tables[key] = table
+        if len(self._tables) > self.max_entries:
+            self._tables.popitem(last=False)
+        return table
+    
+    def _build(self, own_key):
+        """预计算 17 × 256 个密钥块"""
+        block_len = self.BLOCK_LEN
+        own_mend = bytes(
+            own_key[i % len(own_key)] ^ self.mend_table[i]
+            for i in range(len(self.mend_table))
+        )
+        
+        if np is not None:
+            base = np.frombuffer(own_mend, dtype=np.uint8).reshape(self.BLOCK_CYCLE, 1, block_len)
+            pub = np.arange(256, dtype=np.uint8).reshape(1, 256, 1)
+            return (base ^ pub).reshape(self.BLOCK_CYCLE * 256, block_len)
+        
+        blocks = []
+        for r in range(self.BLOCK_CYCLE):
+            base = int.from_bytes(own_mend[r * block_len:(r + 1) * block_len], 'little')
+            for pub in range(256):
+                pub_block = int.from_bytes(bytes([pub]) * block_len, 'little')
+                blocks.append((base ^ pub_block).to_bytes(block_len, 'little'))
+        return blocks
+    
+    def keystream(self, own_key, pub_key_fragment, start_pos, length):
+        """生成绝对位置 [start_pos, start_pos + length) 上的原始密钥流
+        Args:
+            own_key: 私钥（17字节）
+            pub_key_fragment: 从 start_pos // 16 开始的公钥片段，不足部分按0处理
+            start_pos: 起始绝对位置
+            length: 密钥流长度
+        Returns:
+            安装NumPy时返回uint8数组，否则返回bytes
+        """
+        table = self.get(own_key)
+        block_len = self.BLOCK_LEN
+        start_block = start_pos // block_len
+        block_count = (start_pos + length - 1) // block_len - start_block + 1
+        offset = start_pos % block_len
+        
+        if np is not None:
+            pub_key = np.zeros(block_count, dtype=np.intp)
+            pub_key[:len(pub_key_fragment)] = np.frombuffer(pub_key_fragment, dtype=np.uint8)
+            rows = np.arange(start_block, start_block + block_count) % self.BLOCK_CYCLE * 256 + pub_key
+            return np.take(table, rows, axis=0).reshape(-1)[offset:offset + length]
+        
+        pub_key = bytes(pub_key_fragment) + bytes(block_count - len(pub_key_fragment))
+        cycle = self.BLOCK_CYCLE
+        stream = b''.join([
+            table[(block % cycle) * 256 + pub_key[k]]
+            for k, block in enumerate(range(start_block, start_block + block_count))
+        ])
+        return stream[offset:offset + length]
+
 class KuGouEncoder:
     """酷狗音乐加密器 - 基于正确解密的逆向实现"""
     
@@ -54,17 +292,33 @@ class KuGouEncoder:
         0xEF, 0x7C, 0xB6, 0xB3, 0x93, 0x50
     ])
     
-    def __init__(self, output_file, own_key=None):
+    # 所有加密器共享的密钥流缓存 - 与解密器完全一致
+    keystream_cache = KeystreamCache(PUB_KEY_MEND)
+    
+    # 流式加密每次读取的块大小
+    CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, output_file, own_key=None, engine="cached"):
         """初始化加密器
         Args:
             output_file: 输出文件对象
             own_key: 可选的私钥（16字节），如果不提供则使用固定私钥
+            engine: 加密实现，"cached"（预计算密钥流查表，默认）或 "python"（逐字节）
         """
         self.output_file = output_file
         self.own_key = bytearray(self.OWN_KEY_LEN)
         self.pos = 0  # 当前写入位置（从加密数据开始计算）
         self._pub_key_data = None
         
+        # 选择加密实现
+        if engine == "cached":
+            self._encrypt_chunk_impl = self._encrypt_chunk_cached
+        elif engine == "python":
+            self._encrypt_chunk_impl = self._encrypt_chunk_python
+        else:
+            raise ValueError(f"未知的加密实现: {engine}")
+        self.engine = engine
+        
         # 设置私钥
         if own_key is not None and len(own_key) >= 16:
             # 使用提供的私钥
@@ -101,26 +355,9 @@ class KuGouEncoder:
         self.output_file.write(header)
     
     def _get_pub_key_data(self):
-        """获取公钥数据（从十六进制字符串解码并解压）"""
+        """获取公钥数据（同一进程内的加密器共享同一份数据）"""
         if self._pub_key_data is None:
-            # 检查是否已提供十六进制字符串
-            if not KUGOU_KEY_XZ_HEX:
-                raise ValueError("请先在代码中粘贴密钥数据")
-            
-            print("正在加载加密密钥...")
-            try:
-                # 从十六进制字符串解码
-                xz_data = bytes.fromhex(KUGOU_KEY_XZ_HEX)
-                print(f"✓ 密钥数据大小: {len(xz_data):,} 字节")
-                
-                # 在内存中解压
-                xz_file = io.BytesIO(xz_data)
-                with lzma.open(xz_file, 'rb') as f:
-                    self._pub_key_data = f.read()
-                print(f"✓ 密钥解压完成，大小: {len(self._pub_key_data):,} 字节")
-                
-            except Exception as e:
-                raise ValueError(f"密钥处理失败: {e}")
+            self._pub_key_data = load_pub_key_data()
         
         return self._pub_key_data
     
@@ -145,7 +382,16 @@ class KuGouEncoder:
         return pub_key_data[pub_key_start:pub_key_end]
     
     def _encrypt_chunk(self, plain_data):
-        """加密数据块 - 解密算法的精确逆向"""
+        """加密数据块并更新写入位置"""
+        encrypted_data = self._encrypt_chunk_impl(plain_data)
+        
+        # 更新位置
+        self.pos += len(plain_data)
+        
+        return encrypted_data
+    
+    def _encrypt_chunk_python(self, plain_data):
+        """加密数据块 - 解密算法的精确逆向（逐字节实现）"""
         # 获取对应的公钥片段
         pub_key_fragment = self._get_pub_key_for_range(self.pos, self.pos + len(plain_data))
         
@@ -200,11 +446,74 @@ class KuGouEncoder:
             
             encrypted_data[i] = encrypted_byte
         
-        # 更新位置
-        self.pos += len(plain_data)
-        
         return bytes(encrypted_data)
     
+    def _encrypt_chunk_cached(self, plain_data):
+        """加密数据块 - 查表得到原始密钥流后一次异或
+        
+        解密为 D = T(E ⊕ R)，T 为自逆的位移混淆，因此 E = T(D) ⊕ R，
+        R 为缓存中的原始密钥流（与解密器共用同一公式）。
+        """
+        length = len(plain_data)
+        pub_key_fragment = self._get_pub_key_for_range(self.pos, self.pos + length - 1)
+        keystream = self.keystream_cache.keystream(self.own_key, pub_key_fragment, self.pos, length)
+        
+        if np is not None:
+            plain = np.frombuffer(plain_data, dtype=np.uint8)
+            low = np.bitwise_and(plain, 0x0F)
+            np.left_shift(low, 4, out=low)
+            mixed = np.bitwise_xor(plain, low)
+            mixed ^= keystream
+            return mixed.tobytes()
+        
+        mixed = int.from_bytes(bytes(plain_data).translate(NIBBLE_MIX_TABLE), 'little')
+        return (mixed ^ int.from_bytes(keystream, 'little')).to_bytes(length, 'little')
+    
+    def _encrypt_into(self, buffer):
+        """原地加密可写缓冲区并更新写入位置（流式加密使用，不产生新的数据块）"""
+        length = len(buffer)
+        
+        if self.engine == "cached" and np is not None:
+            pub_key_fragment = self._get_pub_key_for_range(self.pos, self.pos + length - 1)
+            keystream = self.keystream_cache.keystream(self.own_key, pub_key_fragment, self.pos, length)
+            
+            # E = T(D) ⊕ R，全部在输入缓冲区上完成
+            plain = np.frombuffer(buffer, dtype=np.uint8)
+            low = np.bitwise_and(plain, 0x0F)
+            np.left_shift(low, 4, out=low)
+            plain ^= low
+            plain ^= keystream
+            self.pos += length
+        else:
+            buffer[:] = self._encrypt_chunk(buffer)
+    
+    def encrypt_stream(self, input_file, progress_callback=None):
+        """流式加密：用readinto读入同一个缓冲区，原地加密后直接写出，内存占用恒定
+        Args:
+            input_file: 以二进制模式打开的明文文件对象
+            progress_callback: 可选的进度回调 callback(已加密字节数)
+        Returns:
+            加密的字节数
+        """
+        buffer = bytearray(self.CHUNK_SIZE)
+        view = memoryview(buffer)
+        total_encrypted = 0
+        
+        while True:
+            size = input_file.readinto(buffer)
+            if not size:
+                break
+            
+            chunk = view[:size]
+            self._encrypt_into(chunk)
+            self.output_file.write(chunk)
+            total_encrypted += size
+            
+            if progress_callback is not None:
+                progress_callback(total_encrypted)
+        
+        return total_encrypted
+    
     def encrypt(self, plain_data, chunk_size=65536):
         """加密数据（支持流式处理）"""
         total_encrypted = 0
@@ -227,14 +536,15 @@ def encrypt_file(input_path, output_path=None, custom_own_key=None):
     """加密单个文件为酷狗格式"""
     try:
         # 检查密钥数据
-        if not KUGOU_KEY_XZ_HEX:
+        if not has_pub_key_source():
             print("错误: 未找到密钥数据")
             print("")
             print("请按以下步骤操作：")
             print("1. 运行配套的密钥提取工具\"转二进制.py\"将\"kugou_key.xz\"生成为\"kugou_key_simple.py\"")
             print("2. 复制生成\"kugou_key_simple.py\"文件中的KUGOU_KEY_XZ_HEX值")
-            print("3. 打开本文件，在第15行粘贴该值")
+            print("3. 打开本文件，在开头的KUGOU_KEY_XZ_HEX处粘贴该值")
             print("4. 保存文件后重新运行本文件，即可生效解密功能")
+            print("   （也可以直接将\"kugou_key.xz\"放在本工具同目录下，无需粘贴）")
             return False
         
         input_path_obj = Path(input_path)
@@ -247,11 +557,6 @@ def encrypt_file(input_path, output_path=None, custom_own_key=None):
         print(f"正在处理: {input_path_obj.name}")
         print(f"文件大小: {file_size:,} 字节")
         
-        # 读取原始音频文件
-        print("读取原始文件...")
-        with open(input_path_obj, 'rb') as f:
-            plain_data = f.read()
-        
         # 确定输出路径
         if output_path is None:
             # 默认输出到同目录，扩展名为.kgm
@@ -269,18 +574,32 @@ def encrypt_file(input_path, output_path=None, custom_own_key=None):
             if not output_path_obj.suffix.lower().endswith('.kgm'):
                 output_path_obj = output_path_obj.with_suffix('.kgm')
         
-        # 创建加密文件
+        # 创建加密文件：边读边加密写入同目录下的临时文件，完成后再原子替换为目标文件
         print(f"创建加密文件: {output_path_obj}")
-        with open(output_path_obj, 'wb') as out_f:
-            # 创建加密器
-            encoder = KuGouEncoder(out_f, custom_own_key)
-            
-            print("开始加密文件...")
-            
-            # 加密数据
-            total_encrypted = encoder.encrypt(plain_data)
+        temp_path = output_path_obj.with_name(f".{output_path_obj.name}.part")
+        
+        def show_progress(total_encrypted):
+            progress = total_encrypted / file_size * 100 if file_size else 100
+            print(f"\r加密进度: {progress:.1f}%", end='')
+        
+        try:
+            with open(input_path_obj, 'rb') as in_f, open(temp_path, 'wb') as out_f:
+                # 创建加密器
+                encoder = KuGouEncoder(out_f, custom_own_key)
+                
+                print("开始加密文件...")
+                
+                # 加密数据
+                total_encrypted = encoder.encrypt_stream(in_f, show_progress)
+                print()  # 换行
             
-            print(f"✓ 加密完成，共处理 {total_encrypted:,} 字节")
+            os.replace(temp_path, output_path_obj)
+        except BaseException:
+            if temp_path.exists():
+                os.remove(temp_path)
+            raise
+        
+        print(f"✓ 加密完成，共处理 {total_encrypted:,} 字节")
         
         output_size = output_path_obj.stat().st_size
         print(f"✓ 加密文件保存完成，文件大小: {output_size:,} 字节")
@@ -360,14 +679,15 @@ def main():
     print("=" * 60)
     
     # 检查密钥数据
-    if not KUGOU_KEY_XZ_HEX:
+    if not has_pub_key_source():
         print("错误: 未找到密钥数据")
         print("=" * 60)
         print("请按以下步骤操作：")
         print("1. 运行配套的密钥提取工具\"转二进制.py\"将\"kugou_key.xz\"生成为\"kugou_key_simple.py\"")
         print("2. 复制生成\"kugou_key_simple.py\"文件中的KUGOU_KEY_XZ_HEX值")
-        print("3. 打开本文件，在第15行粘贴该值")
+        print("3. 打开本文件，在开头的KUGOU_KEY_XZ_HEX处粘贴该值")
         print("4. 保存文件后重新运行本文件，即可生效解密功能")
+        print("   （也可以直接将\"kugou_key.xz\"放在本工具同目录下，无需粘贴）")
         print("")
         input("按回车键退出...")
         return
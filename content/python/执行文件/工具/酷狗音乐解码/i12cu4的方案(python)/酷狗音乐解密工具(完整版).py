@@ -4,8 +4,19 @@
 """
 
 import sys
+import os
+import contextlib
+import csv
+import sqlite3
 import lzma
 import io
+import time
+import mmap
+import hashlib
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 from pathlib import Path
 
 # ================================================
@@ -18,6 +29,240 @@ KUGOU_KEY_XZ_HEX = "fd377a585a000004e6d6b446020021011c00000010cf58ccfffeff729d5d
 
 # ================================================
 
+# NumPy为可选依赖：存在时使用向量化解密，否则退回纯Python实现
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 进程内共享的公钥数据（所有解密器共用）
+_shared_pub_key_data = None
+# 当前使用的公钥缓存文件（mmap映射成功时设置）
+_pub_key_cache_path = None
+
+# 公钥缓存文件：保存解压后的公钥，后续运行直接只读mmap映射，多个进程共享同一份物理内存
+PUB_KEY_CACHE_NAME = "kugou_key.bin"
+PUB_KEY_CACHE_MAGIC = b"KGMPUB01"
+PUB_KEY_CACHE_HEADER_LEN = 64  # 魔数(8) + 压缩数据SHA-256(32) + 公钥长度(8)，其余填充0
+
+def find_pub_key_xz():
+    """查找kugou_key.xz文件（与"转二进制.py"的查找位置一致）"""
+    search_paths = [
+        Path.cwd() / "kugou_key.xz",
+        Path.cwd() / "assets" / "kugou_key.xz",
+        Path(__file__).parent / "kugou_key.xz",
+        Path(__file__).parent / "assets" / "kugou_key.xz",
+    ]
+    
+    for path in search_paths:
+        if path.exists():
+            return path
+    return None
+
+def has_pub_key_source():
+    """是否提供了公钥数据（粘贴的十六进制字符串或kugou_key.xz文件）"""
+    return bool(KUGOU_KEY_XZ_HEX) or find_pub_key_xz() is not None
+
+def read_pub_key_source():
+    """读取压缩的公钥数据：优先使用粘贴的十六进制字符串，其次使用kugou_key.xz"""
+    if KUGOU_KEY_XZ_HEX:
+        return bytes.fromhex(KUGOU_KEY_XZ_HEX)
+    
+    xz_path = find_pub_key_xz()
+    if xz_path is None:
+        raise ValueError("请先在代码中粘贴密钥数据，或将kugou_key.xz放在本工具同目录下")
+    return xz_path.read_bytes()
+
+def _pub_key_cache_candidates():
+    """公钥缓存文件的候选位置（工具目录不可写时使用系统临时目录）"""
+    return [
+        Path(__file__).parent / PUB_KEY_CACHE_NAME,
+        Path(tempfile.gettempdir()) / PUB_KEY_CACHE_NAME,
+    ]
+
+def _open_pub_key_cache(cache_path, digest):
+    """校验并只读映射公钥缓存文件，缓存不存在或已过期时返回None"""
+    try:
+        with open(cache_path, 'rb') as f:
+            header = f.read(PUB_KEY_CACHE_HEADER_LEN)
+            if len(header) < PUB_KEY_CACHE_HEADER_LEN:
+                return None
+            if header[:8] != PUB_KEY_CACHE_MAGIC or header[8:40] != digest:
+                return None
+            
+            length = int.from_bytes(header[40:48], 'little')
+            if os.fstat(f.fileno()).st_size != PUB_KEY_CACHE_HEADER_LEN + length:
+                return None
+            
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+    
+    return memoryview(mapped)[PUB_KEY_CACHE_HEADER_LEN:]
+
+def _write_pub_key_cache(cache_path, digest, pub_key_data):
+    """写入公钥缓存文件（先写临时文件再原子替换）"""
+    header = PUB_KEY_CACHE_MAGIC + digest + len(pub_key_data).to_bytes(8, 'little')
+    header += bytes(PUB_KEY_CACHE_HEADER_LEN - len(header))
+    
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(pub_key_data)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        if temp_path.exists():
+            os.remove(temp_path)
+        raise
+
+def load_pub_key_data():
+    """获取公钥数据（每个进程只加载一次）
+    
+    优先mmap映射已校验的缓存文件；缓存缺失或与密钥数据不一致时，
+    解压密钥数据并写入缓存，供后续运行和其他进程直接映射。
+    """
+    global _shared_pub_key_data, _pub_key_cache_path
+    if _shared_pub_key_data is None:
+        try:
+            xz_data = read_pub_key_source()
+        except OSError as e:
+            raise ValueError(f"密钥处理失败: {e}")
+        digest = hashlib.sha256(xz_data).digest()
+        
+        # 1. 映射已有缓存
+        for cache_path in _pub_key_cache_candidates():
+            pub_key_data = _open_pub_key_cache(cache_path, digest)
+            if pub_key_data is not None:
+                _shared_pub_key_data = pub_key_data
+                _pub_key_cache_path = cache_path
+                return _shared_pub_key_data
+        
+        # 2. 解压并写入缓存
+        print("正在加载解密密钥...")
+        try:
+            print(f"✓ 密钥数据大小: {len(xz_data):,} 字节")
+            
+            # 在内存中解压
+            xz_file = io.BytesIO(xz_data)
+            with lzma.open(xz_file, 'rb') as f:
+                pub_key_data = f.read()
+            print(f"✓ 密钥解压完成，大小: {len(pub_key_data):,} 字节")
+            
+        except Exception as e:
+            raise ValueError(f"密钥处理失败: {e}")
+        
+        _shared_pub_key_data = pub_key_data
+        for cache_path in _pub_key_cache_candidates():
+            try:
+                _write_pub_key_cache(cache_path, digest, pub_key_data)
+            except OSError:
+                continue
+            print(f"✓ 已写入密钥缓存: {cache_path}")
+            
+            # 改为映射缓存文件，释放解压得到的内存副本
+            mapped = _open_pub_key_cache(cache_path, digest)
+            if mapped is not None:
+                _shared_pub_key_data = mapped
+                _pub_key_cache_path = cache_path
+            break
+    
+    return _shared_pub_key_data
+
+# 位移混淆 x ⊕ ((x & 0x0F) << 4) 的查找表
+NIBBLE_MIX_TABLE = bytes(x ^ ((x & 0x0F) << 4) for x in range(256))
+
+class KeystreamCache:
+    """组合密钥流缓存（按私钥LRU淘汰，内存占用有上限）
+    
+    原始密钥流 R(i) = 私钥[i % 17] ⊕ 修正表[i % 272] ⊕ 公钥[i / 16]。
+    由于 272 = 16 × 17，第 j 个16字节块内的 私钥⊕修正表 只取决于 j % 17，
+    而公钥字节在块内保持不变，因此每个私钥只需预计算 17 × 256 个16字节块，
+    任意位置的密钥流都可以按 (j % 17, 公钥[j]) 查表拼接得到。
+    """
+    
+    BLOCK_LEN = 16    # 每个公钥字节覆盖的字节数
+    BLOCK_CYCLE = 17  # 修正表周期内的块数（272 / 16）
+    
+    def __init__(self, mend_table, max_entries=64):
+        """初始化缓存
+        Args:
+            mend_table: 公钥修正表（272字节）
+            max_entries: 最多缓存的私钥数量（每个私钥约68KB）
+        """
+        self.mend_table = mend_table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+    
+    def get(self, own_key):
+        """获取私钥对应的密钥块表（不存在时计算并缓存）"""
+        key = bytes(own_key)
+        table = self._tables.get(key)
+        if table is not None:
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return table
+        
+        self.misses += 1
+        table = self._build(key)
+        self._tables[key] = table
+        if len(self._tables) > self.max_entries:
+            self._tables.popitem(last=False)
+        return table
+    
+    def _build(self, own_key):
+        """预计算 17 × 256 个密钥块"""
+        block_len = self.BLOCK_LEN
+        own_mend = bytes(
+            own_key[i % len(own_key)] ^ self.mend_table[i]
+            for i in range(len(self.mend_table))
+        )
+        
+        if np is not None:
+            base = np.frombuffer(own_mend, dtype=np.uint8).reshape(self.BLOCK_CYCLE, 1, block_len)
+            pub = np.arange(256, dtype=np.uint8).reshape(1, 256, 1)
+            return (base ^ pub).reshape(self.BLOCK_CYCLE * 256, block_len)
+        
+        blocks = []
+        for r in range(self.BLOCK_CYCLE):
+            base = int.from_bytes(own_mend[r * block_len:(r + 1) * block_len], 'little')
+            for pub in range(256):
+                pub_block = int.from_bytes(bytes([pub]) * block_len, 'little')
+                blocks.append((base ^ pub_block).to_bytes(block_len, 'little'))
+        return blocks
+    
+    def keystream(self, own_key, pub_key_fragment, start_pos, length):
+        """生成绝对位置 [start_pos, start_pos + length) 上的原始密钥流
+        Args:
+            own_key: 私钥（17字节）
+            pub_key_fragment: 从 start_pos // 16 开始的公钥片段，不足部分按0处理
+            start_pos: 起始绝对位置
+            length: 密钥流长度
+        Returns:
+            安装NumPy时返回uint8数组，否则返回bytes
+        """
+        table = self.get(own_key)
+        block_len = self.BLOCK_LEN
+        start_block = start_pos // block_len
+        block_count = (start_pos + length - 1) // block_len - start_block + 1
+        offset = start_pos % block_len
+        
+        if np is not None:
+            pub_key = np.zeros(block_count, dtype=np.intp)
+            pub_key[:len(pub_key_fragment)] = np.frombuffer(pub_key_fragment, dtype=np.uint8)
+            rows = np.arange(start_block, start_block + block_count) % self.BLOCK_CYCLE * 256 + pub_key
+            return np.take(table, rows, axis=0).reshape(-1)[offset:offset + length]
+        
+        pub_key = bytes(pub_key_fragment) + bytes(block_count - len(pub_key_fragment))
+        cycle = self.BLOCK_CYCLE
+        stream = b''.join([
+            table[(block % cycle) * 256 + pub_key[k]]
+            for k, block in enumerate(range(start_block, start_block + block_count))
+        ])
+        return stream[offset:offset + length]
+
 class KuGouDecoder:
     """酷狗音乐解密器"""
     
@@ -25,6 +270,7 @@ class KuGouDecoder:
     HEADER_LEN = 1024  # 酷狗文件头固定长度
     OWN_KEY_LEN = 17   # 私钥长度（实际使用16个字节）
     PUB_KEY_LEN_MAGNIFICATION = 16  # 公钥索引放大倍数
+    CHUNK_SIZE = 1024 * 1024  # 默认解密块大小（向量化实现按整块处理）
     
     # 酷狗文件魔数（28字节）
     MAGIC_HEADER = bytes([
@@ -56,13 +302,34 @@ class KuGouDecoder:
         0xEF, 0x7C, 0xB6, 0xB3, 0x93, 0x50
     ])
     
-    def __init__(self, input_file):
-        """初始化解密器"""
+    # 所有解密器共享的密钥流缓存（批量处理时相同私钥无需重复计算）
+    keystream_cache = KeystreamCache(PUB_KEY_MEND)
+    
+    def __init__(self, input_file, engine="cached"):
+        """初始化解密器
+        Args:
+            input_file: 输入文件对象
+            engine: 解密实现，"cached"（预计算密钥流查表，默认）、
+                    "numpy"（逐位置向量化）或 "python"（逐字节）
+        """
         self.input_file = input_file
         self.own_key = bytearray(self.OWN_KEY_LEN)
         self.pos = 0  # 当前读取位置（从加密数据开始处计算）
         self._pub_key_data = None
         
+        # 选择解密实现
+        if engine == "cached":
+            self._decrypt_chunk = self._decrypt_chunk_cached
+        elif engine == "numpy":
+            if np is None:
+                raise ValueError("未安装NumPy，无法使用向量化解密")
+            self._decrypt_chunk = self._decrypt_chunk_numpy
+        elif engine == "python":
+            self._decrypt_chunk = self._decrypt_chunk_python
+        else:
+            raise ValueError(f"未知的解密实现: {engine}")
+        self.engine = engine
+        
         # 读取文件头并验证
         if not self._read_and_validate_header():
             raise ValueError("文件格式错误：不是有效的酷狗加密文件")
@@ -86,26 +353,9 @@ class KuGouDecoder:
         return True
     
     def _get_pub_key_data(self):
-        """获取公钥数据（从十六进制字符串解码并解压）"""
+        """获取公钥数据（同一进程内的解密器共享同一份数据）"""
         if self._pub_key_data is None:
-            # 检查是否已提供十六进制字符串
-            if not KUGOU_KEY_XZ_HEX:
-                raise ValueError("请先在代码中粘贴密钥数据")
-            
-            print("正在加载解密密钥...")
-            try:
-                # 从十六进制字符串解码
-                xz_data = bytes.fromhex(KUGOU_KEY_XZ_HEX)
-                print(f"✓ 密钥数据大小: {len(xz_data):,} 字节")
-                
-                # 在内存中解压
-                xz_file = io.BytesIO(xz_data)
-                with lzma.open(xz_file, 'rb') as f:
-                    self._pub_key_data = f.read()
-                print(f"✓ 密钥解压完成，大小: {len(self._pub_key_data):,} 字节")
-                
-            except Exception as e:
-                raise ValueError(f"密钥处理失败: {e}")
+            self._pub_key_data = load_pub_key_data()
         
         return self._pub_key_data
     
@@ -129,15 +379,73 @@ class KuGouDecoder:
         
         return pub_key_data[pub_key_start:pub_key_end]
     
-    def read(self, size=65536):
+    def read(self, size=CHUNK_SIZE):
         """读取并解密数据"""
         # 读取加密数据
         encrypted_data = self.input_file.read(size)
         if not encrypted_data:
             return b''
         
+        decrypted_data = self._decrypt_chunk(encrypted_data, self.pos)
+        
+        # 更新位置
+        self.pos += len(encrypted_data)
+        
+        return decrypted_data
+    
+    def data_size(self):
+        """加密数据（即解密后音频）的总长度"""
+        end = self.input_file.seek(0, io.SEEK_END)
+        self.input_file.seek(self.HEADER_LEN + self.pos)
+        return end - self.HEADER_LEN
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        """定位读取位置（位置从加密数据开始处计算，不含1024字节文件头）
+        
+        密钥流只取决于绝对位置，因此可以从任意位置开始解密。
+        """
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.data_size() + offset
+        else:
+            raise ValueError(f"无效的whence参数: {whence}")
+        
+        if pos < 0:
+            raise ValueError(f"无效的读取位置: {pos}")
+        
+        self.input_file.seek(self.HEADER_LEN + pos)
+        self.pos = pos
+        return pos
+    
+    def tell(self):
+        """当前读取位置"""
+        return self.pos
+    
+    def pread(self, offset, size):
+        """读取并解密指定位置的数据，不改变当前读取位置
+        
+        例如只解密FLAC的STREAMINFO块或文件末尾128字节的ID3v1标签。
+        """
+        if offset < 0:
+            raise ValueError(f"无效的读取位置: {offset}")
+        
+        self.input_file.seek(self.HEADER_LEN + offset)
+        try:
+            encrypted_data = self.input_file.read(size)
+        finally:
+            self.input_file.seek(self.HEADER_LEN + self.pos)
+        
+        if not encrypted_data:
+            return b''
+        return self._decrypt_chunk(encrypted_data, offset)
+    
+    def _decrypt_chunk_python(self, encrypted_data, start_pos):
+        """解密数据块 - 逐字节实现（未安装NumPy时使用）"""
         # 获取对应的公钥片段
-        pub_key_fragment = self._get_pub_key_for_range(self.pos, self.pos + len(encrypted_data))
+        pub_key_fragment = self._get_pub_key_for_range(start_pos, start_pos + len(encrypted_data))
         
         # 解密数据
         decrypted_data = bytearray(len(encrypted_data))
@@ -148,11 +456,11 @@ class KuGouDecoder:
         mend_len = len(self.PUB_KEY_MEND)
         
         # 计算起始的公钥索引
-        start_pub_key_index = self.pos // magnification
+        start_pub_key_index = start_pos // magnification
         
         for i in range(len(encrypted_data)):
             # 当前绝对位置（从加密数据开始处计算）
-            current_abs_pos = self.pos + i
+            current_abs_pos = start_pos + i
             
             # 获取加密字节
             encrypted_byte = encrypted_data[i]
@@ -183,23 +491,132 @@ class KuGouDecoder:
             # 3. 结合结果
             decrypted_data[i] = own_key_val ^ pub_key_val
         
-        # 更新位置
-        self.pos += len(encrypted_data)
-        
         return bytes(decrypted_data)
     
+    def _decrypt_chunk_numpy(self, encrypted_data, start_pos):
+        """解密数据块 - NumPy向量化实现（结果与逐字节实现完全一致）"""
+        length = len(encrypted_data)
+        magnification = self.PUB_KEY_LEN_MAGNIFICATION
+        
+        encrypted = np.frombuffer(encrypted_data, dtype=np.uint8)
+        
+        # 1. 私钥处理：私钥按17字节循环
+        own_key = np.frombuffer(bytes(self.own_key), dtype=np.uint8)
+        own_key_val = self._cycle_numpy(own_key, start_pos, length) ^ encrypted
+        own_key_val ^= (own_key_val & 0x0F) << 4
+        
+        # 2. 公钥处理：每个公钥字节覆盖16个位置，超出公钥长度的部分按0处理
+        start_pub_key_index = start_pos // magnification
+        pub_key_count = (start_pos + length - 1) // magnification - start_pub_key_index + 1
+        pub_key_fragment = np.zeros(pub_key_count, dtype=np.uint8)
+        fragment = self._get_pub_key_for_range(start_pos, start_pos + length - 1)
+        pub_key_fragment[:len(fragment)] = np.frombuffer(fragment, dtype=np.uint8)
+        
+        offset = start_pos % magnification
+        pub_key_bytes = np.repeat(pub_key_fragment, magnification)[offset:offset + length]
+        
+        # 应用修正表：修正表按272字节循环
+        mend = np.frombuffer(self.PUB_KEY_MEND, dtype=np.uint8)
+        pub_key_val = self._cycle_numpy(mend, start_pos, length) ^ pub_key_bytes
+        pub_key_val ^= (pub_key_val & 0x0F) << 4
+        
+        # 3. 结合结果
+        return (own_key_val ^ pub_key_val).tobytes()
+    
+    def _decrypt_chunk_cached(self, encrypted_data, start_pos):
+        """解密数据块 - 查表得到原始密钥流后一次异或
+        
+        位移混淆 x ⊕ ((x & 0x0F) << 4) 对异或是线性的，因此
+        D = T(私钥 ⊕ E) ⊕ T(修正表 ⊕ 公钥) = T(E ⊕ R)，R 为缓存中的原始密钥流。
+        """
+        length = len(encrypted_data)
+        pub_key_fragment = self._get_pub_key_for_range(start_pos, start_pos + length - 1)
+        keystream = self.keystream_cache.keystream(self.own_key, pub_key_fragment, start_pos, length)
+        
+        if np is not None:
+            mixed = np.bitwise_xor(np.frombuffer(encrypted_data, dtype=np.uint8), keystream)
+            low = np.bitwise_and(mixed, 0x0F)
+            np.left_shift(low, 4, out=low)
+            mixed ^= low
+            return mixed.tobytes()
+        
+        mixed = int.from_bytes(encrypted_data, 'little') ^ int.from_bytes(keystream, 'little')
+        return mixed.to_bytes(length, 'little').translate(NIBBLE_MIX_TABLE)
+    
+    @staticmethod
+    def _cycle_numpy(table, start_pos, length):
+        """将循环表展开为绝对位置 [start_pos, start_pos + length) 上的数组"""
+        offset = start_pos % len(table)
+        repeats = (offset + length) // len(table) + 1
+        return np.tile(table, repeats)[offset:offset + length]
+    
     def read_all(self):
         """读取并解密所有数据"""
         result = bytearray()
         
         while True:
-            chunk = self.read(65536)
+            chunk = self.read()
             if not chunk:
                 break
             result.extend(chunk)
         
         return bytes(result)
 
+class KuGouDecryptedFile(io.RawIOBase):
+    """解密后音频数据的只读文件对象（支持随机访问）
+    
+    可直接交给标签读取库或播放器使用，只有实际读取的字节会被解密：
+        with io.BufferedReader(KuGouDecryptedFile("歌曲.kgm")) as f:
+            f.seek(-128, io.SEEK_END)
+            id3v1 = f.read(128)
+    """
+    
+    def __init__(self, file, engine="cached"):
+        """初始化
+        Args:
+            file: 加密文件路径，或以二进制模式打开的文件对象
+            engine: 解密实现，与KuGouDecoder相同
+        """
+        super().__init__()
+        if isinstance(file, (str, os.PathLike)):
+            self._file = open(file, 'rb')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+        
+        try:
+            self.decoder = KuGouDecoder(self._file, engine)
+        except BaseException:
+            if self._owns_file:
+                self._file.close()
+            raise
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def readinto(self, buffer):
+        data = self.decoder.read(len(buffer))
+        memoryview(buffer).cast('B')[:len(data)] = data
+        return len(data)
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.decoder.seek(offset, whence)
+    
+    def tell(self):
+        return self.decoder.tell()
+    
+    def pread(self, offset, size):
+        return self.decoder.pread(offset, size)
+    
+    def close(self):
+        if not self.closed and self._owns_file:
+            self._file.close()
+        super().close()
+
 def detect_audio_format(data):
     """检测音频格式 - 简化版"""
     if len(data) < 4:
@@ -238,18 +655,133 @@ def detect_audio_format(data):
     
     return "dat"
 
+# 流式写出时的文件缓冲区大小（内存占用与音频文件大小无关）
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+def _reserve_path(path_obj):
+    """以O_CREAT|O_EXCL创建空文件占用该文件名，文件已存在时返回False"""
+    try:
+        fd = os.open(path_obj, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+def _create_temp_file(output_path_obj):
+    """在输出目录中创建名称唯一的临时文件（并行解密互不冲突），返回 (文件描述符, 路径)
+    
+    以0o666创建，实际权限由umask决定，与open()新建的文件相同。
+    """
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    while True:
+        temp_path = output_path_obj.with_name(
+            f".{output_path_obj.name}.{os.getpid()}.{os.urandom(4).hex()}.part"
+        )
+        try:
+            return os.open(temp_path, flags, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+def resolve_output_path(input_path_obj, audio_format, output_path=None):
+    """根据检测到的音频格式确定输出路径
+    
+    自动命名时会创建空文件占用选中的文件名：进程池并行解密 a.kgm 与 a.kgm.flac 时，
+    两个进程不会选中同一个 a.flac，而是与逐个解密时一样得到 a.flac 和 a_1.flac。
+    """
+    if output_path is None:
+        # 移除.kgm或.kgm.flac扩展名
+        stem = input_path_obj.stem
+        if stem.lower().endswith('.kgm'):
+            stem = stem[:-4]
+        
+        output_path_obj = input_path_obj.with_name(f"{stem}.{audio_format}")
+        
+        # 避免覆盖
+        counter = 1
+        while not _reserve_path(output_path_obj):
+            output_path_obj = input_path_obj.with_name(
+                f"{stem}_{counter}.{audio_format}"
+            )
+            counter += 1
+    else:
+        output_path_obj = Path(output_path)
+        if output_path_obj.suffix.lower() != f".{audio_format}":
+            output_path_obj = output_path_obj.with_suffix(f".{audio_format}")
+    
+    return output_path_obj
+
+def decrypt_to_path(input_path, output_path=None, progress_callback=None):
+    """解密单个文件并流式写入磁盘（不输出日志，供批量解密复用）
+    Args:
+        input_path: 加密文件路径
+        output_path: 输出路径，默认与输入文件同目录
+        progress_callback: 可选的进度回调 callback(已解密字节数, 总字节数)
+    Returns:
+        (输出路径, 音频格式, 解密字节数)
+    Raises:
+        ValueError: 文件格式错误或解密后无数据
+    """
+    input_path_obj = Path(input_path)
+    file_size = input_path_obj.stat().st_size
+    
+    with open(input_path_obj, 'rb') as f:
+        decoder = KuGouDecoder(f)
+        
+        chunk_size = decoder.CHUNK_SIZE
+        total_decrypted = 0
+        total_to_decrypt = max(0, file_size - decoder.HEADER_LEN)  # 减去1024字节的文件头
+        
+        if total_to_decrypt <= 0:
+            raise ValueError("文件太小或无效")
+        
+        # 先解密第一块，用于检测格式
+        chunk = decoder.read(chunk_size)
+        if not chunk:
+            raise ValueError("解密后无数据")
+        
+        audio_format = detect_audio_format(chunk[:4096])
+        
+        # 确定输出路径
+        output_path_obj = resolve_output_path(input_path_obj, audio_format, output_path)
+        
+        # 边解密边写入同目录下的临时文件（文件名唯一，并行解密互不干扰），完成后再原子替换为目标文件
+        fd, temp_path = _create_temp_file(output_path_obj)
+        try:
+            with open(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as out_f:
+                while chunk:
+                    out_f.write(chunk)
+                    total_decrypted += len(chunk)
+                    
+                    if progress_callback is not None:
+                        progress_callback(total_decrypted, total_to_decrypt)
+                    
+                    chunk = decoder.read(chunk_size)
+            
+            os.replace(temp_path, output_path_obj)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            if output_path is None:
+                # 释放自动命名时占用的输出文件名
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(output_path_obj)
+            raise
+    
+    return output_path_obj, audio_format, total_decrypted
+
 def decrypt_file(input_path, output_path=None):
     """解密单个文件"""
     try:
         # 检查密钥数据
-        if not KUGOU_KEY_XZ_HEX:
+        if not has_pub_key_source():
             print("错误: 未找到密钥数据")
             print("")
             print("请按以下步骤操作：")
             print("1. 运行配套的密钥提取工具\"转二进制.py\"将\"kugou_key.xz\"生成为\"kugou_key_simple.py\"")
             print("2. 复制生成\"kugou_key_simple.py\"文件中的KUGOU_KEY_XZ_HEX值")
-            print("3. 打开本文件，在第15行粘贴该值")
+            print("3. 打开本文件，在开头的KUGOU_KEY_XZ_HEX处粘贴该值")
             print("4. 保存文件后重新运行本文件，即可生效解密功能")
+            print("   （也可以直接将\"kugou_key.xz\"放在本工具同目录下，无需粘贴）")
             return False
         
         input_path_obj = Path(input_path)
@@ -261,82 +793,29 @@ def decrypt_file(input_path, output_path=None):
         file_size = input_path_obj.stat().st_size
         print(f"正在处理: {input_path_obj.name}")
         print(f"文件大小: {file_size:,} 字节")
+        print("开始解密文件...")
         
-        # 打开文件并解密
-        with open(input_path_obj, 'rb') as f:
-            try:
-                decoder = KuGouDecoder(f)
-                
-                print("开始解密文件...")
-                
-                # 解密整个文件
-                decrypted_data = bytearray()
-                chunk_size = 64 * 1024
-                total_decrypted = 0
-                total_to_decrypt = max(0, file_size - 1024)  # 减去1024字节的文件头
-                
-                if total_to_decrypt <= 0:
-                    print("错误：文件太小或无效")
-                    return False
-                
-                while True:
-                    chunk = decoder.read(chunk_size)
-                    if not chunk:
-                        break
-                    
-                    decrypted_data.extend(chunk)
-                    total_decrypted += len(chunk)
-                    
-                    # 显示进度
-                    if total_to_decrypt > 0:
-                        progress = (total_decrypted / total_to_decrypt) * 100
-                        print(f"\r解密进度: {progress:.1f}%", end='')
-                
-                print(f"\n✓ 解密完成，共处理 {total_decrypted:,} 字节")
-                
-                if total_decrypted == 0:
-                    print("错误：解密后无数据")
-                    return False
-                
-                # 检测格式
-                audio_format = detect_audio_format(decrypted_data[:4096])
-                print(f"检测到音频格式: {audio_format.upper()}")
-                
-                # 确定输出路径
-                if output_path is None:
-                    # 移除.kgm或.kgm.flac扩展名
-                    stem = input_path_obj.stem
-                    if stem.lower().endswith('.kgm'):
-                        stem = stem[:-4]
-                    
-                    output_path_obj = input_path_obj.with_name(f"{stem}.{audio_format}")
-                    
-                    # 避免覆盖
-                    counter = 1
-                    while output_path_obj.exists():
-                        output_path_obj = input_path_obj.with_name(
-                            f"{stem}_{counter}.{audio_format}"
-                        )
-                        counter += 1
-                else:
-                    output_path_obj = Path(output_path)
-                    if output_path_obj.suffix.lower() != f".{audio_format}":
-                        output_path_obj = output_path_obj.with_suffix(f".{audio_format}")
-                
-                # 写入文件
-                print(f"保存文件到: {output_path_obj}")
-                with open(output_path_obj, 'wb') as out_f:
-                    out_f.write(decrypted_data)
-                
-                output_size = output_path_obj.stat().st_size
-                print(f"✓ 保存完成，文件大小: {output_size:,} 字节")
-                print("=" * 50)
-                
-                return True
-                
-            except ValueError as e:
-                print(f"解密错误: {e}")
-                return False
+        def show_progress(total_decrypted, total_to_decrypt):
+            progress = (total_decrypted / total_to_decrypt) * 100
+            print(f"\r解密进度: {progress:.1f}%", end='')
+        
+        try:
+            output_path_obj, audio_format, total_decrypted = decrypt_to_path(
+                input_path_obj, output_path, show_progress
+            )
+        except ValueError as e:
+            print(f"解密错误: {e}")
+            return False
+        
+        print(f"\n✓ 解密完成，共处理 {total_decrypted:,} 字节")
+        print(f"检测到音频格式: {audio_format.upper()}")
+        print(f"保存文件到: {output_path_obj}")
+        
+        output_size = output_path_obj.stat().st_size
+        print(f"✓ 保存完成，文件大小: {output_size:,} 字节")
+        print("=" * 50)
+        
+        return True
                 
     except Exception as e:
         print(f"处理过程中发生错误: {e}")
@@ -344,6 +823,631 @@ def decrypt_file(input_path, output_path=None):
         traceback.print_exc()
         return False
 
+# ================================================
+# 批量解密（多进程）
+# ================================================
+
+# 工作进程持有的共享内存句柄（需在进程存活期间保持引用）
+_worker_shared_memory = None
+
+def collect_kgm_files(paths):
+    """收集所有需要处理的 .kgm / .kgm.flac 文件路径（文件夹递归遍历）"""
+    kgm_files = []
+    
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"路径不存在，跳过: {path}")
+            continue
+        
+        if os.path.isfile(path):
+            if path.lower().endswith(('.kgm', '.kgm.flac')):
+                kgm_files.append(path)
+            else:
+                print(f"不是kgm文件，跳过: {path}")
+        
+        elif os.path.isdir(path):
+            # 递归遍历文件夹
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    if file.lower().endswith(('.kgm', '.kgm.flac')):
+                        kgm_files.append(os.path.join(root, file))
+    
+    return kgm_files
+
+def _init_batch_worker(shm_name=None, pub_key_size=0):
+    """工作进程初始化：挂载父进程准备好的公钥，不再重复解压
+    
+    有公钥缓存文件时直接mmap映射（各进程共享同一份页缓存），
+    否则挂载父进程写入的共享内存。
+    """
+    global _shared_pub_key_data, _worker_shared_memory
+    if shm_name is None:
+        load_pub_key_data()
+        return
+    
+    _worker_shared_memory = shared_memory.SharedMemory(name=shm_name)
+    _shared_pub_key_data = _worker_shared_memory.buf[:pub_key_size]
+
+def _batch_decrypt_worker(task):
+    """工作进程：解密单个文件并返回结果（task 为 (输入路径, 输出路径或None)）"""
+    input_path, output_path = task
+    start_time = time.perf_counter()
+    try:
+        output_path_obj, audio_format, total_decrypted = decrypt_to_path(input_path, output_path)
+        return {
+            "input": input_path,
+            "ok": True,
+            "output": str(output_path_obj),
+            "format": audio_format,
+            "bytes": total_decrypted,
+            "seconds": time.perf_counter() - start_time,
+        }
+    except Exception as e:
+        return {
+            "input": input_path,
+            "ok": False,
+            "error": f"{type(e).__name__}: {e}",
+            "bytes": 0,
+            "seconds": time.perf_counter() - start_time,
+        }
+
+def _run_in_process_pool(worker, items, workers, on_result):
+    """在进程池中对每个条目执行worker，并在父进程中依完成顺序回调on_result
+    
+    公钥只加载一次：已有缓存文件时工作进程各自mmap映射，
+    否则通过共享内存下发给所有工作进程。
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(items)))
+    
+    pub_key_data = load_pub_key_data()
+    shm = None
+    initargs = ()
+    if _pub_key_cache_path is None:
+        shm = shared_memory.SharedMemory(create=True, size=len(pub_key_data))
+        shm.buf[:len(pub_key_data)] = pub_key_data
+        initargs = (shm.name, len(pub_key_data))
+    
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_batch_worker,
+            initargs=initargs
+        ) as executor:
+            futures = [executor.submit(worker, item) for item in items]
+            
+            for future in as_completed(futures):
+                on_result(future.result())
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+def batch_decrypt(kgm_files, workers=None, output_paths=None, on_result=None):
+    """使用进程池并行解密多个文件
+    Args:
+        kgm_files: 待解密文件列表
+        workers: 进程数，默认使用CPU核心数
+        output_paths: 可选的 {输入文件: 输出路径}，未指定的文件输出到原文件同目录
+        on_result: 可选的回调 callback(result)，每个文件完成时在父进程中调用
+    Returns:
+        每个文件的结果列表
+    """
+    total = len(kgm_files)
+    
+    print(f"使用 {min(workers or os.cpu_count() or 1, total)} 个进程并行解密 {total} 个文件")
+    print("=" * 60)
+    
+    results = []
+    failed = 0
+    total_bytes = 0
+    start_time = time.perf_counter()
+    
+    def handle_result(result):
+        nonlocal failed, total_bytes
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+        total_bytes += result["bytes"]
+        if not result["ok"]:
+            failed += 1
+            print(f"\n✗ 解密失败 {os.path.basename(result['input'])}: {result['error']}")
+        
+        # 汇总进度
+        elapsed = time.perf_counter() - start_time
+        speed = total_bytes / 1024 / 1024 / elapsed if elapsed > 0 else 0
+        print(
+            f"\r批量解密: {len(results)}/{total} "
+            f"成功 {len(results) - failed} 失败 {failed} | "
+            f"{total_bytes / 1024 / 1024:,.1f} MB | {speed:,.1f} MB/s",
+            end=''
+        )
+    
+    output_paths = output_paths or {}
+    tasks = [(path, output_paths.get(path)) for path in kgm_files]
+    _run_in_process_pool(_batch_decrypt_worker, tasks, workers, handle_result)
+    
+    elapsed = time.perf_counter() - start_time
+    print("")
+    print("=" * 60)
+    print("批量解密汇总")
+    print(f"  文件数: {total}，成功: {total - failed}，失败: {failed}")
+    print(f"  解密数据: {total_bytes:,} 字节")
+    print(f"  总耗时: {elapsed:.2f} 秒")
+    if elapsed > 0:
+        print(f"  吞吐量: {total_bytes / 1024 / 1024 / elapsed:,.1f} MB/s，{total / elapsed:,.1f} 个文件/秒")
+    if failed:
+        print("  失败文件:")
+        for result in results:
+            if not result["ok"]:
+                print(f"    {result['input']}: {result['error']}")
+    
+    return results
+
+# ================================================
+# 元数据扫描（只解密文件头部等少量数据，不写出音频）
+# ================================================
+
+SCAN_HEADER_LEN = 4096  # 用于格式检测的头部长度
+SCAN_MAX_BLOCK_LEN = 1024 * 1024  # 单个标签块最多解密的字节数
+SCAN_FIELDS = ["path", "size", "own_key", "format", "title", "artist", "album", "duration", "error"]
+
+# MPEG Layer III 比特率（kbps）与采样率表
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG1
+    2: [22050, 24000, 16000],  # MPEG2
+    0: [11025, 12000, 8000],   # MPEG2.5
+}
+
+def _decode_tag_text(data, encoding=0):
+    """解码标签文本（中文歌曲的ISO-8859-1文本帧实际上常为GBK编码）"""
+    if encoding == 1:
+        text = data.decode('utf-16', errors='replace')
+    elif encoding == 2:
+        text = data.decode('utf-16-be', errors='replace')
+    elif encoding == 3:
+        text = data.decode('utf-8', errors='replace')
+    else:
+        try:
+            text = data.decode('gbk')
+        except UnicodeDecodeError:
+            text = data.decode('latin-1')
+    return text.split('\x00')[0].strip()
+
+def _parse_id3v2(decoder, tags):
+    """解析ID3v2标签中的标题/歌手/专辑/时长，返回标签总长度"""
+    header = decoder.pread(0, 10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    
+    version = header[3]
+    flags = header[5]
+    tag_size = 10 + ((header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9])
+    if flags & 0x10:
+        tag_size += 10  # 标签尾
+    
+    # 帧ID对应的字段（ID3v2.2使用3字符帧ID）
+    if version == 2:
+        frame_fields = {b'TT2': 'title', b'TP1': 'artist', b'TAL': 'album', b'TLE': 'length'}
+        id_len, header_len = 3, 6
+    else:
+        frame_fields = {b'TIT2': 'title', b'TPE1': 'artist', b'TALB': 'album', b'TLEN': 'length'}
+        id_len, header_len = 4, 10
+    
+    pos = 10
+    if flags & 0x40 and version >= 3:
+        # 跳过扩展头
+        ext = decoder.pread(pos, 4)
+        if len(ext) < 4:
+            return tag_size
+        if version == 4:
+            pos += (ext[0] << 21) | (ext[1] << 14) | (ext[2] << 7) | ext[3]
+        else:
+            pos += 4 + int.from_bytes(ext, 'big')
+    
+    while pos + header_len <= tag_size:
+        frame_header = decoder.pread(pos, header_len)
+        frame_id = frame_header[:id_len]
+        if len(frame_header) < header_len or not frame_id.strip(b'\x00'):
+            break  # 填充区
+        
+        size_bytes = frame_header[id_len:id_len + (3 if version == 2 else 4)]
+        if version == 4:
+            frame_size = (size_bytes[0] << 21) | (size_bytes[1] << 14) | (size_bytes[2] << 7) | size_bytes[3]
+        else:
+            frame_size = int.from_bytes(size_bytes, 'big')
+        
+        field = frame_fields.get(frame_id)
+        if field and 0 < frame_size <= SCAN_MAX_BLOCK_LEN:
+            body = decoder.pread(pos + header_len, frame_size)
+            # 文件被截断时帧内容可能不完整，只跳过该帧
+            text = _decode_tag_text(body[1:], body[0]) if body else ""
+            if field == 'length':
+                if text.isdigit() and not tags.get('duration'):
+                    tags['duration'] = round(int(text) / 1000, 3)
+            elif text and not tags.get(field):
+                tags[field] = text
+        
+        pos += header_len + frame_size
+    
+    return tag_size
+
+def _parse_mp3_duration(decoder, offset):
+    """根据第一帧（及Xing/Info/VBRI头）估算MP3时长"""
+    data = decoder.pread(offset, SCAN_HEADER_LEN)
+    for i in range(len(data) - 4):
+        if data[i] != 0xFF or (data[i + 1] & 0xE0) != 0xE0:
+            continue
+        
+        version_bits = (data[i + 1] >> 3) & 0x03
+        layer_bits = (data[i + 1] >> 1) & 0x03
+        bitrate_index = data[i + 2] >> 4
+        sample_rate_index = (data[i + 2] >> 2) & 0x03
+        if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            continue  # 只处理Layer III的有效帧头
+        
+        mpeg1 = version_bits == 3
+        bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version_bits][sample_rate_index]
+        samples_per_frame = 1152 if mpeg1 else 576
+        mono = (data[i + 3] >> 6) == 3
+        
+        # VBR文件的Xing/Info头记录了总帧数
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        xing = i + 4 + side_info
+        if len(data) >= xing + 12 and data[xing:xing + 4] in (b'Xing', b'Info') and data[xing + 7] & 0x01:
+            frames = int.from_bytes(data[xing + 8:xing + 12], 'big')
+            return round(frames * samples_per_frame / sample_rate, 3)
+        if data[i + 36:i + 40] == b'VBRI' and len(data) >= i + 54:
+            frames = int.from_bytes(data[i + 50:i + 54], 'big')
+            return round(frames * samples_per_frame / sample_rate, 3)
+        
+        # 按固定码率估算
+        audio_size = decoder.data_size() - offset - i
+        return round(audio_size * 8 / bitrate, 3)
+    
+    return None
+
+def _parse_id3v1(decoder, tags):
+    """解析文件末尾128字节的ID3v1标签（ID3v2缺失时的补充）"""
+    data_size = decoder.data_size()
+    if data_size < 128:
+        return
+    
+    data = decoder.pread(data_size - 128, 128)
+    if data[:3] != b'TAG':
+        return
+    for field, start, end in (('title', 3, 33), ('artist', 33, 63), ('album', 63, 93)):
+        text = _decode_tag_text(data[start:end])
+        if text and not tags.get(field):
+            tags[field] = text
+
+def _parse_flac(decoder, tags):
+    """解析FLAC的STREAMINFO（时长）与VORBIS_COMMENT（标题/歌手/专辑）"""
+    pos = 4
+    for _ in range(128):
+        block_header = decoder.pread(pos, 4)
+        if len(block_header) < 4:
+            break
+        
+        is_last = block_header[0] & 0x80
+        block_type = block_header[0] & 0x7F
+        block_len = int.from_bytes(block_header[1:4], 'big')
+        
+        if block_type == 0:
+            info = decoder.pread(pos + 4, 34)
+            if len(info) < 18:
+                break
+            sample_rate = (info[10] << 12) | (info[11] << 4) | (info[12] >> 4)
+            total_samples = ((info[13] & 0x0F) << 32) | int.from_bytes(info[14:18], 'big')
+            if sample_rate:
+                tags['duration'] = round(total_samples / sample_rate, 3)
+        
+        elif block_type == 4 and block_len <= SCAN_MAX_BLOCK_LEN:
+            comment = decoder.pread(pos + 4, block_len)
+            offset = 4 + int.from_bytes(comment[:4], 'little')  # 跳过vendor字符串
+            count = int.from_bytes(comment[offset:offset + 4], 'little')
+            offset += 4
+            for _ in range(count):
+                length = int.from_bytes(comment[offset:offset + 4], 'little')
+                entry = comment[offset + 4:offset + 4 + length].decode('utf-8', errors='replace')
+                offset += 4 + length
+                key, _, value = entry.partition('=')
+                field = key.lower()
+                if field in ('title', 'artist', 'album') and value and not tags.get(field):
+                    tags[field] = value.strip()
+        
+        pos += 4 + block_len
+        if is_last:
+            break
+
+def _parse_wav(decoder, tags):
+    """根据fmt/data块计算WAV时长"""
+    pos = 12
+    byte_rate = 0
+    for _ in range(64):
+        chunk_header = decoder.pread(pos, 8)
+        if len(chunk_header) < 8:
+            break
+        
+        chunk_id = chunk_header[:4]
+        chunk_size = int.from_bytes(chunk_header[4:8], 'little')
+        if chunk_id == b'fmt ':
+            byte_rate = int.from_bytes(decoder.pread(pos + 16, 4), 'little')
+        elif chunk_id == b'data':
+            if byte_rate:
+                tags['duration'] = round(chunk_size / byte_rate, 3)
+            break
+        
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+def read_audio_tags(decoder, audio_format, tags=None):
+    """通过随机访问解密读取标题/歌手/专辑/时长（只解密标签所在的少量字节）
+    
+    传入tags时结果直接写入其中，解析中途出错时已读到的字段仍然保留。
+    """
+    tags = {} if tags is None else tags
+    if audio_format == "mp3":
+        tag_size = _parse_id3v2(decoder, tags)
+        if not tags.get('duration'):
+            tags['duration'] = _parse_mp3_duration(decoder, tag_size)
+        if not tags.get('title') or not tags.get('artist'):
+            _parse_id3v1(decoder, tags)
+    elif audio_format == "flac":
+        _parse_flac(decoder, tags)
+    elif audio_format == "wav":
+        _parse_wav(decoder, tags)
+    return tags
+
+def scan_file(input_path):
+    """扫描单个加密文件的格式与标签，不写出音频"""
+    result = dict.fromkeys(SCAN_FIELDS, "")
+    result["path"] = str(input_path)
+    tags = {}
+    
+    try:
+        with open(input_path, 'rb') as f:
+            decoder = KuGouDecoder(f)
+            result["size"] = decoder.data_size()
+            result["own_key"] = bytes(decoder.own_key[:16]).hex().upper()
+            
+            audio_format = detect_audio_format(decoder.pread(0, SCAN_HEADER_LEN))
+            result["format"] = audio_format
+            
+            read_audio_tags(decoder, audio_format, tags)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    
+    # 即使解析中途出错，也保留已经读到的标签
+    for field, value in tags.items():
+        if value is not None:
+            result[field] = value
+    
+    return result
+
+def write_scan_index(results, output_path):
+    """写出扫描结果：.db/.sqlite 写入SQLite，其余写为CSV"""
+    output_path = Path(output_path)
+    
+    if output_path.suffix.lower() in ('.db', '.sqlite', '.sqlite3'):
+        conn = sqlite3.connect(output_path)
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kgm_scan ("
+                "path TEXT PRIMARY KEY, size INTEGER, own_key TEXT, format TEXT, "
+                "title TEXT, artist TEXT, album TEXT, duration REAL, error TEXT)"
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO kgm_scan ({', '.join(SCAN_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(SCAN_FIELDS))})",
+                [[result[field] if result[field] != "" else None for field in SCAN_FIELDS]
+                 for result in results]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    else:
+        # utf-8-sig 便于Excel直接打开中文内容
+        with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SCAN_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    
+    return output_path
+
+def scan_library(kgm_files, output_path, workers=None):
+    """并行扫描多个加密文件并写出索引
+    Args:
+        kgm_files: 待扫描文件列表
+        output_path: 索引文件路径（.csv 或 .db/.sqlite）
+        workers: 进程数，默认使用CPU核心数
+    Returns:
+        每个文件的扫描结果列表
+    """
+    total = len(kgm_files)
+    results = []
+    start_time = time.perf_counter()
+    
+    print(f"扫描 {total} 个文件的元数据（不写出音频）")
+    print("=" * 60)
+    
+    def on_result(result):
+        results.append(result)
+        print(f"\r扫描进度: {len(results)}/{total}", end='')
+    
+    _run_in_process_pool(scan_file, kgm_files, workers, on_result)
+    results.sort(key=lambda result: result["path"])
+    output_path = write_scan_index(results, output_path)
+    
+    elapsed = time.perf_counter() - start_time
+    format_counts = {}
+    for result in results:
+        key = result["format"] or "error"
+        format_counts[key] = format_counts.get(key, 0) + 1
+    
+    print("")
+    print("=" * 60)
+    print("扫描汇总")
+    print(f"  文件数: {total}，耗时: {elapsed:.2f} 秒")
+    for audio_format, count in sorted(format_counts.items()):
+        print(f"  {audio_format}: {count}")
+    if format_counts.get("dat"):
+        print(f"  ⚠️ 有 {format_counts['dat']} 个文件无法识别格式（dat）")
+    print(f"  索引已保存到: {output_path}")
+    
+    return results
+
+# ================================================
+# 增量转换（转换清单）
+# ================================================
+
+MANIFEST_NAME = "kgm_manifest.db"
+
+def read_own_key(input_path):
+    """只读取文件头中的私钥（十六进制），不是酷狗加密文件时返回None"""
+    with open(input_path, 'rb') as f:
+        header = f.read(0x2c)
+    
+    if len(header) < 0x2c or header[:len(KuGouDecoder.MAGIC_HEADER)] != KuGouDecoder.MAGIC_HEADER:
+        return None
+    return header[0x1c:0x2c].hex().upper()
+
+def normalize_kgm_name(input_path):
+    """将 .kgm.flac 文件重命名为 .kgm 文件（与"修正文件名/.kgm.flac2kgm.py"相同），返回处理后的路径"""
+    if not input_path.lower().endswith('.kgm.flac'):
+        return input_path
+    
+    # 去掉最后的 .flac (5个字符)，目标文件已存在时保留原文件名
+    new_path = input_path[:-5]
+    if os.path.exists(new_path):
+        return input_path
+    
+    try:
+        os.rename(input_path, new_path)
+    except OSError as e:
+        print(f"重命名失败 {os.path.basename(input_path)}: {e}")
+        return input_path
+    return new_path
+
+class ConversionManifest:
+    """增量转换清单（SQLite）
+    
+    以输入文件的绝对路径为键，记录转换时的文件大小、修改时间、私钥以及输出路径与格式。
+    再次运行时只有新增或发生变化的文件才需要重新解密。
+    """
+    
+    def __init__(self, manifest_path):
+        self.path = Path(manifest_path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversions ("
+            "input TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, own_key TEXT, "
+            "output TEXT, format TEXT, converted_at TEXT)"
+        )
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def get(self, input_path):
+        """查询输入文件的转换记录"""
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, own_key, output, format FROM conversions WHERE input = ?",
+            (input_path,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("size", "mtime_ns", "own_key", "output", "format"), row))
+    
+    def record(self, input_path, size, mtime_ns, own_key, output_path, audio_format):
+        """记录一次成功的转换（立即提交，中断后已完成的文件不会重复转换）"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO conversions "
+            "(input, size, mtime_ns, own_key, output, format, converted_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (input_path, size, mtime_ns, own_key, str(output_path), audio_format,
+             time.strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        self.conn.commit()
+    
+    def rename(self, old_path, new_path):
+        """输入文件改名后迁移转换记录"""
+        self.conn.execute("DELETE FROM conversions WHERE input = ?", (new_path,))
+        self.conn.execute("UPDATE conversions SET input = ? WHERE input = ?", (new_path, old_path))
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+def plan_incremental(kgm_files, manifest):
+    """对照转换清单筛选需要解密的文件，并将 .kgm.flac 统一重命名为 .kgm
+    Returns:
+        (待解密文件列表, {文件: 上次的输出路径}, {文件: (大小, 修改时间, 私钥)}, 跳过数, 重命名数)
+    """
+    pending = []
+    output_paths = {}
+    states = {}
+    skipped = 0
+    renamed = 0
+    
+    for input_path in kgm_files:
+        input_path = os.path.abspath(input_path)
+        new_path = normalize_kgm_name(input_path)
+        if new_path != input_path:
+            manifest.rename(input_path, new_path)
+            renamed += 1
+            input_path = new_path
+        
+        try:
+            stat = os.stat(input_path)
+            own_key = read_own_key(input_path)
+        except OSError as e:
+            print(f"读取失败，跳过 {input_path}: {e}")
+            continue
+        
+        state = (stat.st_size, stat.st_mtime_ns, own_key)
+        entry = manifest.get(input_path)
+        if entry is not None:
+            if ((entry["size"], entry["mtime_ns"], entry["own_key"]) == state
+                    and os.path.exists(entry["output"])):
+                skipped += 1
+                continue
+            # 文件发生变化：覆盖上次的输出，而不是生成 _1 等新文件
+            output_paths[input_path] = entry["output"]
+        
+        pending.append(input_path)
+        states[input_path] = state
+    
+    return pending, output_paths, states, skipped, renamed
+
+def incremental_decrypt(kgm_files, manifest_path, workers=None):
+    """增量解密：只处理新增或变化的文件，返回 (成功数, 失败数)"""
+    with ConversionManifest(manifest_path) as manifest:
+        pending, output_paths, states, skipped, renamed = plan_incremental(kgm_files, manifest)
+        
+        print(f"转换清单: {manifest.path}")
+        print(f"  未变化跳过: {skipped} 个，新增或变化: {len(pending)} 个，.kgm.flac 重命名: {renamed} 个")
+        print("=" * 60)
+        
+        if not pending:
+            return skipped, 0
+        
+        def on_result(result):
+            if result["ok"]:
+                manifest.record(result["input"], *states[result["input"]], result["output"], result["format"])
+        
+        results = batch_decrypt(pending, workers, output_paths, on_result)
+    
+    failed = sum(1 for result in results if not result["ok"])
+    return skipped + len(results) - failed, failed
+
 def main():
     """主函数"""
     print("=" * 60)
@@ -351,14 +1455,15 @@ def main():
     print("=" * 60)
     
     # 检查密钥数据
-    if not KUGOU_KEY_XZ_HEX:
+    if not has_pub_key_source():
         print("错误: 未找到密钥数据")
         print("=" * 60)
         print("请按以下步骤操作：")
         print("1. 运行配套的密钥提取工具\"转二进制.py\"将\"kugou_key.xz\"生成为\"kugou_key_simple.py\"")
         print("2. 复制生成\"kugou_key_simple.py\"文件中的KUGOU_KEY_XZ_HEX值")
-        print("3. 打开本文件，在第15行粘贴该值")
+        print("3. 打开本文件，在开头的KUGOU_KEY_XZ_HEX处粘贴该值")
         print("4. 保存文件后重新运行本文件，即可生效解密功能")
+        print("   （也可以直接将\"kugou_key.xz\"放在本工具同目录下，无需粘贴）")
         print("")
         input("按回车键退出...")
         return
@@ -370,20 +1475,79 @@ def main():
         print("2. 或使用命令行: python script.py 文件1.kgm 文件2.kgm.flac")
         print("3. 可以同时选中拖动多个文件文件夹进行解密处理")
         print("")
+        print("可选参数：")
+        print("  --workers N  批量解密时使用的进程数（默认CPU核心数）")
+        print("  --scan       只扫描格式与标题/歌手/时长，写出索引而不解密音频")
+        print("  --scan-output PATH  扫描索引路径（.csv 或 .db/.sqlite，默认 kgm_scan.csv）")
+        print(f"  --incremental       增量模式：按转换清单只解密新增或变化的文件（默认清单 {MANIFEST_NAME}）")
+        print("  --manifest PATH     增量模式使用的转换清单路径")
+        print("")
         input("按回车键退出...")
         return
     
-    # 处理每个文件
-    successful = 0
-    total = len(sys.argv) - 1
+    # 解析参数
+    workers = None
+    scan = False
+    scan_output = "kgm_scan.csv"
+    manifest_path = None
+    paths = []
+    
+    i = 1
+    while i < len(sys.argv):
+        arg = sys.argv[i]
+        if arg == "--workers" and i + 1 < len(sys.argv):
+            try:
+                workers = int(sys.argv[i + 1])
+            except ValueError:
+                print(f"错误：无效的进程数 {sys.argv[i + 1]}")
+                return
+            i += 2
+        elif arg == "--scan":
+            scan = True
+            i += 1
+        elif arg == "--scan-output" and i + 1 < len(sys.argv):
+            scan = True
+            scan_output = sys.argv[i + 1]
+            i += 2
+        elif arg == "--incremental":
+            manifest_path = manifest_path or MANIFEST_NAME
+            i += 1
+        elif arg == "--manifest" and i + 1 < len(sys.argv):
+            manifest_path = sys.argv[i + 1]
+            i += 2
+        elif arg.startswith("-"):
+            print(f"警告：忽略未知参数 {arg}")
+            i += 1
+        else:
+            paths.append(arg)
+            i += 1
+    
+    # 收集文件（文件夹递归遍历）
+    files = collect_kgm_files(paths)
+    total = len(files)
     
     print(f"发现 {total} 个文件待处理")
     print("=" * 60)
     
-    for i, file_path in enumerate(sys.argv[1:], 1):
-        print(f"处理文件 {i}/{total}:")
-        if decrypt_file(file_path):
-            successful += 1
+    if scan:
+        if total:
+            scan_library(files, scan_output, workers)
+        input("按回车键退出...")
+        return
+    
+    successful = 0
+    if manifest_path is not None:
+        # 增量模式：未变化的文件计为成功
+        successful, _ = incremental_decrypt(files, manifest_path, workers)
+    elif total > 1 and workers != 1:
+        # 多个文件时使用进程池并行解密
+        results = batch_decrypt(files, workers)
+        successful = sum(1 for result in results if result["ok"])
+    else:
+        for i, file_path in enumerate(files, 1):
+            print(f"处理文件 {i}/{total}:")
+            if decrypt_file(file_path):
+                successful += 1
     
     print("处理完成")
     print(f"成功: {successful} 个文件，失败: {total - successful} 个文件")
@@ -1,6 +1,15 @@
 import os
 import sys
 import subprocess
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# 进程内解密使用的Python解密工具（优先使用已粘贴密钥的完整版）
+PYTHON_DECODER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "i12cu4的方案(python)")
+PYTHON_DECODER_SCRIPTS = ["酷狗音乐解密工具(完整版).py", "酷狗音乐解密工具(架构板).py"]
+
+# 工作进程内加载的解密工具模块
+_decoder_module = None
 
 def rename_kgm_flac_to_kgm(file_path):
     """将 .kgm.flac 文件重命名为 .kgm 文件"""
@@ -57,17 +66,113 @@ def collect_kgm_files(paths):
     
     return kgm_files
 
-def convert_kgm_to_mp3(kgm_files):
-    """使用 kgm2mp3.exe 转换 .kgm 文件为 .mp3"""
+def find_python_decoder():
+    """查找可用的Python解密工具（需要已粘贴密钥或同目录下有kugou_key.xz），返回 (脚本路径, 模块)"""
+    for script_name in PYTHON_DECODER_SCRIPTS:
+        script_path = os.path.join(PYTHON_DECODER_DIR, script_name)
+        if not os.path.exists(script_path):
+            continue
+        
+        module = load_python_decoder(script_path)
+        if module.has_pub_key_source():
+            return script_path, module
+    
+    return None, None
+
+def load_python_decoder(script_path):
+    """加载Python解密工具（文件名含中文和括号，无法直接import）"""
+    spec = importlib.util.spec_from_file_location("kugou_decrypt_tool", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _init_python_worker(script_path):
+    """工作进程初始化：加载解密工具与公钥（父进程已生成公钥缓存时直接mmap映射）"""
+    global _decoder_module
+    _decoder_module = load_python_decoder(script_path)
+    _decoder_module.load_pub_key_data()
+
+def _python_convert_worker(kgm_file):
+    """在工作进程中解密单个文件，返回 (文件, 状态, 输出路径, 错误信息)"""
+    try:
+        # 先解密文件头检测格式，输出路径与kgm2mp3.exe一致：原文件名 + 检测到的扩展名
+        with open(kgm_file, 'rb') as f:
+            decoder = _decoder_module.KuGouDecoder(f)
+            audio_format = _decoder_module.detect_audio_format(decoder.pread(0, 4096))
+        
+        # 无法识别格式通常说明密钥不对或文件已损坏：不写出.dat，并保留原文件（只有成功的文件才会被删除）
+        if audio_format == "dat":
+            return kgm_file, "failed", None, "无法识别解密后的音频格式（密钥错误或文件损坏），已保留原文件"
+        
+        output_file = kgm_file.rsplit('.', 1)[0] + '.' + audio_format
+        if os.path.exists(output_file):
+            return kgm_file, "skipped", output_file, None
+        
+        _decoder_module.decrypt_to_path(kgm_file, output_file)
+        return kgm_file, "converted", output_file, None
+    except Exception as e:
+        return kgm_file, "failed", None, str(e)
+
+def convert_with_python(kgm_files, workers=None):
+    """使用进程内的Python解密器并行转换，返回转换成功或已存在输出的文件列表"""
+    script_path, decoder_module = find_python_decoder()
+    if script_path is None:
+        print("错误: 找不到可用的Python解密工具或密钥数据")
+        print(f"  请确认 {os.path.normpath(PYTHON_DECODER_DIR)} 下的解密工具已粘贴密钥")
+        return None
+    
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(kgm_files)))
+    
+    # 父进程先加载一次公钥，生成公钥缓存文件后工作进程只需mmap映射
+    decoder_module.load_pub_key_data()
+    
+    print(f"使用Python解密器: {os.path.basename(script_path)}（{workers} 个进程）")
+    print(f"开始转换 {len(kgm_files)} 个 .kgm 文件...")
+    
+    done_files = []
+    converted_count = 0
+    skipped_count = 0
+    
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_python_worker,
+        initargs=(script_path,)
+    ) as executor:
+        futures = [executor.submit(_python_convert_worker, kgm_file) for kgm_file in kgm_files]
+        
+        for future in as_completed(futures):
+            kgm_file, status, output_file, error = future.result()
+            if status == "converted":
+                print(f"转换成功: {os.path.basename(kgm_file)} -> {os.path.basename(output_file)}")
+                converted_count += 1
+                done_files.append(kgm_file)
+            elif status == "skipped":
+                print(f"输出文件已存在，跳过转换: {os.path.basename(kgm_file)}")
+                skipped_count += 1
+                done_files.append(kgm_file)
+            else:
+                print(f"转换失败 {os.path.basename(kgm_file)}: {error}")
+    
+    print(f"转换完成: 成功 {converted_count} 个，跳过 {skipped_count} 个，失败 {len(kgm_files) - len(done_files)} 个")
+    return done_files
+
+def convert_with_exe(kgm_files):
+    """使用 kgm2mp3.exe 逐个转换，返回转换成功或已存在输出的文件列表"""
     exe_path = os.path.join(os.path.dirname(__file__), "kgm2mp3.exe")
     
     if not os.path.exists(exe_path):
         print(f"错误: 找不到 kgm2mp3.exe 文件，请确保它和本程序在同一目录下")
-        return False
+        return None
+    
+    if os.name != 'nt':
+        print("错误: kgm2mp3.exe 只能在Windows上运行，请使用 --backend python")
+        return None
     
     print(f"找到 kgm2mp3.exe: {exe_path}")
     print(f"开始转换 {len(kgm_files)} 个 .kgm 文件...")
     
+    done_files = []
     converted_count = 0
     skipped_count = 0
     
@@ -78,6 +183,7 @@ def convert_kgm_to_mp3(kgm_files):
         if os.path.exists(mp3_file):
             print(f"MP3文件已存在，跳过转换: {os.path.basename(kgm_file)}")
             skipped_count += 1
+            done_files.append(kgm_file)
             continue
         
         # 转换文件
@@ -85,10 +191,9 @@ def convert_kgm_to_mp3(kgm_files):
             print(f"正在转换: {os.path.basename(kgm_file)}")
             
             # 使用 subprocess.Popen 替代 subprocess.run 来避免线程问题
-            cmd = f'"{exe_path}" "{kgm_file}"'
+            # 以参数列表传递路径，无需经过shell转义
             process = subprocess.Popen(
-                cmd, 
-                shell=True,
+                [exe_path, kgm_file],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
@@ -102,6 +207,7 @@ def convert_kgm_to_mp3(kgm_files):
             if process.returncode == 0:
                 print(f"转换成功: {os.path.basename(kgm_file)}")
                 converted_count += 1
+                done_files.append(kgm_file)
             else:
                 if stderr:
                     print(f"转换失败 {os.path.basename(kgm_file)}: {stderr.strip()}")
@@ -112,7 +218,26 @@ def convert_kgm_to_mp3(kgm_files):
             print(f"转换异常 {os.path.basename(kgm_file)}: {e}")
     
     print(f"转换完成: 成功 {converted_count} 个，跳过 {skipped_count} 个")
-    return converted_count > 0 or skipped_count > 0
+    return done_files
+
+def convert_kgm_to_mp3(kgm_files, backend="python", workers=None):
+    """转换 .kgm 文件为音频文件
+    Args:
+        kgm_files: 待转换文件列表
+        backend: "python"（进程内解密，默认）或 "exe"（调用kgm2mp3.exe）
+        workers: Python解密器使用的进程数，默认CPU核心数
+    Returns:
+        转换成功或输出已存在的文件列表（可安全删除），后端不可用时返回None
+    """
+    if backend == "python":
+        done_files = convert_with_python(kgm_files, workers)
+        if done_files is None and os.name == 'nt':
+            # Python解密器不可用时退回kgm2mp3.exe
+            print("改用 kgm2mp3.exe 转换")
+            done_files = convert_with_exe(kgm_files)
+        return done_files
+    
+    return convert_with_exe(kgm_files)
 
 def delete_kgm_files(kgm_files):
     """删除所有 .kgm 文件"""
@@ -133,10 +258,14 @@ def delete_kgm_files(kgm_files):
     
     print(f"删除完成: 成功删除 {deleted_count} 个 .kgm 文件")
 
-def process_paths(paths):
+def process_paths(paths, backend="python", workers=None):
     """主处理函数"""
     if not paths:
         print("请将文件或文件夹拖拽到本程序")
+        print("")
+        print("可选参数：")
+        print("  --backend python|exe  解密方式：进程内Python解密（默认，跨平台）或 kgm2mp3.exe")
+        print("  --workers N           Python解密使用的进程数（默认CPU核心数）")
         input("按回车键退出...")
         return
     
@@ -157,14 +286,14 @@ def process_paths(paths):
     
     # 步骤2: 转换 .kgm 文件为 .mp3
     print("步骤2: 转换 .kgm 文件为 .mp3")
-    conversion_done = convert_kgm_to_mp3(kgm_files)
+    done_files = convert_kgm_to_mp3(kgm_files, backend, workers)
     
-    if conversion_done:
+    if done_files:
         print("-" * 50)
         
-        # 步骤3: 删除所有 .kgm 文件
-        print("步骤3: 删除所有 .kgm 文件")
-        delete_kgm_files(kgm_files)
+        # 步骤3: 删除已转换的 .kgm 文件（转换失败的文件保留）
+        print("步骤3: 删除已转换的 .kgm 文件")
+        delete_kgm_files(done_files)
     
     print("-" * 50)
     print("处理完成!")
@@ -172,11 +301,26 @@ def process_paths(paths):
 
 def main():
     """主函数入口"""
-    # 获取拖拽到程序的路径
-    paths = sys.argv[1:]
+    # 获取拖拽到程序的路径与可选参数
+    backend = "python"
+    workers = None
+    paths = []
+    
+    i = 1
+    while i < len(sys.argv):
+        arg = sys.argv[i]
+        if arg == "--backend" and i + 1 < len(sys.argv) and sys.argv[i + 1] in ("python", "exe"):
+            backend = sys.argv[i + 1]
+            i += 2
+        elif arg == "--workers" and i + 1 < len(sys.argv) and sys.argv[i + 1].isdigit():
+            workers = int(sys.argv[i + 1])
+            i += 2
+        else:
+            paths.append(arg)
+            i += 1
     
     # 启动处理
-    process_paths(paths)
+    process_paths(paths, backend, workers)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
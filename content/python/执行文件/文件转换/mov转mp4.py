@@ -1,14 +1,182 @@
 import os
+import json
+import sqlite3
 import subprocess
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# MP4容器可以直接容纳的编码：视频与音频都属于这些编码时只需重新封装（-c copy），速度只受磁盘限制
+REMUX_VIDEO_CODECS = {'h264', 'hevc', 'mpeg4'}
+REMUX_AUDIO_CODECS = {'aac', 'mp3', 'alac', 'ac3'}
+# 没有转码任务可供测速时，估算节省时间所用的转码速度（相对实时播放的倍数）
+DEFAULT_TRANSCODE_SPEED = 1.0
+
+def probe_streams(mov_path, ffprobe_path):
+    """
+    使用ffprobe获取第一条视频流、第一条音频流的编码与时长
+    返回 (视频编码, 音频编码, 时长秒数)，没有对应的流时编码为None
+    """
+    command = [
+        ffprobe_path,
+        '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name:format=duration',
+        '-of', 'json',
+        mov_path
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='ignore', check=True)
+    data = json.loads(result.stdout)
+    streams = data.get('streams', [])
+    video_codec = next((s.get('codec_name') for s in streams if s.get('codec_type') == 'video'), None)
+    audio_codec = next((s.get('codec_name') for s in streams if s.get('codec_type') == 'audio'), None)
+    try:
+        duration = float(data.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = 0.0
+    return video_codec, audio_codec, duration
+
+def load_catalog_streams(catalog_path, mov_paths):
+    """
+    从媒体目录（工具/输出视频相关参数(ffmpeg).py 生成）读取编码信息，只使用与文件当前大小、修改时间一致的记录
+    媒体目录不存在或无法读取时返回空字典，所有文件改用ffprobe探测
+    """
+    known = {}
+    # sqlite3.connect 会为不存在的路径创建空数据库，先确认文件存在
+    if not os.path.isfile(catalog_path):
+        print(f"媒体目录 '{catalog_path}' 不存在，将使用ffprobe探测")
+        return known
+    
+    conn = sqlite3.connect(catalog_path)
+    try:
+        for mov_path in mov_paths:
+            stat = os.stat(mov_path)
+            row = conn.execute(
+                "SELECT video_codec, audio_codec, coalesce(duration, 0) FROM media "
+                "WHERE path = ? AND size = ? AND mtime_ns = ? AND error IS NULL",
+                (os.path.abspath(mov_path), stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+            if row:
+                known[mov_path] = row
+    except sqlite3.OperationalError as e:
+        print(f"无法读取媒体目录 '{catalog_path}'，将使用ffprobe探测: {e}")
+        return {}
+    finally:
+        conn.close()
+    return known
+
+def plan_conversion(video_codec, audio_codec):
+    """
+    根据编码选择转换方式（没有视频流的纯音频MOV按视频可直接复制处理）：
+    remux     视频与音频都可以直接放入MP4，只重新封装
+    audio     视频可以直接复制，只把音频（如相机常用的PCM）转码为AAC
+    transcode 视频需要重新编码
+    """
+    if video_codec is not None and video_codec not in REMUX_VIDEO_CODECS:
+        return 'transcode'
+    if audio_codec is None or audio_codec in REMUX_AUDIO_CODECS:
+        return 'remux'
+    return 'audio'
+
+def build_command(ffmpeg_path, mov_path, mp4_path, plan, video_codec):
+    """
+    构建FFmpeg命令（只保留第一条视频流和第一条音频流，丢弃MOV中的时间码等数据轨道）
+    转换方式只根据第一条音频流选择，其余音频轨道（可能是PCM等MP4不支持的编码）不输出
+    """
+    command = [
+        ffmpeg_path,
+        '-v', 'error',
+        '-i', mov_path,      # 输入文件
+        '-map', '0:v:0?',
+        '-map', '0:a:0?',
+    ]
+    if plan == 'transcode':
+        command += [
+            '-c:v', 'libx264',   # 视频编码器
+            '-crf', '23',        # 视频质量（0-51，越低越好）
+            '-preset', 'medium', # 编码速度与压缩率的平衡
+            '-c:a', 'aac',       # 音频编码器
+            '-b:a', '128k',      # 音频比特率
+        ]
+    else:
+        command += ['-c:v', 'copy']
+        if video_codec == 'hevc':
+            command += ['-tag:v', 'hvc1']  # 让QuickTime等播放器识别HEVC
+        command += ['-c:a', 'copy'] if plan == 'remux' else ['-c:a', 'aac', '-b:a', '128k']
+    command += [
+        '-movflags', '+faststart',  # 把索引放到文件开头，便于边下边播
+        '-y',                # 覆盖输出文件（如果存在）
+        mp4_path             # 输出文件
+    ]
+    return command
+
+def run_ffmpeg(command, plan, transcode_slots=None):
+    """
+    运行FFmpeg命令，返回用时秒数
+    完整转码时libx264本身就会用满所有核心，需要先取得转码名额（transcode_slots），等待的时间不计入用时
+    """
+    if plan == 'transcode' and transcode_slots is not None:
+        with transcode_slots:
+            return run_ffmpeg(command, plan)
+    start_time = time.perf_counter()
+    subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+    return time.perf_counter() - start_time
+
+def convert_one(mov_path, ffmpeg_path, ffprobe_path, known_streams=None, transcode_slots=None):
+    """
+    转换单个MOV文件，返回 (转换方式, 用时秒数, 视频时长秒数, 说明)
+    转换方式为 remux/audio/transcode/skipped/failed
+    transcode_slots 为限制同时进行的完整转码数的信号量，重新封装不受限制
+    """
+    mp4_path = os.path.splitext(mov_path)[0] + '.mp4'
+    
+    # 输出文件不早于输入文件时说明已经转换过
+    if os.path.exists(mp4_path) and os.path.getmtime(mp4_path) >= os.path.getmtime(mov_path):
+        return 'skipped', 0.0, 0.0, "MP4文件已是最新"
+    
+    try:
+        video_codec, audio_codec, duration = known_streams or probe_streams(mov_path, ffprobe_path)
+    except (subprocess.CalledProcessError, ValueError) as e:
+        return 'failed', 0.0, 0.0, f"无法读取编码信息: {e}"
+    
+    plan = plan_conversion(video_codec, audio_codec)
+    # 先写入临时文件，完成后再替换，中断时不会留下不完整的MP4
+    temp_path = os.path.splitext(mov_path)[0] + '.part.mp4'
+    command = build_command(ffmpeg_path, mov_path, temp_path, plan, video_codec)
+    
+    message = f"{video_codec}/{audio_codec}"
+    try:
+        # 运行FFmpeg命令
+        try:
+            elapsed = run_ffmpeg(command, plan, transcode_slots)
+        except subprocess.CalledProcessError:
+            if plan == 'transcode':
+                raise
+            # 编码检查通过但复制流仍然失败时，退回完整转码再试一次
+            message += "，直接复制失败，已改为完整转码"
+            plan = 'transcode'
+            command = build_command(ffmpeg_path, mov_path, temp_path, plan, video_codec)
+            elapsed = run_ffmpeg(command, plan, transcode_slots)
+        os.replace(temp_path, mp4_path)
+    except subprocess.CalledProcessError as e:
+        return 'failed', 0.0, 0.0, f"错误: {e.stderr.strip() or e}"
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return plan, elapsed, duration, message
 
 def convert_mov_to_mp4():
     """
     将指定文件夹中的所有MOV文件转换为MP4格式
     使用变量形式存储路径，而不是命令行参数
+    先探测编码：H.264/HEVC + AAC等MP4兼容的编码只重新封装，不兼容时才转码，多个文件并发处理
     """
     # 使用变量定义路径
     input_folder = r"D:\MV"  # 请替换为你的MOV文件文件夹路径
     ffmpeg_path = r"C:\Program File\ffmpeg-master-latest-win64-gpl\bin\ffmpeg.exe"    # 请替换为你的FFmpeg可执行文件路径
+    ffprobe_path = ffmpeg_path.replace('ffmpeg.exe', 'ffprobe.exe')  # FFprobe与FFmpeg在同一目录
+    max_workers = os.cpu_count() or 1  # 同时处理的文件数（重新封装只受磁盘速度限制，可以多个同时进行）
+    max_transcodes = max(1, (os.cpu_count() or 1) // 4)  # 同时进行的完整转码数（每个libx264进程已会使用所有核心）
+    catalog_path = None  # 媒体目录路径，设置后使用其中记录的编码信息，不再调用ffprobe
     
     # 支持的MOV文件扩展名（包括大小写变体）
     mov_extensions = ['.mov', '.MOV']
@@ -24,37 +192,55 @@ def convert_mov_to_mp4():
         return
     
     # 遍历文件夹中的所有文件
-    for filename in os.listdir(input_folder):
-        # 检查文件是否为MOV格式
-        if any(filename.endswith(ext) for ext in mov_extensions):
-            mov_path = os.path.join(input_folder, filename)
-            # 生成输出文件名（将扩展名改为.mp4）
-            mp4_filename = os.path.splitext(filename)[0] + '.mp4'
-            mp4_path = os.path.join(input_folder, mp4_filename)
-            
-            print(f"正在转换: {filename} -> {mp4_filename}")
-            
-            # 构建FFmpeg命令
-            command = [
-                ffmpeg_path,
-                '-i', mov_path,      # 输入文件
-                '-c:v', 'libx264',   # 视频编码器
-                '-crf', '23',        # 视频质量（0-51，越低越好）
-                '-preset', 'medium', # 编码速度与压缩率的平衡
-                '-c:a', 'aac',       # 音频编码器
-                '-b:a', '128k',      # 音频比特率
-                '-y',                # 覆盖输出文件（如果存在）
-                mp4_path             # 输出文件
-            ]
-            
+    mov_paths = [
+        os.path.join(input_folder, filename) for filename in sorted(os.listdir(input_folder))
+        if any(filename.endswith(ext) for ext in mov_extensions)
+    ]
+    if not mov_paths:
+        print(f"文件夹 '{input_folder}' 中没有MOV文件")
+        return
+    
+    known = load_catalog_streams(catalog_path, mov_paths) if catalog_path else {}
+    print(f"找到 {len(mov_paths)} 个MOV文件，同时处理 {max_workers} 个（其中完整转码最多 {max_transcodes} 个）")
+    transcode_slots = threading.BoundedSemaphore(max_transcodes)
+    
+    names = {'remux': '重新封装', 'audio': '仅转码音频', 'transcode': '完整转码', 'skipped': '跳过', 'failed': '失败'}
+    counts = dict.fromkeys(names, 0)
+    seconds = dict.fromkeys(names, 0.0)
+    durations = dict.fromkeys(names, 0.0)
+    start_time = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(convert_one, mov_path, ffmpeg_path, ffprobe_path, known.get(mov_path), transcode_slots): mov_path
+            for mov_path in mov_paths
+        }
+        for future in as_completed(futures):
+            filename = os.path.basename(futures[future])
             try:
-                # 运行FFmpeg命令
-                subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                print(f"完成: {mp4_filename}")
-            except subprocess.CalledProcessError as e:
-                print(f"转换失败: {filename}, 错误: {e}")
+                plan, elapsed, duration, message = future.result()
             except Exception as e:
-                print(f"发生意外错误: {e}")
+                plan, elapsed, duration, message = 'failed', 0.0, 0.0, f"发生意外错误: {e}"
+            counts[plan] += 1
+            seconds[plan] += elapsed
+            durations[plan] += duration
+            print(f"{names[plan]}: {filename} ({message}, {elapsed:.1f} 秒)")
+    
+    # 汇总：各方式的文件数，以及与全部完整转码相比节省的时间
+    print(f"\n全部完成，用时 {time.perf_counter() - start_time:.1f} 秒")
+    for plan, name in names.items():
+        if counts[plan]:
+            print(f"  {name}: {counts[plan]} 个")
+    
+    copied_duration = durations['remux'] + durations['audio']
+    if copied_duration > 0:
+        # 以本次完整转码的实际速度估算，没有转码任务时使用默认速度
+        if seconds['transcode'] > 0 and durations['transcode'] > 0:
+            speed = durations['transcode'] / seconds['transcode']
+        else:
+            speed = DEFAULT_TRANSCODE_SPEED
+        saved = copied_duration / speed - (seconds['remux'] + seconds['audio'])
+        print(f"  与完整转码相比约节省 {max(0.0, saved) / 60:.1f} 分钟（按 {speed:.2f}x 转码速度估算）")
 
 if __name__ == "__main__":
     # 调用转换函数